@@ -1,15 +1,26 @@
 # advanced_f1_refactor_with_ai.py
 from __future__ import annotations
 import math
+import os
 import random
 import time
-from dataclasses import dataclass
-from typing import List, Tuple, Optional
+from collections import deque
+from dataclasses import dataclass, fields
+from typing import Callable, List, Tuple, Optional
 
 import cv2
 import mediapipe as mp
 import numpy as np
 
+from camera_capture import CameraCapture
+from collisions import KIND_CODES, KINDS, CollisionEngine
+from entity_store import EntityTable, EntityView
+from frame_sources import open_frame_source
+from latency import FrameTrace, LatencyStats
+from opponent_controller import BatchedOpponentController
+from rng_streams import RandomStreams
+from timestep import FixedStepper, StepClock
+
 # Optional sound dependency
 try:
     import pygame
@@ -35,6 +46,56 @@ class Config:
     MAX_STEERING: float = 50.0
     HAND_DETECT_CONF: float = 0.7
     HAND_TRACK_CONF: float = 0.5
+    # per-frame hand tracking budget used to pick a TrackingTier (0 = always full quality)
+    HAND_LATENCY_BUDGET_MS: float = 20.0
+    # most camera frames in a row that may be extrapolated instead of running inference
+    HAND_MAX_SKIP: int = 3
+    # where frames come from: camera:0, video:clip.mp4, synthetic, npy:recording.npy
+    FRAME_SOURCE: str = "camera:0"
+    # False replays files and synthetic frames as fast as they are consumed
+    FRAME_SOURCE_REALTIME: bool = True
+    # camera preview frames per second sent to clients, independent of the game tick
+    PREVIEW_HZ: float = 10.0
+    # server game ticks per second: input, AI and snapshot publishing (the sim steps at SIM_HZ)
+    TICK_HZ: float = 30.0
+    # most games the server hosts at once, and how long one may sit without a client before it is closed
+    MAX_SESSIONS: int = 16
+    SESSION_IDLE_TIMEOUT: float = 60.0
+    # run MediaPipe in a separate worker process (see hand_worker.py)
+    HAND_INFERENCE_PROCESS: bool = False
+    # test collisions along each tick's motion so fast cars cannot skip over thin obstacles
+    SWEPT_COLLISIONS: bool = True
+    # fixed simulation rate; GameLogic scales its per-tick constants to it
+    SIM_HZ: float = 60.0
+    # most sim steps run in one go to catch up after a stall; older backlog is dropped
+    SIM_MAX_CATCHUP: int = 5
+    # most opponent cars on the road at once
+    MAX_OPPONENTS: int = 3
+    # root seed for all game and AI random streams; -1 picks a fresh one per game
+    SEED: int = -1
+    # AI driver: "reactive" (ImprovedAIAgent), "grid" (ImprovedAIAgent steering by an
+    # OccupancyGrid), "lookahead" (LookaheadAIAgent) or "table" (TableAIAgent)
+    AI_MODE: str = "reactive"
+    # lookahead planner: wall-time budget per decision and search depth in decisions
+    AI_PLAN_BUDGET_MS: float = 8.0
+    AI_PLAN_HORIZON: int = 15
+    # policy table built by policy_table.py, for AI_MODE "table"
+    AI_POLICY_TABLE: str = "ai_policy.npy"
+
+    @classmethod
+    def from_env(cls, prefix: str = "F1_") -> "Config":
+        """Build a Config, overriding fields from environment variables such as F1_HAND_INFERENCE_PROCESS=1."""
+        overrides = {}
+        for f in fields(cls):
+            raw = os.environ.get(prefix + f.name)
+            if raw is None:
+                continue
+            default = f.default
+            if isinstance(default, bool):
+                overrides[f.name] = raw.strip().lower() in ("1", "true", "yes", "on")
+            else:
+                overrides[f.name] = type(default)(raw)
+        return cls(**overrides)
 
 DEFAULT_COLORS = {
     'road': (45, 45, 45),
@@ -51,6 +112,13 @@ DEFAULT_COLORS = {
     'power_up': (255, 165, 0)
 }
 
+OBSTACLE_TYPES = ('barrier', 'oil', 'debris')
+POWER_UP_TYPES = ('boost', 'invincible', 'score')
+# the tick rate GameLogic's per-tick speeds, chances and timers were tuned at
+BASE_TICK_HZ = 30.0
+
+PARTICLE_COLORS = (DEFAULT_COLORS['boost'], DEFAULT_COLORS['danger'], DEFAULT_COLORS['power_up'], DEFAULT_COLORS['text'])
+
 # --------------------------
 # Utilities
 # --------------------------
@@ -58,55 +126,360 @@ DEFAULT_COLORS = {
 def clamp(v: float, a: float, b: float) -> float:
     return max(a, min(b, v))
 
+
+def track_line_positions(offset: float, config: Config) -> List[float]:
+    """Screen y of every lane marking for a scroll offset in [0, LINE_GAP).
+
+    The first marking sits in (-2 * LINE_GAP, -LINE_GAP] so one is always
+    ready to scroll in; markings stop short of HEIGHT + 50.
+    """
+    gap = config.LINE_GAP
+    first = -gap - (gap - offset) % gap
+    return np.arange(first, config.HEIGHT + 50, gap).tolist()
+
+
+def draw_hand_landmarks(frame: np.ndarray, landmarks: np.ndarray, colors: dict = DEFAULT_COLORS) -> None:
+    """Draw one hand's normalized (21, 2+) landmark array onto a BGR frame in place."""
+    h, w = frame.shape[:2]
+    pts = [(int(x * w), int(y * h)) for x, y in landmarks[:, :2]]
+    for a, b in mp.solutions.hands.HAND_CONNECTIONS:
+        cv2.line(frame, pts[a], pts[b], (0, 255, 255), 2)
+    for p in pts:
+        cv2.circle(frame, p, 2, colors['hand_points'], -1)
+
 # --------------------------
 # Hand Tracking
 # --------------------------
-class HandTracker:
-    """Encapsulates MediaPipe hand detection and gesture utils."""
+@dataclass(frozen=True)
+class TrackingTier:
+    """One hand-tracking quality level; tiers are ordered from most to least expensive."""
+    name: str
+    scale: float = 1.0          # resize factor applied to the inference input
+    model_complexity: int = 1   # MediaPipe Hands model_complexity (0 = lite)
+    use_roi: bool = False       # crop around the last known hand bounding box
+    single_hand: bool = False   # drop to max_num_hands=1 when only one hand was seen recently
+
+
+TRACKING_TIERS: Tuple[TrackingTier, ...] = (
+    TrackingTier('full'),
+    TrackingTier('roi', use_roi=True, single_hand=True),
+    TrackingTier('roi_lite', use_roi=True, single_hand=True, model_complexity=0),
+    TrackingTier('roi_lite_half', use_roi=True, single_hand=True, model_complexity=0, scale=0.5),
+)
+
+
+class HandMotionFilter:
+    """Constant-velocity alpha-beta filter for one hand center, in frame pixels.
+
+    Updated on every real detection and used to extrapolate the center on
+    frames where inference is skipped.
+    """
+
+    def __init__(self, x: float, y: float, t: float, alpha: float = 0.9, beta: float = 0.5,
+                 max_horizon: float = 0.25) -> None:
+        self.x, self.y = x, y
+        self.vx, self.vy = 0.0, 0.0
+        self.t = t
+        self.alpha = alpha
+        self.beta = beta
+        self.max_horizon = max_horizon  # seconds we are willing to extrapolate
+        self.innovation = 0.0
+
+    def predict(self, t: float) -> Point:
+        dt = clamp(t - self.t, 0.0, self.max_horizon)
+        return self.x + self.vx * dt, self.y + self.vy * dt
+
+    def update(self, x: float, y: float, t: float) -> float:
+        """Fold in a measurement and return the prediction error (innovation) in pixels."""
+        dt = t - self.t
+        if dt <= 0:
+            self.x, self.y = x, y
+            return 0.0
+        px, py = self.predict(t)
+        rx, ry = x - px, y - py
+        self.x, self.y = px + self.alpha * rx, py + self.alpha * ry
+        self.vx += self.beta * rx / dt
+        self.vy += self.beta * ry / dt
+        self.t = t
+        self.innovation = math.hypot(rx, ry)
+        return self.innovation
+
+    def state(self) -> dict:
+        return {
+            "x": round(self.x, 1), "y": round(self.y, 1),
+            "vx": round(self.vx, 1), "vy": round(self.vy, 1),
+            "t": self.t, "innovation": round(self.innovation, 1),
+        }
 
-    def __init__(self, config: Config, colors: dict = DEFAULT_COLORS) -> None:
+
+class HandTracker:
+    """Encapsulates MediaPipe hand detection and gesture utils.
+
+    The tracker picks a TrackingTier at runtime from a smoothed per-frame
+    latency and Config.HAND_LATENCY_BUDGET_MS (0 pins the full tier). Cheaper
+    tiers fall back to a full-frame, two-hand pass whenever hands are lost or
+    confidence drops, and every ``full_frame_interval`` frames to pick up new hands.
+    Full frames and ROI crops run on separate MediaPipe models: video mode
+    carries each hand's region from one image to the next in that image's
+    coordinates, so a crop model is reset whenever the crop window moves.
+
+    Once the cheapest tier is still over budget, inference only runs every
+    ``inference_interval`` frames (up to Config.HAND_MAX_SKIP + 1); in between,
+    hand centers are extrapolated with one HandMotionFilter per hand and fed
+    through _compute_steering as usual.
+    """
+
+    def __init__(self, config: Config, colors: dict = DEFAULT_COLORS,
+                 tiers: Tuple[TrackingTier, ...] = TRACKING_TIERS, headless: bool = False) -> None:
         self.config = config
         self.colors = colors
+        # headless: never draw on the frame; callers use draw_overlay() on the frames they show
+        self.headless = headless
         self.mp_hands = mp.solutions.hands
-        self.hands = self.mp_hands.Hands(
-            static_image_mode=False,
-            max_num_hands=2,
-            min_detection_confidence=config.HAND_DETECT_CONF,
-            min_tracking_confidence=config.HAND_TRACK_CONF,
-        )
+        self.tiers = tiers
+        self.tier_index = 0
+        self._models = {}
+        # the crop window each crop model last tracked in
+        self._model_rois = {}
+        self.hands = self._model(1, 2)
         self.drawing = mp.solutions.drawing_utils
 
+        # preallocated outputs: normalized (x, y, z) landmarks, hands sorted left to right
+        self.landmarks = np.zeros((2, 21, 3), dtype=np.float32)
+        self.hand_count = 0
+        self._landmark_shift = np.zeros((2, 2), dtype=np.float32)
+        self._scratch_pts = np.zeros((21, 3), dtype=np.float32)
+        self._buffers = {}
+
+        # adaptive state
+        self.latency_ms = 0.0
+        self.full_frame_interval = 30
+        self.roi_margin = 0.6
+        self._roi: Optional[Tuple[int, int, int, int]] = None
+        self._frames_since_full = 0
+        self._tier_cooldown = 0
+        self._recent_hand_counts = deque(maxlen=15)
+
+        # skip-frame state
+        self.inference_interval = 1
+        self.filters: List[HandMotionFilter] = []
+        self._frames_until_inference = 0
+        self._frame_shape: Tuple[int, ...] = (0, 0, 3)
+
+    @property
+    def tier(self) -> TrackingTier:
+        return self.tiers[self.tier_index]
+
+    @property
+    def last_landmarks(self) -> np.ndarray:
+        """(hand_count, 21, 3) view of the landmarks from the last inference."""
+        return self.landmarks[:self.hand_count]
+
+    def _model(self, model_complexity: int, max_hands: int,
+               roi: Optional[Tuple[int, int, int, int]] = None):
+        """The video-mode model for full frames, or with ``roi`` for crops of that window."""
+        key = (model_complexity, max_hands, roi is not None)
+        if key in self._models and roi is not None and self._model_rois.get(key) != roi:
+            # the hands it tracked are somewhere else in the new window's coordinates
+            self._models[key].reset()
+        if roi is not None:
+            self._model_rois[key] = roi
+        if key not in self._models:
+            self._models[key] = self.mp_hands.Hands(
+                static_image_mode=False,
+                max_num_hands=max_hands,
+                model_complexity=model_complexity,
+                min_detection_confidence=self.config.HAND_DETECT_CONF,
+                min_tracking_confidence=self.config.HAND_TRACK_CONF,
+            )
+        return self._models[key]
+
+    def _buffer(self, kind: str, width: int, height: int) -> np.ndarray:
+        key = (kind, width, height)
+        buf = self._buffers.get(key)
+        if buf is None:
+            if len(self._buffers) > 8:
+                # ROI sizes drift; don't keep every size we ever saw
+                self._buffers.clear()
+            buf = self._buffers[key] = np.empty((height, width, 3), dtype=np.uint8)
+        return buf
+
     def process_frame(self, frame: np.ndarray) -> Tuple[float, bool]:
         """Process the camera frame and return a steering value and a hand_detected flag.
 
         Returns:
             (steering_degrees, hand_detected)
         """
-        rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-        results = self.hands.process(rgb)
+        now = time.monotonic()
+        if self._frames_until_inference > 0:
+            self._frames_until_inference -= 1
+            return self._extrapolate(frame, now)
+
+        start = time.perf_counter()
+        tier = self.tier
+        h, w = frame.shape[:2]
+
+        full_pass = (not tier.use_roi or self._roi is None
+                     or self._frames_since_full >= self.full_frame_interval)
+        x0, y0, x1, y1 = (0, 0, w, h) if full_pass else self._roi
+        region = frame[y0:y1, x0:x1]
+        if tier.scale != 1.0:
+            rw, rh = max(1, int((x1 - x0) * tier.scale)), max(1, int((y1 - y0) * tier.scale))
+            region = cv2.resize(region, (rw, rh), dst=self._buffer('resize', rw, rh),
+                                interpolation=cv2.INTER_AREA)
+        max_hands = 2
+        if tier.single_hand and not full_pass and max(self._recent_hand_counts, default=2) <= 1:
+            max_hands = 1
+
+        rgb = cv2.cvtColor(region, cv2.COLOR_BGR2RGB,
+                           dst=self._buffer('rgb', region.shape[1], region.shape[0]))
+        results = self._model(tier.model_complexity, max_hands, None if full_pass else self._roi).process(rgb)
+
+        n = 0
+        confident = True
+        if results.multi_hand_landmarks:
+            for landmarks, handedness in zip(results.multi_hand_landmarks, results.multi_handedness):
+                if n == len(self.landmarks):
+                    break
+                pts = self.landmarks[n]
+                for j, lm in enumerate(landmarks.landmark):
+                    pts[j, 0] = lm.x
+                    pts[j, 1] = lm.y
+                    pts[j, 2] = lm.z
+                # map crop-normalized coordinates back to the full frame
+                pts[:, 0] *= (x1 - x0) / w
+                pts[:, 0] += x0 / w
+                pts[:, 1] *= (y1 - y0) / h
+                pts[:, 1] += y0 / h
+                if handedness.classification[0].score < self.config.HAND_TRACK_CONF:
+                    confident = False
+                n += 1
+        self.hand_count = n
+        if n == 2 and self.landmarks[0, :, 0].mean() > self.landmarks[1, :, 0].mean():
+            np.copyto(self._scratch_pts, self.landmarks[0])
+            np.copyto(self.landmarks[0], self.landmarks[1])
+            np.copyto(self.landmarks[1], self._scratch_pts)
+        self._landmark_shift[:] = 0.0
 
         hand_positions: List[Point] = []
+        for i in range(n):
+            cx, cy = self._get_hand_center(self.landmarks[i])
+            hand_positions.append((cx * w, cy * h))
+        if not self.headless:
+            # draw landmarks on the original frame for visual debugging
+            self.draw_overlay(frame)
 
-        if results.multi_hand_landmarks:
-            for landmarks in results.multi_hand_landmarks:
-                # draw landmarks on the original frame for visual debugging
-                self.drawing.draw_landmarks(
-                    frame,
-                    landmarks,
-                    self.mp_hands.HAND_CONNECTIONS,
-                    self.drawing.DrawingSpec(color=self.colors['hand_points'], thickness=2, circle_radius=2),
-                    self.drawing.DrawingSpec(color=(0, 255, 255), thickness=2),
-                )
-                cx, cy = self._get_hand_center(landmarks)
-                hand_positions.append((cx * frame.shape[1], cy * frame.shape[0]))
+        self._update_roi(w, h, full_pass, confident)
+        self._recent_hand_counts.append(n)
+
+        self._update_filters(hand_positions, now, w)
+        self._frame_shape = frame.shape
 
         steering, detected = self._compute_steering(hand_positions, frame.shape)
+        self._adapt_tier((time.perf_counter() - start) * 1000.0)
+        self._frames_until_inference = self.inference_interval - 1
         return steering, detected
 
-    def _get_hand_center(self, hand_landmarks) -> Point:
-        x_coords = [lm.x for lm in hand_landmarks.landmark]
-        y_coords = [lm.y for lm in hand_landmarks.landmark]
-        return sum(x_coords) / len(x_coords), sum(y_coords) / len(y_coords)
+    def draw_overlay(self, frame: np.ndarray) -> None:
+        """Draw the current (possibly extrapolated) hand skeletons onto any-size BGR frame."""
+        for i in range(self.hand_count):
+            pts = self._scratch_pts
+            np.copyto(pts, self.landmarks[i])
+            pts[:, 0] += self._landmark_shift[i, 0]
+            pts[:, 1] += self._landmark_shift[i, 1]
+            draw_hand_landmarks(frame, pts, self.colors)
+
+    def _extrapolate(self, frame: np.ndarray, now: float) -> Tuple[float, bool]:
+        predicted = [f.predict(now) for f in self.filters]
+        if self.hand_count == len(self.filters):
+            h, w = frame.shape[:2]
+            # filters and landmark rows are both ordered left to right
+            for i, (f, (px, py)) in enumerate(zip(self.filters, predicted)):
+                self._landmark_shift[i, 0] = (px - f.x) / w
+                self._landmark_shift[i, 1] = (py - f.y) / h
+            if not self.headless:
+                self.draw_overlay(frame)
+        return self._compute_steering(predicted, frame.shape)
+
+    def _update_filters(self, hand_positions: List[Point], now: float, frame_width: int) -> None:
+        if len(hand_positions) != len(self.filters):
+            # hand count changed: restart the filters from these detections
+            self.filters = [HandMotionFilter(x, y, now) for x, y in hand_positions]
+            return
+        worst = 0.0
+        for f, (x, y) in zip(self.filters, hand_positions):
+            worst = max(worst, f.update(x, y, now))
+        if worst > frame_width * 0.05 and self.inference_interval > 1:
+            # prediction is falling behind the hands: sample more often
+            self.inference_interval -= 1
+
+    def _update_roi(self, w: int, h: int, full_pass: bool, confident: bool) -> None:
+        self._frames_since_full = 0 if full_pass else self._frames_since_full + 1
+        if self.hand_count == 0 or not confident:
+            # lost the hands or unsure about them: next frame goes full-frame
+            self._roi = None
+            return
+        pts = self.last_landmarks
+        bx0, by0 = pts[:, :, 0].min() * w, pts[:, :, 1].min() * h
+        bx1, by1 = pts[:, :, 0].max() * w, pts[:, :, 1].max() * h
+        if self._roi is not None:
+            rx0, ry0, rx1, ry1 = self._roi
+            # keep the window steady while the hands stay inside it
+            inset_x, inset_y = (rx1 - rx0) * 0.1, (ry1 - ry0) * 0.1
+            if (bx0 > rx0 + inset_x and bx1 < rx1 - inset_x and
+                    by0 > ry0 + inset_y and by1 < ry1 - inset_y):
+                return
+        side = max(bx1 - bx0, by1 - by0) * (1 + 2 * self.roi_margin)
+        side = max(side, min(w, h) * 0.35)
+        cx, cy = (bx0 + bx1) / 2, (by0 + by1) / 2
+        self._roi = (int(max(0, cx - side / 2)), int(max(0, cy - side / 2)),
+                     int(min(w, cx + side / 2)), int(min(h, cy + side / 2)))
+
+    def _adapt_tier(self, elapsed_ms: float) -> None:
+        self.latency_ms = elapsed_ms if self.latency_ms == 0.0 else 0.9 * self.latency_ms + 0.1 * elapsed_ms
+        budget = self.config.HAND_LATENCY_BUDGET_MS
+        if budget <= 0:
+            return
+        if self._tier_cooldown > 0:
+            self._tier_cooldown -= 1
+            return
+        # cost per camera frame once skipped frames are amortized in
+        per_frame_ms = self.latency_ms / self.inference_interval
+        if per_frame_ms > budget:
+            if self.tier_index < len(self.tiers) - 1:
+                self.tier_index += 1
+            elif self.inference_interval <= self.config.HAND_MAX_SKIP:
+                self.inference_interval += 1
+            self._tier_cooldown = 15
+        elif per_frame_ms < budget * 0.5:
+            if self.inference_interval > 1:
+                self.inference_interval -= 1
+            elif self.tier_index > 0:
+                self.tier_index -= 1
+            self._tier_cooldown = 15
+
+    def filter_state(self) -> dict:
+        """Motion filter and skip-frame state, for debugging."""
+        return {
+            "inferenceInterval": self.inference_interval,
+            "framesUntilInference": self._frames_until_inference,
+            "hands": [f.state() for f in self.filters],
+        }
+
+    def stats(self) -> dict:
+        return {
+            "tier": self.tier.name,
+            "latencyMs": round(self.latency_ms, 2),
+            "roi": self._roi,
+            "filter": self.filter_state(),
+        }
+
+    def close(self) -> None:
+        for model in self._models.values():
+            model.close()
+
+    def _get_hand_center(self, landmarks: np.ndarray) -> Point:
+        return float(landmarks[:, 0].mean()), float(landmarks[:, 1].mean())
 
     def _distance(self, p1: Point, p2: Point) -> float:
         return math.hypot(p1[0] - p2[0], p1[1] - p2[1])
@@ -136,14 +509,16 @@ class HandTracker:
 class AIAgent:
 
 
-    def __init__(self, config: Config) -> None:
+    def __init__(self, config: Config, rng: Optional[random.Random] = None) -> None:
         self.config = config
+        self.rng = rng or random.Random()
         # how aggressively AI steers (-1..1)
         self.aggression = 0.9
         # reaction distance for obstacle avoidance
         self.obstacle_avoid_dist = 180
         # keep some memory for smoothing
         self.last_steer = 0.0
+        self.steer_smoothing = 0.85
 
     def decide(self, car_x: float, car_y: float, car_speed: float, obstacles: List[dict], opponents: List[dict]) -> Tuple[float, bool]:
         """
@@ -182,7 +557,7 @@ class AIAgent:
         steer *= self.aggression
         steer = clamp(steer, -self.config.MAX_STEERING, self.config.MAX_STEERING)
         # smoothing
-        steer = 0.85 * self.last_steer + 0.15 * steer
+        steer = self.steer_smoothing * self.last_steer + (1 - self.steer_smoothing) * steer
         self.last_steer = steer
 
         # throttle decision: accelerate if below max, slow if obstacle very close
@@ -199,10 +574,10 @@ class AIAgent:
     def decide_for_opponent(self, opp: dict, obstacles: List[dict]) -> None:
 
         # occasionally choose a target x (lane change)
-        if opp.get('lane_change_target') is None or random.random() < 0.01:
+        if opp.get('lane_change_target') is None or self.rng.random() < 0.01:
             road_left = (self.config.WIDTH - self.config.TRACK_WIDTH) // 2 + 40
             road_right = road_left + self.config.TRACK_WIDTH - 80
-            opp['lane_change_target'] = random.randint(road_left, road_right)
+            opp['lane_change_target'] = self.rng.randint(road_left, road_right)
             opp['lane_change_timer'] = 0
 
         # move toward target
@@ -220,33 +595,68 @@ class AIAgent:
                 opp['x'] += -5 if dx > 0 else 5
 
         # random slight speed variation
-        opp['speed'] = clamp(opp['speed'] + random.uniform(-0.1, 0.15), 2.5, 8.5)
+        opp['speed'] = clamp(opp['speed'] + self.rng.uniform(-0.1, 0.15), 2.5, 8.5)
 
 # --------------------------
 # Game Logic
 # --------------------------
 class GameLogic:
-    """Pure game state + update logic."""
+    """Pure game state + update logic.
 
-    def __init__(self, config: Config) -> None:
+    ``step`` advances the world by one fixed ``dt`` of 1 / Config.SIM_HZ.
+    Speeds, spawn chances and timers are written per 30 Hz tick and scaled
+    by ``tick_scale``, so the game plays the same at any SIM_HZ.
+
+    All timing goes through ``clock`` and all randomness through seeded
+    ``rng`` streams. With a StepClock, which ``step`` advances by ``dt``,
+    the same seed and inputs always produce the same world.
+    """
+
+    # print level-ups; planners turn this off on the worlds they roll forward
+    verbose = True
+
+    def __init__(self, config: Config, clock: Optional[Callable[[], float]] = None,
+                 rng: Optional[RandomStreams] = None) -> None:
         self.config = config
+        self.clock = clock or time.time
+        self.rng = rng or RandomStreams(config.SEED if config.SEED >= 0 else None)
+        # what appears where, and how traffic drifts, draw from separate streams
+        self.spawn_rng = self.rng.numpy('spawn')
+        self.traffic_rng = self.rng.numpy('traffic')
+        self.dt = 1.0 / config.SIM_HZ
+        self.tick_scale = BASE_TICK_HZ * self.dt
+        # opponent AI decides at the base tick rate, whatever SIM_HZ is
+        self._opponent_ai_due = 1.0
+        self._score_carry = 0.0
         # Car (player)
         self.car_x = config.WIDTH // 2
         self.car_y = config.HEIGHT - 120
         self.car_speed = 0.0
+        # car position at the start of the step, for swept collisions and interpolation
+        self.prev_car_x = self.car_x
+        self.prev_car_y = self.car_y
         # Steering smoothing
         self.current_steering = 0.0
         self.steering_smoothing = 0.8
 
         # Track & objects
-        self.track_lines = [i for i in range(0, config.HEIGHT + 100, config.LINE_GAP)]
+        # distance scrolled modulo LINE_GAP; lane marking positions follow from it
+        self.track_offset = 0.0
         self.line_speed = 5
-        self.obstacles: List[dict] = []
-        self.opponent_cars: List[dict] = []
-        self.power_ups: List[dict] = []
+        # entities live in struct-of-arrays tables; obstacles, opponent_cars,
+        # power_ups and particles are dict-like views over them
+        # px/py hold each entity's position at the start of the step
+        self.obstacle_table = EntityTable('obstacle', OBSTACLE_TYPES, extra_columns=('px', 'py'))
+        self.opponent_table = EntityTable('opponent', ('car',), extra_columns=('px', 'py', 'lane_change_timer', 'lane_change_target'),
+                                          optional_columns=('lane_change_target',))
+        self.power_up_table = EntityTable('power_up', POWER_UP_TYPES, extra_columns=('px', 'py', 'pulse'))
+        self.particle_table = EntityTable('particle', PARTICLE_COLORS, extra_columns=('vx', 'vy', 'life'), type_key='color')
+        self.entity_tables = {'obstacle': self.obstacle_table, 'opponent': self.opponent_table,
+                              'power_up': self.power_up_table}
+        self.collisions = CollisionEngine()
 
         # Timers & gameplay
-        self.last_obstacle_spawn = time.time()
+        self.last_obstacle_spawn = self.clock()
         self.obstacle_spawn_rate = 2.0
         self.score = 0
         self.high_score = 0
@@ -255,118 +665,192 @@ class GameLogic:
         self.boost_time = 0.0
         self.invincible = False
         self.invincible_time = 0.0
-        self.particles: List[dict] = []
         self.screen_shake = 0
 
+    @property
+    def obstacles(self) -> EntityView:
+        return self.obstacle_table.view()
+
+    @property
+    def opponent_cars(self) -> EntityView:
+        return self.opponent_table.view()
+
+    @property
+    def power_ups(self) -> EntityView:
+        return self.power_up_table.view()
+
+    @property
+    def particles(self) -> EntityView:
+        return self.particle_table.view()
+
     # --- spawning and object updates ---
     def spawn_obstacle(self) -> None:
-        now = time.time()
+        now = self.clock()
         if now - self.last_obstacle_spawn <= self.obstacle_spawn_rate:
             return
         road_left = (self.config.WIDTH - self.config.TRACK_WIDTH) // 2
         road_right = road_left + self.config.TRACK_WIDTH
-        ox = random.randint(road_left + 30, road_right - 30)
-        obstacle = {'x': ox, 'y': -50, 'width': 30, 'height': 40, 'type': random.choice(['barrier', 'oil', 'debris'])}
-        self.obstacles.append(obstacle)
+        rng = self.spawn_rng
+        ox = int(rng.integers(road_left + 30, road_right - 30, endpoint=True))
+        self.obstacle_table.add(ox, -50, width=30, height=40, type_name=OBSTACLE_TYPES[rng.integers(len(OBSTACLE_TYPES))])
         self.last_obstacle_spawn = now
         self.obstacle_spawn_rate = max(1.0, 3.0 - (self.level * 0.2))
 
     def spawn_opponent(self) -> None:
-        if len(self.opponent_cars) >= 3:
+        if self.opponent_table.n >= self.config.MAX_OPPONENTS:
             return
         # slightly higher chance to spawn opponents than before so AI has company
-        if random.random() > 0.04:
+        rng = self.spawn_rng
+        if rng.random() > self._per_tick_chance(0.04):
             return
         road_left = (self.config.WIDTH - self.config.TRACK_WIDTH) // 2
         road_right = road_left + self.config.TRACK_WIDTH
-        ox = random.randint(road_left + 40, road_right - 40)
-        opponent = {'x': ox, 'y': -80, 'speed': random.randint(3, 7), 'lane_change_timer': 0, 'lane_change_target': None}
-        self.opponent_cars.append(opponent)
+        ox = int(rng.integers(road_left + 40, road_right - 40, endpoint=True))
+        self.opponent_table.add(ox, -80, speed=int(rng.integers(3, 7, endpoint=True)), lane_change_timer=0,
+                                lane_change_target=None)
 
     def spawn_power_up(self) -> None:
-        if len(self.power_ups) >= 1:
+        if self.power_up_table.n >= 1:
             return
-        if random.random() > 0.005:
+        rng = self.spawn_rng
+        if rng.random() > self._per_tick_chance(0.005):
             return
         road_left = (self.config.WIDTH - self.config.TRACK_WIDTH) // 2
         road_right = road_left + self.config.TRACK_WIDTH
-        px = random.randint(road_left + 20, road_right - 20)
-        self.power_ups.append({'x': px, 'y': -30, 'type': random.choice(['boost', 'invincible', 'score']), 'pulse': 0.0})
+        px = int(rng.integers(road_left + 20, road_right - 20, endpoint=True))
+        self.power_up_table.add(px, -30, type_name=POWER_UP_TYPES[rng.integers(len(POWER_UP_TYPES))], pulse=0.0)
+
+    def _per_tick_chance(self, p: float) -> float:
+        """Chance per step of an event that has chance ``p`` per base tick."""
+        return 1.0 - (1.0 - p) ** self.tick_scale
 
     def update_track_lines(self) -> None:
-        self.track_lines = [line + self.line_speed for line in self.track_lines]
-        self.track_lines = [line for line in self.track_lines if line < self.config.HEIGHT + 50]
-        while len(self.track_lines) == 0 or self.track_lines[0] > -self.config.LINE_GAP:
-            if len(self.track_lines) == 0:
-                new_line = -self.config.LINE_GAP
-            else:
-                new_line = self.track_lines[0] - self.config.LINE_GAP
-            self.track_lines.insert(0, new_line)
+        self.track_offset = (self.track_offset + self.line_speed * self.tick_scale) % self.config.LINE_GAP
+
+    @property
+    def track_lines(self) -> List[float]:
+        return track_line_positions(self.track_offset, self.config)
 
     def update_obstacles(self) -> None:
-        for o in self.obstacles[:]:
-            o['y'] += self.line_speed + 2
-            if o['y'] > self.config.HEIGHT:
-                self.obstacles.remove(o)
+        t = self.obstacle_table
+        if not t.n:
+            return
+        y = t.y
+        y += (self.line_speed + 2) * self.tick_scale
+        np.less_equal(y, self.config.HEIGHT, out=t.alive)
+        t.compact()
 
     def update_opponents(self) -> None:
-        for opp in self.opponent_cars[:]:
-            opp['y'] += opp['speed']
-            opp['lane_change_timer'] += 1
-            if opp['lane_change_timer'] > 60 and random.random() < 0.1:
-                opp['x'] += random.randint(-2, 2)
-                opp['lane_change_timer'] = 0
-            road_left = (self.config.WIDTH - self.config.TRACK_WIDTH) // 2 + 40
-            road_right = road_left + self.config.TRACK_WIDTH - 80
-            opp['x'] = clamp(opp['x'], road_left, road_right)
-            if opp['y'] > self.config.HEIGHT:
-                self.opponent_cars.remove(opp)
-                self.score += 50
+        t = self.opponent_table
+        if not t.n:
+            return
+        x, y, timer = t.x, t.y, t.col('lane_change_timer')
+        y += t.speed * self.tick_scale
+        timer += self.tick_scale
+        drift = (timer > 60) & (self.traffic_rng.random(t.n) < self._per_tick_chance(0.1))
+        if drift.any():
+            x[drift] += self.traffic_rng.integers(-2, 2, size=int(drift.sum()), endpoint=True)
+            timer[drift] = 0
+        road_left = (self.config.WIDTH - self.config.TRACK_WIDTH) // 2 + 40
+        road_right = road_left + self.config.TRACK_WIDTH - 80
+        np.maximum(x, road_left, out=x)
+        np.minimum(x, road_right, out=x)
+        np.less_equal(y, self.config.HEIGHT, out=t.alive)
+        self.score += 50 * (t.n - int(np.count_nonzero(t.alive)))
+        t.compact()
 
     def update_power_ups(self) -> None:
-        for p in self.power_ups[:]:
-            p['y'] += self.line_speed + 1
-            p['pulse'] += 0.2
-            if p['y'] > self.config.HEIGHT:
-                self.power_ups.remove(p)
+        t = self.power_up_table
+        if not t.n:
+            return
+        y, pulse = t.y, t.col('pulse')
+        y += (self.line_speed + 1) * self.tick_scale
+        pulse += 0.2 * self.tick_scale
+        np.less_equal(y, self.config.HEIGHT, out=t.alive)
+        t.compact()
 
     # --- gameplay updates ---
     def update_car_physics(self, steering_input: float, hand_detected: bool) -> None:
+        scale = self.tick_scale
         steering_factor = 0.2 * (1 + self.car_speed / 10)
         # smoothing
-        self.current_steering = (self.steering_smoothing * self.current_steering +
-                                 (1 - self.steering_smoothing) * steering_input)
+        smoothing = self.steering_smoothing ** scale
+        self.current_steering = smoothing * self.current_steering + (1 - smoothing) * steering_input
         if not hand_detected:
-            self.current_steering *= 0.9
+            self.current_steering *= 0.9 ** scale
 
-        self.car_x += self.current_steering * steering_factor
+        self.car_x += self.current_steering * steering_factor * scale
         road_left = (self.config.WIDTH - self.config.TRACK_WIDTH) // 2 + 25
         road_right = road_left + self.config.TRACK_WIDTH - 50
         self.car_x = clamp(self.car_x, road_left, road_right)
 
         if hand_detected:
-            self.car_speed = min(self.config.MAX_SPEED, self.car_speed + self.config.ACCELERATION)
+            self.car_speed = min(self.config.MAX_SPEED, self.car_speed + self.config.ACCELERATION * scale)
         else:
             # slower deceleration if AI is controlling (we'll set hand_detected True when AI wants throttle)
-            self.car_speed = max(0.0, self.car_speed - self.config.ACCELERATION * 2)
+            self.car_speed = max(0.0, self.car_speed - self.config.ACCELERATION * 2 * scale)
 
     def update_game_state(self) -> None:
         new_level = (self.score // 1000) + 1
         if new_level > self.level:
             self.level = new_level
-            print(f"Level up! Now at level {self.level}")
+            if self.verbose:
+                print(f"Level up! Now at level {self.level}")
         if self.score > self.high_score:
             self.high_score = self.score
-        if self.boost_active and time.time() - self.boost_time > 3:
+        if self.boost_active and self.clock() - self.boost_time > 3:
             self.boost_active = False
         base_speed = 5 + (self.level - 1) * 0.5
         self.line_speed = int(base_speed)
-        self.score += int(self.car_speed)
+        # whole points only, carrying the fraction a short step earns
+        self._score_carry += int(self.car_speed) * self.tick_scale
+        points = int(self._score_carry)
+        self._score_carry -= points
+        self.score += points
+
+    def step(self, steering_input: float, throttle: bool, opponent_ai=None) -> Optional[str]:
+        """Advance the world by one fixed step and return what the car hit, if anything.
+
+        ``opponent_ai`` is a BatchedOpponentController, which decides for
+        all opponents at once, or any agent with ``decide_for_opponent``,
+        called per opponent. It is consulted once per base tick rather than
+        every step.
+        """
+        advance = getattr(self.clock, 'advance', None)
+        if advance is not None:
+            advance(self.dt)
+        self._remember_positions()
+        self.spawn_obstacle()
+        self.spawn_opponent()
+        self.spawn_power_up()
+        self.update_track_lines()
+        self.update_obstacles()
+        if opponent_ai is not None:
+            self._opponent_ai_due += self.tick_scale
+            if self._opponent_ai_due >= 1.0:
+                self._opponent_ai_due -= 1.0
+                decide_opponents = getattr(opponent_ai, 'decide_opponents', None)
+                if decide_opponents is not None:
+                    decide_opponents(self.opponent_table, self.obstacle_table)
+                else:
+                    obstacles = self.obstacles
+                    for opp in self.opponent_cars:
+                        opponent_ai.decide_for_opponent(opp, obstacles)
+        self.update_opponents()
+        self.update_power_ups()
+        self.update_car_physics(steering_input, throttle)
+        self.update_game_state()
+        return self.check_collisions()
+
+    def interpolated(self, table: EntityTable, alpha: float) -> Tuple[np.ndarray, np.ndarray]:
+        """Entity positions ``alpha`` of the way from the previous step to the current one."""
+        px, py = table.col('px'), table.col('py')
+        return px + (table.x - px) * alpha, py + (table.y - py) * alpha
 
     # --- interactions ---
     def activate_boost(self) -> None:
         self.boost_active = True
-        self.boost_time = time.time()
+        self.boost_time = self.clock()
         self.car_speed = min(self.config.MAX_SPEED + 5, self.car_speed + 3)
 
     def collect_power_up(self, ptype: str) -> None:
@@ -374,32 +858,48 @@ class GameLogic:
             self.activate_boost()
         elif ptype == 'invincible':
             self.invincible = True
-            self.invincible_time = time.time()
+            self.invincible_time = self.clock()
         elif ptype == 'score':
             self.score += 200
 
     def check_collisions(self) -> Optional[str]:
-        car_rect = {'left': self.car_x - 20, 'right': self.car_x + 20, 'top': self.car_y - 40, 'bottom': self.car_y + 40}
-        if not self.invincible:
-            for o in self.obstacles[:]:
-                if (car_rect['left'] < o['x'] + o['width'] and car_rect['right'] > o['x'] and
-                        car_rect['top'] < o['y'] + o['height'] and car_rect['bottom'] > o['y']):
-                    self.obstacles.remove(o)
-                    return o['type']
-            for opp in self.opponent_cars[:]:
-                if (car_rect['left'] < opp['x'] + 20 and car_rect['right'] > opp['x'] - 20 and
-                        car_rect['top'] < opp['y'] + 40 and car_rect['bottom'] > opp['y'] - 40):
-                    self.opponent_cars.remove(opp)
-                    return 'opponent'
-        for p in self.power_ups[:]:
-            if (car_rect['left'] < p['x'] + 15 and car_rect['right'] > p['x'] - 15 and
-                    car_rect['top'] < p['y'] + 15 and car_rect['bottom'] > p['y'] - 15):
-                self.power_ups.remove(p)
-                self.collect_power_up(p['type'])
+        kinds = ('power_up',) if self.invincible else KINDS
+        if self.config.SWEPT_COLLISIONS:
+            contacts = self.collisions.contacts([self.car_x], [self.car_y], self.entity_tables,
+                                                [self.prev_car_x], [self.prev_car_y], kinds=kinds)
+        else:
+            contacts = self.collisions.contacts([self.car_x], [self.car_y], self.entity_tables, kinds=kinds)
+        if not len(contacts):
+            return None
+
+        # a crash ends the check: the first obstacle or opponent hit is removed
+        crashes = contacts.select(contacts.kind != KIND_CODES['power_up'])
+        if len(crashes):
+            kind = KINDS[crashes.kind[0]]
+            table = self.entity_tables[kind]
+            index = int(crashes.index[0])
+            result = table.type_names[table.type[index]] if kind == 'obstacle' else 'opponent'
+            table.remove(index)
+            return result
+
+        pups = self.power_up_table
+        collected = contacts.type_names()
+        pups.alive[contacts.index] = False
+        pups.compact()
+        for ptype in collected:
+            self.collect_power_up(ptype)
         return None
 
+    def _remember_positions(self) -> None:
+        self.prev_car_x = self.car_x
+        self.prev_car_y = self.car_y
+        for table in self.entity_tables.values():
+            table.col('px')[:] = table.x
+            table.col('py')[:] = table.y
+
     def restart(self) -> None:
-        self.__init__(self.config)
+        # keep the clock and the random streams running across games
+        self.__init__(self.config, self.clock, self.rng)
 
 
 # Rendering (OpenCV)
@@ -433,6 +933,7 @@ class Renderer:
         road_left = (self.config.WIDTH - self.config.TRACK_WIDTH) // 2
         road_right = road_left + self.config.TRACK_WIDTH
         for y in state.track_lines:
+            y = int(y)
             if 0 <= y <= self.config.HEIGHT:
                 cv2.rectangle(frame, (self.config.WIDTH//2 - 3, y), (self.config.WIDTH//2 + 3, y + 40), (0,255,255), -1)
                 cv2.rectangle(frame, (road_left, y), (road_left + 15, y + 40), self.colors['lines'], -1)
@@ -444,7 +945,7 @@ class Renderer:
                 cv2.rectangle(frame, (int(o['x'] - o['width']//2), int(o['y'])),
                               (int(o['x'] + o['width']//2), int(o['y'] + o['height'])), (0,165,255), -1)
             elif o['type'] == 'oil':
-                cv2.circle(frame, (int(o['x']), int(o['y'] + o['height']//2)), o['width']//2, (20,20,20), -1)
+                cv2.circle(frame, (int(o['x']), int(o['y'] + o['height']//2)), int(o['width']//2), (20,20,20), -1)
             else:
                 pts = np.array([[o['x'], o['y']], [o['x'] - o['width']//2, o['y'] + o['height']], [o['x'] + o['width']//2, o['y'] + o['height']]], np.int32)
                 cv2.fillPoly(frame, [pts], (100,100,100))
@@ -469,7 +970,7 @@ class Renderer:
 
     def _draw_particles(self, frame: np.ndarray, state: GameLogic) -> None:
         for p in state.particles:
-            size = max(1, p.get('life', 30) // 5)
+            size = max(1, int(p.get('life', 30) // 5))
             cv2.circle(frame, (int(p['x']), int(p['y'])), size, p['color'], -1)
 
     def _draw_hud(self, frame: np.ndarray, state: GameLogic, hand_detected: bool, ai_active: bool) -> None:
@@ -497,13 +998,21 @@ class Renderer:
 class GameController:
     def __init__(self, config: Config) -> None:
         self.config = config
-        self.logic = GameLogic(config)
+        # sim time only moves with sim steps, so a seeded game replays exactly
+        self.logic = GameLogic(config, clock=StepClock())
         self.renderer = Renderer(config)
         self.tracker = HandTracker(config)
-        self.ai = AIAgent(config)
+        self.ai = AIAgent(config, rng=self.logic.rng.python('ai'))
+        # all opponent cars are driven in one vectorized pass per tick
+        self.opponents = BatchedOpponentController(config, self.logic.rng.numpy('opponents'))
         self.running = True
         self.game_over = False
         self.last_frame_time = time.time()
+        self.target_fps = 30.0
+        self.fps = 0.0
+        # per-stage motion-to-screen latency, printed when the game exits
+        self.latency = LatencyStats()
+        self.stepper = FixedStepper(config.SIM_HZ, config.SIM_MAX_CATCHUP)
 
         # AI takeover settings
         self.no_hand_start: Optional[float] = None
@@ -511,20 +1020,35 @@ class GameController:
         self.ai_active = False
 
     def run(self) -> None:
-        cap = cv2.VideoCapture(0)
-        if not cap.isOpened():
-            print("Could not open camera")
+        capture = CameraCapture(open_frame_source(self.config.FRAME_SOURCE, self.config.FRAME_SOURCE_REALTIME))
+        if not capture.start():
+            print(f"Could not open frame source {self.config.FRAME_SOURCE}")
             return
 
         print("Starting Advanced Virtual F1 Racing Game with AI")
+        cam: Optional[np.ndarray] = None
+        hand_steering, hand_detected = 0.0, False
+        captured_at = inferred_at = 0.0
+        trace_id = 0
         while self.running:
-            ret, cam = cap.read()
-            if not ret:
+            tick_start = time.time()
+            # Process hand input whenever the capture thread has a fresh frame
+            captured = capture.read()
+            if captured is not None:
+                cam = captured.frame
+                hand_steering, hand_detected = self.tracker.process_frame(cam)
+                captured_at, inferred_at = captured.timestamp, time.monotonic()
+            elif not capture.is_running:
                 break
-            cam = cv2.flip(cam, 1)
-
-            # Process hand input
-            steering_input, hand_detected = self.tracker.process_frame(cam)
+            elif cam is None:
+                time.sleep(0.005)
+                continue
+            steering_input = hand_steering
+            trace_id += 1
+            trace = FrameTrace(trace_id)
+            trace.mark("capture", captured_at)
+            trace.mark("inference", inferred_at)
+            trace.mark("tick")
 
             # AI takeover logic: if hands absent for a while, AI steers
             now = time.time()
@@ -551,56 +1075,57 @@ class GameController:
                 hand_detected_for_physics = throttle
             else:
                 hand_detected_for_physics = hand_detected
-
-            if not self.game_over:
-                # Spawning
-                self.logic.spawn_obstacle()
-                self.logic.spawn_opponent()
-                self.logic.spawn_power_up()
-                # Updates
-                self.logic.update_track_lines()
-                self.logic.update_obstacles()
-                # Let AI tweak opponents before they move
-                for opp in self.logic.opponent_cars:
-                    self.ai.decide_for_opponent(opp, self.logic.obstacles)
-                self.logic.update_opponents()
-                self.logic.update_power_ups()
-                self.logic.update_car_physics(steering_input, hand_detected_for_physics)
-                self.logic.update_game_state()
-                # Collisions
-                collision = self.logic.check_collisions()
+            trace.mark("ai")
+
+            # run however many fixed sim steps the elapsed time calls for
+            steps = self.stepper.advance()
+            for _ in range(steps):
+                if self.game_over:
+                    # game over behaviour could be extended
+                    break
+                collision = self.logic.step(steering_input, hand_detected_for_physics, opponent_ai=self.opponents)
                 if collision:
                     print(f"Collision: {collision}")
                     self.game_over = True
-            else:
-                # game over behaviour could be extended
-                pass
+            trace.mark("physics")
 
             # Render
             out_frame = self.renderer.render_frame(self.logic, cam, hand_detected, self.ai_active)
             cv2.imshow('Advanced Virtual F1 (refactor + AI)', out_frame)
+            trace.mark("render")
+            self.latency.record(trace)
 
             key = cv2.waitKey(1) & 0xFF
             if key == ord('q'):
                 self.running = False
             elif key == ord('r'):
                 self.logic.restart()
+                self.stepper.reset()
                 self.game_over = False
                 self.ai_active = False
                 self.no_hand_start = None
             elif key == ord('b'):
                 self.logic.activate_boost()
 
-            # basic FPS calc (not used further here)
+            # pace the loop ourselves now that camera reads no longer block
+            remaining = 1.0 / self.target_fps - (time.time() - tick_start)
+            if remaining > 0:
+                time.sleep(remaining)
+
+            # basic FPS calc
             now = time.time()
-            fps = 1.0 / (now - self.last_frame_time) if now != self.last_frame_time else 0.0
+            self.fps = 1.0 / (now - self.last_frame_time) if now != self.last_frame_time else 0.0
+            self.latency.add("frameInterval", (now - self.last_frame_time) * 1000.0)
             self.last_frame_time = now
 
-        cap.release()
+        capture.stop()
         cv2.destroyAllWindows()
+        print("Latency (ms) per stage:")
+        for stage, pct in self.latency.summary().items():
+            print(f"  {stage:>14}: p50 {pct['p50']:7.2f}  p95 {pct['p95']:7.2f}  p99 {pct['p99']:7.2f}")
 
 
 if __name__ == '__main__':
-    cfg = Config()
+    cfg = Config.from_env()
     controller = GameController(cfg)
     controller.run()
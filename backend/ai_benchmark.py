@@ -0,0 +1,337 @@
+# ai_benchmark.py
+"""Headless AI benchmark over a fixed suite of seeded scenarios.
+
+    python ai_benchmark.py -o bench.json
+    python ai_benchmark.py --agents improved,grid --baseline bench.json
+    python ai_benchmark.py --parity  # ImprovedAIAgent's array path against decide()
+
+Every agent drives the same scenarios: seeded GameLogic worlds that start
+at a given level, with obstacles spawning ``density`` times as often as
+the level sets and a given opponent cap. Opponents are driven the way the
+server drives them. Nothing is captured or rendered. The car decides once
+per 30 Hz base tick and holds its decision over the sim steps between, as
+it does in the server.
+
+The report is JSON with sorted keys: per agent and scenario the ticks
+survived, score gained, what ended the run, decisions made and decision
+latency percentiles and mean car speed, plus a summary per agent. Agents
+that plan to a per-decision time budget also count ``over_budget``, the
+decisions that took longer than the budget plus lookahead_agent's
+OVERRUN_EPSILON. For every other agent survival, score and collision
+causes are deterministic for a given tree, so any change in them between
+two reports is a change in the agent; only the timings are noisy. Budgeted
+agents search as far as the wall clock lets them, so their results vary
+from run to run too.
+
+``--parity`` checks that ImprovedAIAgent.decide_arrays, the path the
+server and the tables-based agents use, decides as decide() does: twin
+agents see the same world every tick of every scenario, one through each
+path, and the largest steering difference and any throttle mismatches
+are reported.
+
+``--baseline`` compares against an earlier report and exits non-zero when
+a deterministic agent survives less or scores less. Latency is compared on
+the median decision time, which holds steady between runs where the tail
+does not, and a slower median is only a warning unless ``--strict-latency``
+is given.
+"""
+from __future__ import annotations
+import argparse
+import json
+import random
+import sys
+import time
+from collections import Counter
+from dataclasses import asdict, dataclass, replace
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from advanced_f1_refactor_with_ai import BASE_TICK_HZ, AIAgent, Config, GameLogic
+from improved_ai_agent import ImprovedAIAgent
+from lookahead_agent import OVERRUN_EPSILON, LookaheadAIAgent
+from occupancy import OccupancyGrid
+from opponent_controller import BatchedOpponentController
+from policy_table import TableAIAgent, TablePolicy
+from timestep import StepClock
+
+
+@dataclass(frozen=True)
+class Scenario:
+    name: str
+    seed: int
+    level: int = 1
+    # obstacle spawns per level-set interval; 2.0 spawns twice as often
+    density: float = 1.0
+    opponents: int = 3
+
+
+# the fixed suite; append to it rather than editing entries, so old reports stay comparable
+SCENARIOS = (
+    Scenario("open-road", seed=11, density=0.5, opponents=0),
+    Scenario("default", seed=12),
+    Scenario("traffic", seed=13, opponents=8),
+    Scenario("dense", seed=14, level=3, density=2.0),
+    Scenario("late-game", seed=15, level=8),
+    Scenario("rush-hour", seed=16, level=6, density=2.0, opponents=10),
+)
+
+# agent name -> factory(config, logic, policy_table_path)
+AgentFactory = Callable[[Config, GameLogic, Optional[str]], object]
+AGENTS: Dict[str, AgentFactory] = {
+    "basic": lambda cfg, logic, table: AIAgent(cfg, rng=logic.rng.python('ai')),
+    "improved": lambda cfg, logic, table: ImprovedAIAgent(cfg, rng=logic.rng.python('ai')),
+    "grid": lambda cfg, logic, table: ImprovedAIAgent(cfg, rng=logic.rng.python('ai'), grid=OccupancyGrid(cfg)),
+    "table": lambda cfg, logic, table: TableAIAgent(cfg, TablePolicy(table or cfg.AI_POLICY_TABLE, cfg),
+                                                    rng=logic.rng.python('ai')),
+    "lookahead": lambda cfg, logic, table: LookaheadAIAgent(cfg, logic, rng=logic.rng.python('ai')),
+}
+DEFAULT_AGENTS = ("basic", "improved", "grid")
+
+
+def _obstacle_interval(logic: GameLogic, density: float) -> float:
+    # GameLogic.spawn_obstacle's interval for the current level, scaled by density
+    return max(1.0, 3.0 - logic.level * 0.2) / density
+
+
+def start_world(config: Config, scenario: Scenario) -> GameLogic:
+    """A fresh world for the scenario, already at its starting level."""
+    logic = GameLogic(replace(config, SEED=scenario.seed, MAX_OPPONENTS=scenario.opponents), clock=StepClock())
+    logic.verbose = False
+    # levels follow the score, so start with the score that reaches the level
+    logic.score = logic.high_score = (scenario.level - 1) * 1000
+    logic.level = scenario.level
+    logic.line_speed = int(5 + (scenario.level - 1) * 0.5)
+    logic.obstacle_spawn_rate = _obstacle_interval(logic, scenario.density)
+    return logic
+
+
+def _decide(agent, logic: GameLogic):
+    decide_tables = getattr(agent, 'decide_tables', None)
+    if decide_tables is not None:
+        return decide_tables(logic.car_x, logic.car_y, logic.car_speed, logic.obstacle_table, logic.opponent_table)
+    return agent.decide(logic.car_x, logic.car_y, logic.car_speed, logic.obstacles, logic.opponent_cars)
+
+
+def _percentiles(latency_ns: Sequence[int]) -> dict:
+    if not len(latency_ns):
+        return {}
+    us = np.asarray(latency_ns) / 1000.0
+    p50, p95, p99 = np.percentile(us, (50, 95, 99))
+    return {"p50": round(float(p50), 1), "p95": round(float(p95), 1),
+            "p99": round(float(p99), 1), "max": round(float(us.max()), 1)}
+
+
+def run_scenario(config: Config, agent_name: str, scenario: Scenario, steps: int,
+                 policy_table: Optional[str] = None, agent_params: Optional[dict] = None) -> dict:
+    """Drive one scenario with one agent for up to ``steps`` sim steps.
+
+    ``agent_params`` overrides attributes of the agent, such as its
+    ``aggression``, before it drives.
+    """
+    logic = start_world(config, scenario)
+    agent = AGENTS[agent_name](logic.config, logic, policy_table)
+    for name, value in (agent_params or {}).items():
+        if not hasattr(agent, name):
+            raise ValueError(f"{type(agent).__name__} has no parameter {name!r}")
+        setattr(agent, name, value)
+    opponents = BatchedOpponentController(logic.config, logic.rng.numpy('opponents'))
+    steps_per_decision = max(1, round(config.SIM_HZ / BASE_TICK_HZ))
+    start_score = logic.score
+    latency_ns: List[int] = []
+    distance = 0.0
+    collision = None
+    step = 0
+    while step < steps and collision is None:
+        t0 = time.perf_counter_ns()
+        steer, throttle = _decide(agent, logic)
+        latency_ns.append(time.perf_counter_ns() - t0)
+        for _ in range(min(steps_per_decision, steps - step)):
+            step += 1
+            collision = logic.step(steer, throttle, opponent_ai=opponents)
+            distance += logic.car_speed
+            logic.obstacle_spawn_rate = _obstacle_interval(logic, scenario.density)
+            if collision:
+                break
+    run = {
+        "ticks": step,
+        "survived": collision is None,
+        "collision": collision,
+        "score": logic.score - start_score,
+        "speed_mean": round(distance / step, 3) if step else 0.0,
+        "level": logic.level,
+        "decisions": len(latency_ns),
+        "decide_ns": sum(latency_ns),
+        "latency_us": _percentiles(latency_ns),
+        "_latency_ns": latency_ns,
+    }
+    budget = getattr(agent, "budget", None)
+    if budget is not None:
+        limit_ns = (budget + OVERRUN_EPSILON) * 1e9
+        run["over_budget"] = sum(ns > limit_ns for ns in latency_ns)
+    return run
+
+
+def run_benchmark(agents: Sequence[str] = DEFAULT_AGENTS, scenarios: Sequence[Scenario] = SCENARIOS,
+                  steps: int = 3000, config: Optional[Config] = None,
+                  policy_table: Optional[str] = None) -> dict:
+    """Every agent through every scenario; the JSON-ready report."""
+    config = config or Config()
+    report = {
+        "steps": steps,
+        "sim_hz": config.SIM_HZ,
+        "scenarios": [asdict(s) for s in scenarios],
+        "agents": {},
+    }
+    for name in agents:
+        runs = {s.name: run_scenario(config, name, s, steps, policy_table) for s in scenarios}
+        latency_ns = [ns for run in runs.values() for ns in run.pop("_latency_ns")]
+        decide_ns = sum(run.pop("decide_ns") for run in runs.values())
+        summary = {
+            "ticks_mean": round(float(np.mean([run["ticks"] for run in runs.values()])), 1),
+            "survived": sum(run["survived"] for run in runs.values()),
+            "score_mean": round(float(np.mean([run["score"] for run in runs.values()])), 1),
+            "speed_mean": round(float(np.mean([run["speed_mean"] for run in runs.values()])), 3),
+            "collisions": dict(Counter(run["collision"] for run in runs.values() if run["collision"])),
+            "decisions": len(latency_ns),
+            "decisions_per_sec": round(len(latency_ns) / (decide_ns / 1e9), 1) if decide_ns else 0.0,
+            "latency_us": _percentiles(latency_ns),
+        }
+        if all("over_budget" in run for run in runs.values()):
+            summary["over_budget"] = sum(run["over_budget"] for run in runs.values())
+        report["agents"][name] = {"scenarios": runs, "summary": summary}
+    return report
+
+
+def parity_check(config: Optional[Config] = None, scenarios: Sequence[Scenario] = SCENARIOS,
+                 steps: int = 3000, tol: float = 1e-6) -> dict:
+    """Drive each scenario with ImprovedAIAgent.decide() while a twin decides through decide_arrays().
+
+    The world follows decide()'s choices. Both agents carry their lane
+    choice and steering smoothing from tick to tick, so a difference that
+    would compound shows up in later ticks too.
+    """
+    config = config or Config()
+    steps_per_decision = max(1, round(config.SIM_HZ / BASE_TICK_HZ))
+    decisions = 0
+    max_steer_diff = 0.0
+    throttle_mismatches = 0
+    first_mismatch = None
+    for scenario in scenarios:
+        logic = start_world(config, scenario)
+        scalar = ImprovedAIAgent(logic.config, rng=random.Random(scenario.seed))
+        arrays = ImprovedAIAgent(logic.config, rng=random.Random(scenario.seed))
+        opponents = BatchedOpponentController(logic.config, logic.rng.numpy('opponents'))
+        step = 0
+        collision = None
+        while step < steps and collision is None:
+            steer, throttle = scalar.decide(logic.car_x, logic.car_y, logic.car_speed,
+                                            logic.obstacles, logic.opponent_cars)
+            array_steer, array_throttle = arrays.decide_tables(logic.car_x, logic.car_y, logic.car_speed,
+                                                               logic.obstacle_table, logic.opponent_table)
+            decisions += 1
+            diff = abs(steer - array_steer)
+            max_steer_diff = max(max_steer_diff, diff)
+            throttle_mismatches += throttle != array_throttle
+            if first_mismatch is None and (diff > tol or throttle != array_throttle):
+                first_mismatch = {"scenario": scenario.name, "step": step, "steer": [steer, array_steer],
+                                  "throttle": [throttle, array_throttle]}
+            for _ in range(min(steps_per_decision, steps - step)):
+                step += 1
+                collision = logic.step(steer, throttle, opponent_ai=opponents)
+                logic.obstacle_spawn_rate = _obstacle_interval(logic, scenario.density)
+                if collision:
+                    break
+    return {"ok": first_mismatch is None, "decisions": decisions, "max_steer_diff": max_steer_diff,
+            "throttle_mismatches": throttle_mismatches, "first_mismatch": first_mismatch}
+
+
+def compare(report: dict, baseline: dict, latency_tolerance: float = 0.25,
+            strict_latency: bool = False) -> Tuple[List[str], List[str]]:
+    """Regressions and warnings of ``report`` against ``baseline``, for the agents and scenarios both have.
+
+    Any drop in ticks survived or score is a regression, except for agents
+    with a time budget, whose runs are not repeatable. A median decision
+    time more than ``latency_tolerance`` slower is a warning, or a
+    regression with ``strict_latency``.
+    """
+    problems, warnings = [], []
+    for name, current in report["agents"].items():
+        before = baseline.get("agents", {}).get(name)
+        if before is None:
+            continue
+        if "over_budget" not in current["summary"]:
+            for scenario, run in current["scenarios"].items():
+                old = before["scenarios"].get(scenario)
+                if old is None:
+                    continue
+                for key in ("ticks", "score"):
+                    if run[key] < old[key]:
+                        problems.append(f"{name}/{scenario}: {key} {old[key]} -> {run[key]}")
+        old_p50 = before["summary"]["latency_us"].get("p50")
+        new_p50 = current["summary"]["latency_us"].get("p50")
+        if old_p50 and new_p50 and new_p50 > old_p50 * (1 + latency_tolerance):
+            (problems if strict_latency else warnings).append(f"{name}: decision p50 {old_p50}us -> {new_p50}us")
+    return problems, warnings
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark AI agents over seeded scenarios")
+    parser.add_argument("--agents", default=",".join(DEFAULT_AGENTS),
+                        help=f"comma-separated, from {', '.join(AGENTS)}")
+    parser.add_argument("--scenarios", default=None, help="comma-separated scenario names (default all)")
+    parser.add_argument("--steps", type=int, default=3000, help="sim steps per scenario")
+    parser.add_argument("--policy-table", default=None, help="table for the 'table' agent")
+    parser.add_argument("-o", "--out", default=None, help="write the report here instead of stdout")
+    parser.add_argument("--baseline", default=None, help="earlier report to check for regressions")
+    parser.add_argument("--latency-tolerance", type=float, default=0.25)
+    parser.add_argument("--parity", action="store_true",
+                        help="check ImprovedAIAgent's array path against decide() instead of benchmarking")
+    parser.add_argument("--tolerance", type=float, default=1e-6, help="--parity: largest steering difference")
+    parser.add_argument("--strict-latency", action="store_true",
+                        help="fail on a slower median decision time instead of warning")
+    args = parser.parse_args()
+
+    agents = [name.strip() for name in args.agents.split(",") if name.strip()]
+    unknown = [name for name in agents if name not in AGENTS]
+    if unknown:
+        parser.error(f"unknown agents: {', '.join(unknown)}")
+    scenarios = SCENARIOS
+    if args.scenarios:
+        wanted = {name.strip() for name in args.scenarios.split(",")}
+        scenarios = tuple(s for s in SCENARIOS if s.name in wanted)
+        if len(scenarios) != len(wanted):
+            parser.error(f"unknown scenarios: {', '.join(wanted - {s.name for s in SCENARIOS})}")
+
+    if args.parity:
+        result = parity_check(Config.from_env(), scenarios, args.steps, args.tolerance)
+        print(json.dumps(result, indent=2, sort_keys=True))
+        sys.exit(0 if result["ok"] else 1)
+
+    # read first, so a run can overwrite the report it is checked against
+    baseline = None
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+
+    # F1_SIM_HZ and the like apply; the scenario sets the seed and opponent cap
+    report = run_benchmark(agents, scenarios, args.steps, Config.from_env(), args.policy_table)
+    text = json.dumps(report, indent=2, sort_keys=True)
+    if args.out:
+        with open(args.out, "w") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+
+    if baseline is not None:
+        problems, warnings = compare(report, baseline, args.latency_tolerance, args.strict_latency)
+        for warning in warnings:
+            print(f"warning: {warning}", file=sys.stderr)
+        for problem in problems:
+            print(f"regression: {problem}", file=sys.stderr)
+        if problems:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,238 @@
+# ai_sweep.py
+"""Parallel parameter sweeps for the AI agents over seeded headless episodes.
+
+    python ai_sweep.py random --agent improved --trials 64 --episodes 12 --checkpoint sweep.jsonl
+    python ai_sweep.py grid --agent improved --params aggression,steer_smoothing --points 5
+    python ai_sweep.py halving --agent improved --trials 81 --episodes 3 --eta 3
+
+An episode is one of ai_benchmark's scenarios, re-seeded per round, so
+episode ``i`` is the same world for every trial. Each (trial, episode)
+pair is one task on a process pool. Finished tasks are appended to the
+``--checkpoint`` file as they come in; a rerun with the same file only
+runs what is missing, so an interrupted sweep resumes where it stopped
+and a longer one reuses the episodes it shares with a shorter one.
+
+``halving`` is successive halving: every trial plays ``--episodes``,
+the best 1/eta by Pareto rank go on to play eta times as many, and so on
+until eta or fewer are left or ``--max-episodes`` is reached.
+
+The result is every trial's mean ticks survived and mean car speed, and
+the Pareto front of the two.
+"""
+from __future__ import annotations
+import argparse
+import itertools
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from dataclasses import replace
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from advanced_f1_refactor_with_ai import Config
+from ai_benchmark import SCENARIOS, Scenario, run_scenario
+
+# parameter -> (low, high); ints where both bounds are ints
+PARAMETER_SPACES: Dict[str, Dict[str, Tuple[float, float]]] = {
+    "improved": {
+        "aggression": (0.5, 1.0),
+        "vision_distance": (150, 450),
+        "critical_distance": (60, 160),
+        "safe_distance": (120, 300),
+        "steer_smoothing": (0.5, 0.9),
+        "lane_change_frames": (5, 40),
+    },
+    "basic": {
+        "aggression": (0.5, 1.0),
+        "obstacle_avoid_dist": (100, 300),
+        "steer_smoothing": (0.6, 0.95),
+    },
+}
+# the grid agent is ImprovedAIAgent with a different lane choice
+PARAMETER_SPACES["grid"] = PARAMETER_SPACES["improved"]
+
+# rounds of the scenario suite are re-seeded this far apart
+ROUND_SEED_STRIDE = 1000
+
+
+def episode(index: int) -> Scenario:
+    """The ``index``-th episode: the suite's scenarios in turn, re-seeded every round."""
+    scenario = SCENARIOS[index % len(SCENARIOS)]
+    return replace(scenario, seed=scenario.seed + ROUND_SEED_STRIDE * (index // len(SCENARIOS)))
+
+
+def _value(low: float, high: float, u: float):
+    value = low + (high - low) * u
+    return int(round(value)) if isinstance(low, int) and isinstance(high, int) else round(float(value), 4)
+
+
+def grid_trials(space: Dict[str, Tuple[float, float]], names: Sequence[str], points: int) -> List[dict]:
+    """Every combination of ``points`` evenly spaced values of each named parameter."""
+    axes = [sorted({_value(*space[name], u) for u in np.linspace(0.0, 1.0, points)}) for name in names]
+    return [dict(zip(names, values)) for values in itertools.product(*axes)]
+
+
+def random_trials(space: Dict[str, Tuple[float, float]], names: Sequence[str], trials: int, seed: int) -> List[dict]:
+    """``trials`` uniform draws of the named parameters."""
+    rng = np.random.default_rng(seed)
+    return [{name: _value(*space[name], rng.random()) for name in names} for _ in range(trials)]
+
+
+def pareto_front(results: Sequence[dict]) -> List[dict]:
+    """The results no other result beats on both survival and speed, by survival."""
+    front = [r for r in results
+             if not any(o["ticks_mean"] >= r["ticks_mean"] and o["speed_mean"] >= r["speed_mean"] and
+                        (o["ticks_mean"], o["speed_mean"]) != (r["ticks_mean"], r["speed_mean"]) for o in results)]
+    return sorted(front, key=lambda r: (-r["ticks_mean"], -r["speed_mean"]))
+
+
+def _pareto_ranks(results: Sequence[dict]) -> List[int]:
+    """How many results beat each one on both objectives."""
+    return [sum(o["ticks_mean"] >= r["ticks_mean"] and o["speed_mean"] >= r["speed_mean"] and
+                (o["ticks_mean"], o["speed_mean"]) != (r["ticks_mean"], r["speed_mean"]) for o in results)
+            for r in results]
+
+
+def _play(agent: str, params: dict, index: int, steps: int, config: Config) -> dict:
+    run = run_scenario(config, agent, episode(index), steps, agent_params=params)
+    return {"ticks": run["ticks"], "speed_mean": run["speed_mean"], "score": run["score"],
+            "collision": run["collision"]}
+
+
+class Sweep:
+    """Evaluates trials on a process pool, remembering every finished episode.
+
+    Results are keyed by agent, parameters, episode and step limit, and
+    appended to ``checkpoint`` (JSON lines) as they finish.
+    """
+
+    def __init__(self, agent: str, steps: int = 3000, workers: Optional[int] = None,
+                 checkpoint: Optional[str] = None, config: Optional[Config] = None) -> None:
+        self.agent = agent
+        self.steps = steps
+        self.workers = workers or os.cpu_count() or 1
+        self.checkpoint = checkpoint
+        self.config = config or Config()
+        self._done: Dict[str, dict] = {}
+        self.resumed = 0
+        self.played = 0
+        if checkpoint and os.path.exists(checkpoint):
+            with open(checkpoint) as f:
+                for line in f:
+                    line = line.strip()
+                    if not line:
+                        continue
+                    entry = json.loads(line)
+                    self._done[entry["key"]] = entry["result"]
+            self.resumed = len(self._done)
+
+    def _key(self, params: dict, index: int) -> str:
+        return json.dumps([self.agent, params, index, self.steps], sort_keys=True)
+
+    def evaluate(self, trials: Sequence[dict], episodes: int) -> List[dict]:
+        """Mean ticks survived, speed and score of each trial over episodes ``[0, episodes)``."""
+        missing = [(params, index) for params in trials for index in range(episodes)
+                   if self._key(params, index) not in self._done]
+        if missing:
+            log = open(self.checkpoint, "a") if self.checkpoint else None
+            try:
+                with ProcessPoolExecutor(max_workers=min(self.workers, len(missing))) as pool:
+                    jobs = {pool.submit(_play, self.agent, params, index, self.steps, self.config): (params, index)
+                            for params, index in missing}
+                    for job in as_completed(jobs):
+                        key = self._key(*jobs[job])
+                        result = self._done[key] = job.result()
+                        self.played += 1
+                        if log is not None:
+                            log.write(json.dumps({"key": key, "result": result}) + "\n")
+                            log.flush()
+            finally:
+                if log is not None:
+                    log.close()
+
+        out = []
+        for params in trials:
+            runs = [self._done[self._key(params, index)] for index in range(episodes)]
+            out.append({
+                "params": params,
+                "episodes": episodes,
+                "ticks_mean": round(float(np.mean([r["ticks"] for r in runs])), 1),
+                "speed_mean": round(float(np.mean([r["speed_mean"] for r in runs])), 3),
+                "score_mean": round(float(np.mean([r["score"] for r in runs])), 1),
+            })
+        return out
+
+    def successive_halving(self, trials: Sequence[dict], episodes: int, eta: int = 3,
+                           max_episodes: Optional[int] = None) -> Tuple[List[dict], List[dict]]:
+        """Play every trial, keep the best 1/eta by Pareto rank on eta times the episodes, and repeat.
+
+        Stops once eta or fewer trials are left or the next rung would
+        pass ``max_episodes``. Returns each trial's result from the last
+        rung it reached, and the results of the last rung.
+        """
+        final: Dict[str, dict] = {}
+        alive = list(trials)
+        while True:
+            results = self.evaluate(alive, episodes)
+            for result in results:
+                final[json.dumps(result["params"], sort_keys=True)] = result
+            if len(alive) <= eta or (max_episodes is not None and episodes * eta > max_episodes):
+                return list(final.values()), results
+            ranks = _pareto_ranks(results)
+            order = sorted(range(len(results)), key=lambda i: (ranks[i], -results[i]["ticks_mean"]))
+            alive = [results[i]["params"] for i in order[:max(1, len(results) // eta)]]
+            episodes *= eta
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Sweep AI agent parameters over headless episodes")
+    parser.add_argument("search", choices=("grid", "random", "halving"))
+    parser.add_argument("--agent", default="improved", choices=sorted(PARAMETER_SPACES))
+    parser.add_argument("--params", default=None, help="comma-separated parameters to vary (default all)")
+    parser.add_argument("--points", type=int, default=3, help="grid: values per parameter")
+    parser.add_argument("--trials", type=int, default=32, help="random and halving: parameter draws")
+    parser.add_argument("--episodes", type=int, default=6, help="episodes per trial (halving: on the first rung)")
+    parser.add_argument("--eta", type=int, default=3, help="halving: keep 1/eta per rung")
+    parser.add_argument("--max-episodes", type=int, default=None, help="halving: most episodes per trial")
+    parser.add_argument("--steps", type=int, default=3000, help="sim steps per episode")
+    parser.add_argument("--seed", type=int, default=0, help="random and halving: draw seed")
+    parser.add_argument("--workers", type=int, default=None, help="processes (default all cores)")
+    parser.add_argument("--checkpoint", default=None, help="JSON lines file of finished episodes, to resume from")
+    parser.add_argument("-o", "--out", default=None, help="write all results and the front here")
+    args = parser.parse_args()
+
+    space = PARAMETER_SPACES[args.agent]
+    names = [name.strip() for name in args.params.split(",")] if args.params else list(space)
+    unknown = [name for name in names if name not in space]
+    if unknown:
+        parser.error(f"unknown parameters for {args.agent}: {', '.join(unknown)}")
+
+    sweep = Sweep(args.agent, args.steps, args.workers, args.checkpoint, Config.from_env())
+    start = time.perf_counter()
+    if args.search == "grid":
+        results = finalists = sweep.evaluate(grid_trials(space, names, args.points), args.episodes)
+    elif args.search == "random":
+        results = finalists = sweep.evaluate(random_trials(space, names, args.trials, args.seed), args.episodes)
+    else:
+        # only the last rung's trials played the same episodes, so the front is taken over them
+        results, finalists = sweep.successive_halving(random_trials(space, names, args.trials, args.seed),
+                                                      args.episodes, args.eta, args.max_episodes)
+    elapsed = time.perf_counter() - start
+
+    front = pareto_front(finalists)
+    print(f"{len(results)} trials, {sweep.played} episodes played on {sweep.workers} workers "
+          f"in {elapsed:.1f}s ({sweep.resumed} loaded from the checkpoint)")
+    print("Pareto front (ticks survived vs mean speed):")
+    for r in front:
+        print(f"  ticks {r['ticks_mean']:7.1f}  speed {r['speed_mean']:6.2f}  "
+              f"({r['episodes']} episodes)  {json.dumps(r['params'], sort_keys=True)}")
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump({"agent": args.agent, "search": args.search, "steps": args.steps,
+                       "results": results, "pareto_front": front}, f, indent=2, sort_keys=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,484 @@
+# batched_sim.py
+"""Many GameLogic worlds stepped together in padded NumPy arrays.
+
+    python batched_sim.py --worlds 4096 --steps 600      # throughput
+    python batched_sim.py --parity --seed 3 --steps 5000  # compare with GameLogic
+    python batched_sim.py --opponent-ai --max-opponents 40  # AI-driven traffic
+
+BatchedGameLogic follows GameLogic.step rule for rule: spawning, entity
+updates, car physics, scoring, levels and swept collisions. Entity slots
+are compacted the same way EntityTable does it, and randomness is drawn
+from the same named streams in the same order, so a single-world batch
+reproduces a scalar GameLogic with the same seed exactly.
+"""
+from __future__ import annotations
+import argparse
+import math
+import time
+from typing import Dict, Optional, Sequence
+
+import numpy as np
+
+from advanced_f1_refactor_with_ai import BASE_TICK_HZ, OBSTACLE_TYPES, POWER_UP_TYPES, Config, GameLogic
+from collisions import CENTERED_HALF_EXTENTS, swept_hits
+from opponent_controller import BatchedOpponentController
+from rng_streams import RandomStreams
+from timestep import StepClock
+
+# collision codes returned by step(); -1 means no crash
+CRASH_NAMES = OBSTACLE_TYPES + ('opponent',)
+OPPONENT_CRASH = len(OBSTACLE_TYPES)
+NO_CRASH = -1
+
+
+class EntityBatch:
+    """(B, K) padded columns for one kind of entity, one row per world.
+
+    Slots ``[0, n[b])`` of row ``b`` are live. Like EntityTable, updates
+    clear ``alive`` and ``compact`` swap-removes the dead slots by moving
+    live slots from the tail of each row into the holes.
+    """
+
+    def __init__(self, batch: int, capacity: int, extra_columns: Sequence[str] = ()) -> None:
+        self.batch = batch
+        self.capacity = capacity
+        self.columns: Dict[str, np.ndarray] = {
+            name: np.zeros((batch, capacity))
+            for name in ('x', 'y', 'width', 'height', 'speed', 'px', 'py') + tuple(extra_columns)
+        }
+        self.type = np.zeros((batch, capacity), dtype=np.int8)
+        self.alive = np.zeros((batch, capacity), dtype=bool)
+        self.n = np.zeros(batch, dtype=np.int64)
+        # spawns dropped because a world's row was full
+        self.overflow = 0
+        self._slots = np.arange(capacity)
+
+    def __getitem__(self, name: str) -> np.ndarray:
+        return self.columns[name]
+
+    def live(self) -> np.ndarray:
+        """Mask of the slots that hold a live entity."""
+        return self._slots < self.n[:, None]
+
+    def add(self, worlds: np.ndarray, type_codes=0, **values) -> None:
+        """Append one entity to each of ``worlds``; values are scalars or per-world arrays."""
+        slot = self.n[worlds]
+        fits = slot < self.capacity
+        if not fits.all():
+            self.overflow += int(np.count_nonzero(~fits))
+        w, s = worlds[fits], slot[fits]
+        for name, col in self.columns.items():
+            value = values.get(name)
+            if value is None:
+                # previous positions start at the spawn position, like EntityTable
+                value = values[name[1]] if name in ('px', 'py') else 0.0
+            col[w, s] = value[fits] if np.ndim(value) else value
+        self.type[w, s] = type_codes[fits] if np.ndim(type_codes) else type_codes
+        self.alive[w, s] = True
+        self.n[w] += 1
+
+    def compact(self) -> None:
+        alive = self.alive & self.live()
+        keep = np.count_nonzero(alive, axis=1)
+        below = self._slots < keep[:, None]
+        # row-major nonzero lists holes and movers world by world, in slot
+        # order, and every world has as many of one as of the other
+        hb, hs = np.nonzero(below & ~alive)
+        if hb.size:
+            mb, ms = np.nonzero(~below & alive)
+            for col in self.columns.values():
+                col[hb, hs] = col[mb, ms]
+            self.type[hb, hs] = self.type[mb, ms]
+        self.n = keep
+        self.alive = self.live()
+
+    def clear(self, worlds: np.ndarray) -> None:
+        self.n[worlds] = 0
+        self.alive[worlds] = False
+
+
+class BatchedGameLogic:
+    """B independent GameLogic worlds advanced by one vectorized ``step``.
+
+    Car state, timers and scores are (B,) arrays; entities are EntityBatch
+    rows. ``step`` takes per-world steering and throttle and returns each
+    world's crash code (index into CRASH_NAMES, or -1). With ``auto_reset``
+    crashed worlds start a new game right away and their final scores are
+    kept in ``episode_scores``.
+    """
+
+    def __init__(self, config: Optional[Config] = None, batch: int = 1024, seed: Optional[int] = None,
+                 auto_reset: bool = True, obstacle_capacity: int = 16, max_opponents: Optional[int] = None) -> None:
+        self.config = config = config or Config()
+        self.batch = batch
+        self.auto_reset = auto_reset
+        self.max_opponents = max_opponents = config.MAX_OPPONENTS if max_opponents is None else max_opponents
+        self.dt = 1.0 / config.SIM_HZ
+        self.tick_scale = BASE_TICK_HZ * self.dt
+        self.rng = RandomStreams(seed if seed is not None else (config.SEED if config.SEED >= 0 else None))
+        self.spawn_rng = self.rng.numpy('spawn')
+        self.traffic_rng = self.rng.numpy('traffic')
+
+        road_left = (config.WIDTH - config.TRACK_WIDTH) // 2
+        self.road_left, self.road_right = road_left, road_left + config.TRACK_WIDTH
+
+        self.obstacles = EntityBatch(batch, obstacle_capacity)
+        self.opponents = EntityBatch(batch, max_opponents + 1, extra_columns=('lane_change_timer', 'lane_change_target'))
+        self.power_ups = EntityBatch(batch, 2, extra_columns=('pulse',))
+
+        # per-world sim time keeps running across resets, like GameLogic.restart()
+        self.time = np.zeros(batch)
+        self.car_x = np.zeros(batch)
+        self.car_y = np.zeros(batch)
+        self.prev_car_x = np.zeros(batch)
+        self.prev_car_y = np.zeros(batch)
+        self.car_speed = np.zeros(batch)
+        self.current_steering = np.zeros(batch)
+        self.line_speed = np.zeros(batch, dtype=np.int64)
+        self.last_obstacle_spawn = np.zeros(batch)
+        self.obstacle_spawn_rate = np.zeros(batch)
+        self.score = np.zeros(batch, dtype=np.int64)
+        self.high_score = np.zeros(batch, dtype=np.int64)
+        self.level = np.zeros(batch, dtype=np.int64)
+        self.boost_active = np.zeros(batch, dtype=bool)
+        self.boost_time = np.zeros(batch)
+        self.invincible = np.zeros(batch, dtype=bool)
+        self.invincible_time = np.zeros(batch)
+        self.score_carry = np.zeros(batch)
+        self.opponent_ai_due = np.zeros(batch)
+
+        self.steps = 0
+        self.episode_steps = np.zeros(batch, dtype=np.int64)
+        self.episodes = 0
+        self.episode_scores: list = []
+        self.reset()
+
+    # --- lifecycle ---
+    def reset(self, worlds: Optional[np.ndarray] = None) -> None:
+        """Start a new game in ``worlds`` (all worlds by default)."""
+        if worlds is None:
+            worlds = np.arange(self.batch)
+        elif worlds.dtype == bool:
+            worlds = np.flatnonzero(worlds)
+        cfg = self.config
+        self.car_x[worlds] = cfg.WIDTH // 2
+        self.car_y[worlds] = cfg.HEIGHT - 120
+        self.prev_car_x[worlds] = self.car_x[worlds]
+        self.prev_car_y[worlds] = self.car_y[worlds]
+        self.car_speed[worlds] = 0.0
+        self.current_steering[worlds] = 0.0
+        self.line_speed[worlds] = 5
+        self.last_obstacle_spawn[worlds] = self.time[worlds]
+        self.obstacle_spawn_rate[worlds] = 2.0
+        self.score[worlds] = 0
+        self.high_score[worlds] = 0
+        self.level[worlds] = 1
+        self.boost_active[worlds] = False
+        self.boost_time[worlds] = 0.0
+        self.invincible[worlds] = False
+        self.invincible_time[worlds] = 0.0
+        self.score_carry[worlds] = 0.0
+        self.opponent_ai_due[worlds] = 1.0
+        self.episode_steps[worlds] = 0
+        for ents in (self.obstacles, self.opponents, self.power_ups):
+            ents.clear(worlds)
+
+    def _chance(self, p: float) -> float:
+        return 1.0 - (1.0 - p) ** self.tick_scale
+
+    # --- one fixed step for every world ---
+    def step(self, steering, throttle, opponent_ai=None) -> np.ndarray:
+        steering = np.broadcast_to(np.asarray(steering, dtype=np.float64), (self.batch,))
+        throttle = np.broadcast_to(np.asarray(throttle, dtype=bool), (self.batch,))
+        self.time += self.dt
+        self._remember_positions()
+        self._spawn()
+        self._update_entities(opponent_ai)
+        self._update_car_physics(steering, throttle)
+        self._update_game_state()
+        crash = self._check_collisions()
+
+        self.steps += 1
+        self.episode_steps += 1
+        if self.auto_reset:
+            done = np.flatnonzero(crash != NO_CRASH)
+            if done.size:
+                self.episodes += done.size
+                self.episode_scores.extend(self.score[done].tolist())
+                self.reset(done)
+        return crash
+
+    def _remember_positions(self) -> None:
+        self.prev_car_x[:] = self.car_x
+        self.prev_car_y[:] = self.car_y
+        for ents in (self.obstacles, self.opponents, self.power_ups):
+            ents['px'][:] = ents['x']
+            ents['py'][:] = ents['y']
+
+    def _spawn(self) -> None:
+        rng = self.spawn_rng
+        # obstacles: on a timer that tightens with level
+        due = np.flatnonzero(self.time - self.last_obstacle_spawn > self.obstacle_spawn_rate)
+        if due.size:
+            x = rng.integers(self.road_left + 30, self.road_right - 30, size=due.size, endpoint=True)
+            kind = rng.integers(len(OBSTACLE_TYPES), size=due.size)
+            self.obstacles.add(due, type_codes=kind, x=x.astype(np.float64), y=-50.0, width=30.0, height=40.0)
+            self.last_obstacle_spawn[due] = self.time[due]
+            self.obstacle_spawn_rate[due] = np.maximum(1.0, 3.0 - self.level[due] * 0.2)
+        # opponents: up to max_opponents, by chance
+        room = np.flatnonzero(self.opponents.n < self.max_opponents)
+        if room.size:
+            go = room[rng.random(room.size) <= self._chance(0.04)]
+            if go.size:
+                x = rng.integers(self.road_left + 40, self.road_right - 40, size=go.size, endpoint=True)
+                speed = rng.integers(3, 7, size=go.size, endpoint=True)
+                self.opponents.add(go, x=x.astype(np.float64), y=-80.0, speed=speed.astype(np.float64),
+                                   lane_change_target=np.nan)
+        # power-ups: one at a time, by chance
+        room = np.flatnonzero(self.power_ups.n < 1)
+        if room.size:
+            go = room[rng.random(room.size) <= self._chance(0.005)]
+            if go.size:
+                x = rng.integers(self.road_left + 20, self.road_right - 20, size=go.size, endpoint=True)
+                kind = rng.integers(len(POWER_UP_TYPES), size=go.size)
+                self.power_ups.add(go, type_codes=kind, x=x.astype(np.float64), y=-30.0)
+
+    def _update_entities(self, opponent_ai) -> None:
+        cfg, scale = self.config, self.tick_scale
+        height = cfg.HEIGHT
+        line_speed = self.line_speed[:, None]
+
+        obs = self.obstacles
+        obs['y'][:] += (line_speed + 2) * scale
+        obs.alive = obs.live() & (obs['y'] <= height)
+        obs.compact()
+
+        if opponent_ai is not None:
+            self.opponent_ai_due += scale
+            due = self.opponent_ai_due >= 1.0
+            self.opponent_ai_due[due] -= 1.0
+            if due.any():
+                opponent_ai.decide_batch(self, due)
+
+        opp = self.opponents
+        live = opp.live()
+        x, timer = opp['x'], opp['lane_change_timer']
+        opp['y'][live] += opp['speed'][live] * scale
+        timer[live] += scale
+        # one uniform per live opponent, world by world in slot order
+        draws = np.ones(live.shape)
+        draws[live] = self.traffic_rng.random(int(np.count_nonzero(live)))
+        drift = live & (timer > 60) & (draws < self._chance(0.1))
+        n_drift = int(np.count_nonzero(drift))
+        if n_drift:
+            x[drift] += self.traffic_rng.integers(-2, 2, size=n_drift, endpoint=True)
+            timer[drift] = 0
+        lo = self.road_left + 40
+        hi = lo + cfg.TRACK_WIDTH - 80
+        np.maximum(x, lo, out=x)
+        np.minimum(x, hi, out=x)
+        opp.alive = live & (opp['y'] <= height)
+        self.score += 50 * (opp.n - np.count_nonzero(opp.alive, axis=1))
+        opp.compact()
+
+        pups = self.power_ups
+        pups['y'][:] += (line_speed + 1) * scale
+        pups['pulse'][:] += 0.2 * scale
+        pups.alive = pups.live() & (pups['y'] <= height)
+        pups.compact()
+
+    def _update_car_physics(self, steering: np.ndarray, throttle: np.ndarray) -> None:
+        cfg, scale = self.config, self.tick_scale
+        steering_factor = 0.2 * (1 + self.car_speed / 10)
+        smoothing = 0.8 ** scale
+        self.current_steering = smoothing * self.current_steering + (1 - smoothing) * steering
+        self.current_steering[~throttle] *= 0.9 ** scale
+        self.car_x += self.current_steering * steering_factor * scale
+        lo = self.road_left + 25
+        np.clip(self.car_x, lo, lo + cfg.TRACK_WIDTH - 50, out=self.car_x)
+        self.car_speed = np.where(throttle,
+                                  np.minimum(cfg.MAX_SPEED, self.car_speed + cfg.ACCELERATION * scale),
+                                  np.maximum(0.0, self.car_speed - cfg.ACCELERATION * 2 * scale))
+
+    def _update_game_state(self) -> None:
+        np.maximum(self.level, self.score // 1000 + 1, out=self.level)
+        np.maximum(self.high_score, self.score, out=self.high_score)
+        self.boost_active &= ~(self.time - self.boost_time > 3)
+        self.line_speed = (5 + (self.level - 1) * 0.5).astype(np.int64)
+        self.score_carry += np.floor(self.car_speed) * self.tick_scale
+        points = self.score_carry.astype(np.int64)
+        self.score_carry -= points
+        self.score += points
+
+    def _first_hits(self, kind: str, ents: EntityBatch):
+        """Earliest time of impact per world and the slot that has it (inf where none)."""
+        x, y = ents['x'], ents['y']
+        if kind in CENTERED_HALF_EXTENTS:
+            hw, hh = CENTERED_HALF_EXTENTS[kind]
+            left, right, top, bottom = x - hw, x + hw, y - hh, y + hh
+        else:
+            left, right, top, bottom = x, x + ents['width'], y, y + ents['height']
+        left, right, top, bottom = left - 20.0, right + 20.0, top - 40.0, bottom + 40.0
+        cx, cy = self.car_x[:, None], self.car_y[:, None]
+        live = ents.live()
+        toi = np.full(live.shape, np.inf)
+        if self.config.SWEPT_COLLISIONS:
+            sx = self.prev_car_x[:, None] + (x - ents['px'])
+            sy = self.prev_car_y[:, None] + (y - ents['py'])
+            # broad phase on the segment's bounding box, exact test on what is left
+            near = (live & (np.minimum(sx, cx) < right) & (np.maximum(sx, cx) > left) &
+                    (np.minimum(sy, cy) < bottom) & (np.maximum(sy, cy) > top))
+            w, k = np.nonzero(near)
+            if w.size:
+                hit, t = swept_hits(sx[w, k], sy[w, k], self.car_x[w], self.car_y[w],
+                                    left[w, k], top[w, k], right[w, k], bottom[w, k])
+                toi[w[hit], k[hit]] = t[hit]
+        else:
+            toi[live & (left < cx) & (cx < right) & (top < cy) & (cy < bottom)] = 1.0
+        return np.isfinite(toi), toi
+
+    def _check_collisions(self) -> np.ndarray:
+        crash = np.full(self.batch, NO_CRASH, dtype=np.int8)
+        vulnerable = ~self.invincible
+        ob_hit, ob_toi = self._first_hits('obstacle', self.obstacles)
+        op_hit, op_toi = self._first_hits('opponent', self.opponents)
+        ob_slot, op_slot = np.argmin(ob_toi, axis=1), np.argmin(op_toi, axis=1)
+        worlds = np.arange(self.batch)
+        ob_best, op_best = ob_toi[worlds, ob_slot], op_toi[worlds, op_slot]
+        # earliest contact wins; obstacles win ties, like GameLogic
+        ob_crash = vulnerable & np.isfinite(ob_best) & (ob_best <= op_best)
+        op_crash = vulnerable & np.isfinite(op_best) & ~ob_crash
+        if ob_crash.any():
+            w = worlds[ob_crash]
+            crash[w] = self.obstacles.type[w, ob_slot[w]]
+            self.obstacles.alive = self.obstacles.live()
+            self.obstacles.alive[w, ob_slot[w]] = False
+            self.obstacles.compact()
+        if op_crash.any():
+            w = worlds[op_crash]
+            crash[w] = OPPONENT_CRASH
+            self.opponents.alive = self.opponents.live()
+            self.opponents.alive[w, op_slot[w]] = False
+            self.opponents.compact()
+
+        pups = self.power_ups
+        pu_hit, _ = self._first_hits('power_up', pups)
+        pu_hit &= (crash == NO_CRASH)[:, None]
+        if pu_hit.any():
+            counts = [np.count_nonzero(pu_hit & (pups.type == code), axis=1) for code in range(len(POWER_UP_TYPES))]
+            boosts, shields, bonus = counts
+            cfg = self.config
+            got = boosts > 0
+            self.boost_active |= got
+            self.boost_time[got] = self.time[got]
+            self.car_speed = np.where(got, np.minimum(cfg.MAX_SPEED + 5, self.car_speed + 3 * boosts), self.car_speed)
+            got = shields > 0
+            self.invincible |= got
+            self.invincible_time[got] = self.time[got]
+            self.score += 200 * bonus
+            pups.alive = pups.live() & ~pu_hit
+            pups.compact()
+        return crash
+
+    # --- inspection ---
+    def world_entities(self, world: int) -> Dict[str, dict]:
+        """Live entities of one world as column lists, for debugging and parity checks."""
+        out = {}
+        for kind, ents in (('obstacle', self.obstacles), ('opponent', self.opponents), ('power_up', self.power_ups)):
+            n = int(ents.n[world])
+            out[kind] = {name: col[world, :n].tolist() for name, col in ents.columns.items()}
+            out[kind]['type'] = ents.type[world, :n].tolist()
+        return out
+
+
+def _scalar_entities(logic: GameLogic) -> Dict[str, dict]:
+    out = {}
+    for kind, table in logic.entity_tables.items():
+        out[kind] = {name: table.col(name).tolist() for name in ('x', 'y', 'speed')}
+        out[kind]['type'] = table.type.tolist()
+    return out
+
+
+def parity_check(config: Optional[Config] = None, seed: int = 0, steps: int = 3000, tol: float = 1e-9,
+                 opponent_ai: bool = False) -> dict:
+    """Step a scalar GameLogic and a one-world batch side by side and compare them.
+
+    Both draw from RandomStreams(seed) and restart after a crash. Inputs are
+    a fixed steering sweep with throttle bursts, so the cars roam the road
+    and crash now and then. With ``opponent_ai`` each side's opponents are
+    driven by a BatchedOpponentController on its own 'opponents' stream.
+    Returns the first mismatch, if any.
+    """
+    config = config or Config()
+    scalar = GameLogic(config, clock=StepClock(), rng=RandomStreams(seed))
+    scalar.verbose = False
+    batched = BatchedGameLogic(config, batch=1, seed=seed, auto_reset=False)
+    scalar_ai = batched_ai = None
+    if opponent_ai:
+        scalar_ai = BatchedOpponentController(config, scalar.rng.numpy('opponents'))
+        batched_ai = BatchedOpponentController(config, batched.rng.numpy('opponents'))
+    crashes = 0
+
+    def differ(a, b) -> bool:
+        return len(a) != len(b) or any(abs(p - q) > tol for p, q in zip(a, b))
+
+    for i in range(steps):
+        steer = 40.0 * math.sin(i / 23.0)
+        throttle = (i // 45) % 4 != 0
+        hit = scalar.step(steer, throttle, opponent_ai=scalar_ai)
+        code = int(batched.step([steer], [throttle], opponent_ai=batched_ai)[0])
+        problems = []
+        if (CRASH_NAMES[code] if code != NO_CRASH else None) != hit:
+            problems.append(f"crash {hit!r} vs {CRASH_NAMES[code] if code != NO_CRASH else None!r}")
+        for name in ('car_x', 'car_speed', 'current_steering'):
+            if abs(getattr(scalar, name) - float(getattr(batched, name)[0])) > tol:
+                problems.append(name)
+        for name in ('score', 'level', 'invincible', 'boost_active'):
+            if getattr(scalar, name) != getattr(batched, name)[0]:
+                problems.append(name)
+        ents = batched.world_entities(0)
+        for kind, cols in _scalar_entities(scalar).items():
+            for name, values in cols.items():
+                if differ(values, ents[kind][name]):
+                    problems.append(f"{kind}.{name}")
+        if problems:
+            return {"ok": False, "step": i, "crashes": crashes, "mismatch": problems}
+        if hit:
+            crashes += 1
+            scalar.restart()
+            batched.reset()
+    return {"ok": True, "steps": steps, "crashes": crashes}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Batched GameLogic throughput and parity")
+    parser.add_argument("--worlds", type=int, default=4096)
+    parser.add_argument("--steps", type=int, default=600)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--parity", action="store_true", help="compare a one-world batch with GameLogic")
+    parser.add_argument("--opponent-ai", action="store_true", help="drive opponents with BatchedOpponentController")
+    parser.add_argument("--max-opponents", type=int, default=None, help="opponent cap (default Config.MAX_OPPONENTS)")
+    args = parser.parse_args()
+
+    config = Config() if args.max_opponents is None else Config(MAX_OPPONENTS=args.max_opponents)
+    if args.parity:
+        print(parity_check(config, seed=args.seed, steps=args.steps, opponent_ai=args.opponent_ai))
+        return
+
+    sim = BatchedGameLogic(config, batch=args.worlds, seed=args.seed)
+    opponent_ai = BatchedOpponentController(config, sim.rng.numpy('opponents')) if args.opponent_ai else None
+    rng = np.random.default_rng(args.seed)
+    steering = rng.uniform(-40, 40, args.worlds)
+    start = time.perf_counter()
+    for i in range(args.steps):
+        if i % 30 == 0:
+            steering = rng.uniform(-40, 40, args.worlds)
+        sim.step(steering, True, opponent_ai=opponent_ai)
+    elapsed = time.perf_counter() - start
+    ticks = args.worlds * args.steps
+    print(f"{ticks} world-steps in {elapsed:.2f}s ({ticks / elapsed:,.0f}/s), "
+          f"{sim.episodes} episodes, mean score {np.mean(sim.episode_scores or [0]):.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,116 @@
+# camera_capture.py
+from __future__ import annotations
+import threading
+import time
+from dataclasses import dataclass
+from typing import Optional, Union
+
+import cv2
+import numpy as np
+
+from frame_sources import FrameSource, open_frame_source
+
+
+@dataclass(frozen=True)
+class CapturedFrame:
+    frame: np.ndarray
+    timestamp: float  # time.monotonic() right after the grab
+    seq: int
+
+
+class CameraCapture:
+    """Reads a FrameSource on its own thread and only ever exposes the newest frame.
+
+    Frames that are replaced before anyone reads them are counted in
+    ``frames_dropped`` instead of queuing up, so consumers always work on the
+    freshest image and never block on camera I/O.
+    """
+
+    def __init__(self, source: Union[FrameSource, int, str] = 0, flip: bool = True,
+                 max_failures: int = 50) -> None:
+        if not isinstance(source, FrameSource):
+            source = open_frame_source(str(source))
+        self.source = source
+        self.flip = flip
+        self.max_failures = max_failures
+        self.frames_captured = 0
+        self.frames_dropped = 0
+        self.read_failures = 0
+
+        self._lock = threading.Lock()
+        self._latest: Optional[CapturedFrame] = None
+        self._consumed_seq = 0
+        self._running = False
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> bool:
+        """Open the source and start the capture thread. Returns False if the source cannot be opened."""
+        if not self.source.open():
+            self.source.release()
+            return False
+        self._running = True
+        self._thread = threading.Thread(target=self._run, name="camera-capture", daemon=True)
+        self._thread.start()
+        return True
+
+    def _run(self) -> None:
+        seq = 0
+        failures = 0
+        while self._running:
+            ret, frame = self.source.read()
+            timestamp = time.monotonic()
+            if not ret:
+                self.read_failures += 1
+                failures += 1
+                if failures >= self.max_failures or self.source.exhausted:
+                    break
+                time.sleep(0.01)
+                continue
+            failures = 0
+            if self.flip:
+                frame = cv2.flip(frame, 1)
+            seq += 1
+            with self._lock:
+                if self._latest is not None and self._latest.seq != self._consumed_seq:
+                    self.frames_dropped += 1
+                self._latest = CapturedFrame(frame, timestamp, seq)
+                self.frames_captured += 1
+        self._running = False
+
+    def read(self) -> Optional[CapturedFrame]:
+        """Return the newest frame if it has not been read yet, otherwise None. Never blocks on the camera."""
+        with self._lock:
+            latest = self._latest
+            if latest is None or latest.seq == self._consumed_seq:
+                return None
+            self._consumed_seq = latest.seq
+            return latest
+
+    def peek(self) -> Optional[CapturedFrame]:
+        """Return the newest frame without marking it as consumed."""
+        with self._lock:
+            return self._latest
+
+    @property
+    def is_running(self) -> bool:
+        return self._running
+
+    def stats(self) -> dict:
+        return {
+            "captured": self.frames_captured,
+            "dropped": self.frames_dropped,
+            "readFailures": self.read_failures,
+        }
+
+    def stop(self) -> None:
+        self._running = False
+        if self._thread is not None:
+            self._thread.join(timeout=1.0)
+            self._thread = None
+        self.source.release()
+
+    def __enter__(self) -> "CameraCapture":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.stop()
@@ -0,0 +1,265 @@
+# checkpoint.py
+from __future__ import annotations
+import math
+import struct
+import time
+from dataclasses import dataclass
+from typing import List, Optional
+
+import numpy as np
+
+from rng_streams import RandomStreams
+from timestep import StepClock
+
+MAGIC = b'F1CK'
+VERSION = 1
+
+# magic, version, flags, SIM_HZ the world was stepped at
+_HEADER = struct.Struct('<4sHHd')
+_HAS_TAKEOVER = 1
+
+# GameLogic scalars, packed in this order; the clock reading follows the floats
+_FLOAT_FIELDS = ('car_x', 'car_y', 'car_speed', 'prev_car_x', 'prev_car_y', 'current_steering',
+                 'steering_smoothing', 'track_offset', '_opponent_ai_due', '_score_carry',
+                 'obstacle_spawn_rate', 'last_obstacle_spawn', 'boost_time', 'invincible_time')
+_INT_FIELDS = ('line_speed', 'score', 'high_score', 'level', 'screen_shake')
+_BOOL_FIELDS = ('boost_active', 'invincible')
+# absolute clock times, shifted on restore when the target clock is not a StepClock
+_TIMER_FIELDS = ('last_obstacle_spawn', 'boost_time', 'invincible_time')
+_LOGIC = struct.Struct(f'<{len(_FLOAT_FIELDS) + 1}d{len(_INT_FIELDS)}q{len(_BOOL_FIELDS)}?')
+
+_TABLES = ('obstacle_table', 'opponent_table', 'power_up_table', 'particle_table')
+# rows, columns, next spawn id; then the columns as one (columns, rows) float64 block,
+# type codes and ids
+_TABLE = struct.Struct('<IIq')
+
+_COUNT = struct.Struct('<I')
+_NAME = struct.Struct('<H')
+_ROOT_SEED = struct.Struct('<Q')
+# PCG64 state and increment as 64-bit halves, has_uint32, uinteger
+_PCG64 = struct.Struct('<4QBI')
+# Mersenne Twister: version, has_gauss, gauss_next, then the 625-word state
+_MT_HEAD = struct.Struct('<B?d')
+_MT_WORDS = struct.Struct('<625I')
+_MASK64 = (1 << 64) - 1
+
+_TAKEOVER = struct.Struct('<??dddq')
+
+
+@dataclass
+class TakeoverState:
+    """The hand/AI handover state of a controller and the memory of its driving agent.
+
+    ``no_hand_for`` is how long hands had been missing, rather than the wall
+    time they went missing, so it carries over to another process.
+    """
+    ai_active: bool = False
+    game_over: bool = False
+    no_hand_for: Optional[float] = None
+    last_steer: float = 0.0
+    target_lane: Optional[float] = None
+    lane_change_cooldown: int = 0
+
+    @classmethod
+    def capture(cls, ai_active: bool, game_over: bool, no_hand_start: Optional[float],
+                agent=None, now: Optional[float] = None) -> "TakeoverState":
+        now = time.time() if now is None else now
+        return cls(
+            ai_active=bool(ai_active),
+            game_over=bool(game_over),
+            no_hand_for=None if no_hand_start is None else now - no_hand_start,
+            last_steer=float(getattr(agent, 'last_steer', 0.0)),
+            target_lane=getattr(agent, 'target_lane', None),
+            lane_change_cooldown=int(getattr(agent, 'lane_change_cooldown', 0)),
+        )
+
+    @classmethod
+    def from_controller(cls, controller) -> "TakeoverState":
+        return cls.capture(controller.ai_active, controller.game_over, controller.no_hand_start, controller.ai)
+
+    def no_hand_start(self, now: Optional[float] = None) -> Optional[float]:
+        """The wall time hands went missing, rebased onto ``now``."""
+        if self.no_hand_for is None:
+            return None
+        return (time.time() if now is None else now) - self.no_hand_for
+
+    def restore_agent(self, agent) -> None:
+        agent.last_steer = self.last_steer
+        if hasattr(agent, 'target_lane'):
+            agent.target_lane = self.target_lane
+            agent.lane_change_cooldown = self.lane_change_cooldown
+
+    def apply_to_controller(self, controller) -> None:
+        controller.ai_active = self.ai_active
+        controller.game_over = self.game_over
+        controller.no_hand_start = self.no_hand_start()
+        self.restore_agent(controller.ai)
+
+
+def _optional(value: float) -> Optional[float]:
+    return None if math.isnan(value) else value
+
+
+class _Reader:
+    def __init__(self, data: bytes) -> None:
+        self.data = memoryview(data)
+        self.offset = 0
+
+    def unpack(self, st: struct.Struct) -> tuple:
+        values = st.unpack_from(self.data, self.offset)
+        self.offset += st.size
+        return values
+
+    def array(self, dtype, count: int) -> np.ndarray:
+        arr = np.frombuffer(self.data, dtype=dtype, count=count, offset=self.offset)
+        self.offset += arr.nbytes
+        return arr
+
+    def name(self) -> str:
+        (size,) = self.unpack(_NAME)
+        name = bytes(self.data[self.offset:self.offset + size]).decode()
+        self.offset += size
+        return name
+
+
+def _pack_name(parts: List[bytes], name: str) -> None:
+    raw = name.encode()
+    parts.append(_NAME.pack(len(raw)))
+    parts.append(raw)
+
+
+def _pack_streams(parts: List[bytes], streams: RandomStreams) -> None:
+    state = streams.state()
+    parts.append(_ROOT_SEED.pack(state['seed']))
+    parts.append(_COUNT.pack(len(state['numpy'])))
+    for name, bit_state in state['numpy'].items():
+        if bit_state['bit_generator'] != 'PCG64':
+            raise ValueError(f"cannot checkpoint a {bit_state['bit_generator']} stream")
+        s, inc = bit_state['state']['state'], bit_state['state']['inc']
+        _pack_name(parts, name)
+        parts.append(_PCG64.pack(s & _MASK64, s >> 64, inc & _MASK64, inc >> 64,
+                                 bit_state['has_uint32'], bit_state['uinteger']))
+    parts.append(_COUNT.pack(len(state['python'])))
+    for name, (version, words, gauss) in state['python'].items():
+        _pack_name(parts, name)
+        parts.append(_MT_HEAD.pack(version, gauss is not None, 0.0 if gauss is None else gauss))
+        parts.append(_MT_WORDS.pack(*words))
+
+
+def _read_streams(reader: _Reader) -> dict:
+    (seed,) = reader.unpack(_ROOT_SEED)
+    state = {'seed': seed, 'numpy': {}, 'python': {}}
+    (count,) = reader.unpack(_COUNT)
+    for _ in range(count):
+        name = reader.name()
+        s_lo, s_hi, inc_lo, inc_hi, has_uint32, uinteger = reader.unpack(_PCG64)
+        state['numpy'][name] = {
+            'bit_generator': 'PCG64',
+            'state': {'state': s_lo | (s_hi << 64), 'inc': inc_lo | (inc_hi << 64)},
+            'has_uint32': has_uint32,
+            'uinteger': uinteger,
+        }
+    (count,) = reader.unpack(_COUNT)
+    for _ in range(count):
+        name = reader.name()
+        version, has_gauss, gauss = reader.unpack(_MT_HEAD)
+        state['python'][name] = (version, reader.unpack(_MT_WORDS), gauss if has_gauss else None)
+    return state
+
+
+def save(logic, takeover: Optional[TakeoverState] = None) -> bytes:
+    """Serialize a GameLogic (and optionally the controller's takeover state) to bytes."""
+    flags = _HAS_TAKEOVER if takeover is not None else 0
+    parts = [_HEADER.pack(MAGIC, VERSION, flags, logic.config.SIM_HZ)]
+    get = logic.__dict__.__getitem__
+    parts.append(_LOGIC.pack(*map(get, _FLOAT_FIELDS), logic.clock(),
+                             *map(get, _INT_FIELDS), *map(get, _BOOL_FIELDS)))
+
+    for attr in _TABLES:
+        table = get(attr)
+        n = table.n
+        parts.append(_TABLE.pack(n, len(table.columns), table.next_id))
+        if n:
+            for col in table.columns.values():
+                parts.append(col[:n].tobytes())
+            parts.append(table.type_codes_array[:n].tobytes())
+            parts.append(table.ids_array[:n].tobytes())
+
+    _pack_streams(parts, logic.rng)
+
+    if takeover is not None:
+        nan = float('nan')
+        parts.append(_TAKEOVER.pack(
+            takeover.ai_active, takeover.game_over,
+            nan if takeover.no_hand_for is None else takeover.no_hand_for,
+            takeover.last_steer,
+            nan if takeover.target_lane is None else takeover.target_lane,
+            takeover.lane_change_cooldown))
+    return b''.join(parts)
+
+
+def restore(logic, data: bytes) -> Optional[TakeoverState]:
+    """Overwrite ``logic`` in place with a checkpoint; returns its takeover state, if any.
+
+    A StepClock is moved to the checkpoint's time. Any other clock keeps
+    running and the spawn, boost and invincibility timers are shifted onto
+    it instead.
+    """
+    reader = _Reader(data)
+    magic, version, flags, sim_hz = reader.unpack(_HEADER)
+    if magic != MAGIC:
+        raise ValueError("not a game checkpoint")
+    if version != VERSION:
+        raise ValueError(f"unsupported checkpoint version {version}")
+    if sim_hz != logic.config.SIM_HZ:
+        raise ValueError(f"checkpoint was taken at SIM_HZ={sim_hz}, not {logic.config.SIM_HZ}")
+
+    values = reader.unpack(_LOGIC)
+    nf, ni = len(_FLOAT_FIELDS), len(_INT_FIELDS)
+    attrs = logic.__dict__
+    attrs.update(zip(_FLOAT_FIELDS, values[:nf]))
+    saved_now = values[nf]
+    attrs.update(zip(_INT_FIELDS, values[nf + 1:nf + 1 + ni]))
+    attrs.update(zip(_BOOL_FIELDS, values[nf + 1 + ni:]))
+    if isinstance(logic.clock, StepClock):
+        logic.clock.now = saved_now
+    else:
+        shift = logic.clock() - saved_now
+        for name in _TIMER_FIELDS:
+            attrs[name] += shift
+
+    for attr in _TABLES:
+        table = attrs[attr]
+        n, ncols, next_id = reader.unpack(_TABLE)
+        if ncols != len(table.columns):
+            raise ValueError(f"{table.kind} table has {len(table.columns)} columns, checkpoint has {ncols}")
+        if n:
+            table.reserve(n)
+            block = reader.array(np.float64, ncols * n).reshape(ncols, n)
+            for col, values in zip(table.columns.values(), block):
+                col[:n] = values
+            table.type_codes_array[:n] = reader.array(np.int8, n)
+            table.ids_array[:n] = reader.array(np.int64, n)
+            table.alive_array[:n] = True
+        table.n = n
+        table.next_id = next_id
+        table.touch()
+
+    logic.rng.set_state(_read_streams(reader))
+
+    if not flags & _HAS_TAKEOVER:
+        return None
+    ai_active, game_over, no_hand_for, last_steer, target_lane, cooldown = reader.unpack(_TAKEOVER)
+    return TakeoverState(ai_active, game_over, _optional(no_hand_for), last_steer,
+                         _optional(target_lane), cooldown)
+
+
+def fork(logic):
+    """An independent copy of ``logic`` on its own StepClock and random streams.
+
+    The copy replays exactly what the original would do given the same
+    inputs, so what-if branches can be stepped and thrown away.
+    """
+    clone = type(logic)(logic.config, clock=StepClock(), rng=RandomStreams(logic.rng.seed))
+    restore(clone, save(logic))
+    return clone
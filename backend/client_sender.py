@@ -0,0 +1,94 @@
+# client_sender.py
+from __future__ import annotations
+import asyncio
+from typing import Generic, Optional, Tuple, TypeVar
+
+from fastapi import WebSocket
+
+from latency import FrameTrace, SessionLatency
+from preview import EncodedPreview
+
+T = TypeVar("T")
+
+
+class LatestMailbox(Generic[T]):
+    """A one-slot mailbox that only ever holds the newest item.
+
+    ``put`` never waits: an item that was not taken yet is replaced and
+    counted as dropped. ``get`` waits for an item and empties the slot.
+    Both must be called from the event loop's thread.
+    """
+
+    def __init__(self) -> None:
+        self._item: Optional[T] = None
+        self._full = False
+        self._ready = asyncio.Event()
+        self.puts = 0
+        self.dropped = 0
+
+    def put(self, item: T) -> None:
+        if self._full:
+            self.dropped += 1
+        self._item = item
+        self._full = True
+        self.puts += 1
+        self._ready.set()
+
+    async def get(self) -> T:
+        while not self._full:
+            await self._ready.wait()
+        self._ready.clear()
+        item, self._item, self._full = self._item, None, False
+        return item
+
+
+class ClientSender:
+    """Sends one client its game state from a task of its own.
+
+    The game loop ``publish``es each snapshot into a LatestMailbox and
+    moves on; ``run`` sends whatever is newest whenever the socket is free.
+    A client that reads slowly gets fewer, fresher snapshots instead of a
+    growing queue, and never holds up the game. Previews ride along: after
+    each snapshot the newest preview goes out if it is one the client has
+    not had. Send errors propagate out of ``run``, ending the session.
+    """
+
+    def __init__(self, websocket: WebSocket, latency: SessionLatency) -> None:
+        self.websocket = websocket
+        self.latency = latency
+        self.snapshots: LatestMailbox[Tuple[str, FrameTrace]] = LatestMailbox()
+        self.preview: Optional[EncodedPreview] = None
+        self._preview_seq = 0
+        self.sent = 0
+        self.bytes_sent = 0
+        self.previews_sent = 0
+        self.previews_skipped = 0
+
+    def publish(self, text: str, trace: FrameTrace, preview: Optional[EncodedPreview] = None) -> None:
+        self.snapshots.put((text, trace))
+        if preview is not None:
+            self.preview = preview
+
+    async def run(self) -> None:
+        while True:
+            text, trace = await self.snapshots.get()
+            await self.websocket.send_text(text)
+            trace.mark("send")
+            self.latency.sent(trace)
+            self.sent += 1
+            # snapshots are ASCII JSON, so characters are bytes
+            self.bytes_sent += len(text)
+
+            preview = self.preview
+            if preview is not None and preview.seq != self._preview_seq:
+                if self._preview_seq:
+                    self.previews_skipped += preview.seq - self._preview_seq - 1
+                await self.websocket.send_bytes(preview.jpeg)
+                self._preview_seq = preview.seq
+                self.previews_sent += 1
+                self.bytes_sent += len(preview.jpeg)
+
+    def stats(self) -> dict:
+        return {"published": self.snapshots.puts, "sent": self.sent, "dropped": self.snapshots.dropped,
+                "bytes": self.bytes_sent, "previewsSent": self.previews_sent,
+                "previewsSkipped": self.previews_skipped}
@@ -0,0 +1,169 @@
+# collisions.py
+from __future__ import annotations
+from dataclasses import dataclass
+from typing import Dict, Iterator, List, NamedTuple, Optional, Sequence, Tuple
+
+import numpy as np
+
+from entity_store import EntityTable
+
+# the kinds in the order check_collisions resolves them
+KINDS = ('obstacle', 'opponent', 'power_up')
+KIND_CODES = {kind: i for i, kind in enumerate(KINDS)}
+
+# half extents of the boxes whose position is their center; obstacles are
+# anchored at their top-left corner and use their own width/height
+CENTERED_HALF_EXTENTS = {'opponent': (20.0, 40.0), 'power_up': (15.0, 15.0)}
+
+
+class Contact(NamedTuple):
+    car: int
+    kind: str
+    index: int
+    type: str
+    toi: float  # fraction of the tick at which the boxes first touch
+
+
+@dataclass
+class ContactSet:
+    """All car/entity contacts of one pass, as parallel arrays.
+
+    Rows are sorted by car, then time of impact, then kind, then entity
+    index, so the first row for a car is the first thing it hit. ``index``
+    refers to the table row at the time of the pass.
+    """
+    car: np.ndarray
+    kind: np.ndarray
+    index: np.ndarray
+    toi: np.ndarray
+    tables: Dict[str, EntityTable]
+
+    def __len__(self) -> int:
+        return len(self.car)
+
+    def select(self, mask: np.ndarray) -> "ContactSet":
+        return ContactSet(self.car[mask], self.kind[mask], self.index[mask], self.toi[mask], self.tables)
+
+    def for_car(self, car: int) -> "ContactSet":
+        return self.select(self.car == car)
+
+    def of_kind(self, kind: str) -> "ContactSet":
+        return self.select(self.kind == KIND_CODES[kind])
+
+    def type_names(self) -> List[str]:
+        out = []
+        for code, index in zip(self.kind.tolist(), self.index.tolist()):
+            table = self.tables[KINDS[code]]
+            out.append(table.type_names[table.type[index]])
+        return out
+
+    def __iter__(self) -> Iterator[Contact]:
+        for car, code, index, toi, tname in zip(self.car.tolist(), self.kind.tolist(), self.index.tolist(),
+                                                self.toi.tolist(), self.type_names()):
+            yield Contact(car, KINDS[code], index, tname, toi)
+
+
+def _slab(start: np.ndarray, delta: np.ndarray, lo: np.ndarray, hi: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Entry and exit times of the segment start + t * delta through the open slab (lo, hi)."""
+    still = delta == 0
+    moving = not still.any()
+    # still segments divide by 1 and are overwritten below, which avoids np.errstate's cost
+    step = delta if moving else np.where(still, 1.0, delta)
+    t0 = (lo - start) / step
+    t1 = (hi - start) / step
+    enter = np.minimum(t0, t1)
+    leave = np.maximum(t0, t1)
+    if not moving:
+        inside = (lo < start) & (start < hi)
+        enter = np.where(still, np.where(inside, -np.inf, np.inf), enter)
+        leave = np.where(still, np.where(inside, np.inf, -np.inf), leave)
+    return enter, leave
+
+
+def swept_hits(sx, sy, ex, ey, left, top, right, bottom) -> Tuple[np.ndarray, np.ndarray]:
+    """Elementwise segment-vs-open-box test for points moving from (sx, sy) to (ex, ey).
+
+    Returns the hit mask and the time of impact in [0, 1]; a segment that
+    starts inside its box hits at 0.
+    """
+    enter_x, leave_x = _slab(sx, ex - sx, left, right)
+    enter_y, leave_y = _slab(sy, ey - sy, top, bottom)
+    enter = np.maximum(enter_x, enter_y)
+    leave = np.minimum(leave_x, leave_y)
+    hit = (enter < leave) & (enter < 1.0) & (leave > 0.0)
+    return hit, np.clip(enter, 0.0, 1.0)
+
+
+class CollisionEngine:
+    """Tests any number of cars against entity tables in one array pass per kind.
+
+    Every entity box is grown by the car's half extents (a Minkowski sum), so
+    each car reduces to a point. The static test checks the current
+    positions. The swept test follows each car's motion over the tick
+    relative to the entity (using the ``px``/``py`` columns) and reports
+    where along the tick the first touch happened, so a car that jumps
+    clean over a thin box in one tick still hits it.
+    """
+
+    def __init__(self, car_half_width: float = 20.0, car_half_height: float = 40.0) -> None:
+        self.car_half_width = car_half_width
+        self.car_half_height = car_half_height
+
+    def expanded_boxes(self, kind: str, table: EntityTable) -> Tuple[np.ndarray, ...]:
+        """(left, top, right, bottom) of each entity box grown by the car's half extents."""
+        x, y = table.x, table.y
+        if kind in CENTERED_HALF_EXTENTS:
+            hw, hh = CENTERED_HALF_EXTENTS[kind]
+            left, right, top, bottom = x - hw, x + hw, y - hh, y + hh
+        else:
+            left, right, top, bottom = x, x + table.width, y, y + table.height
+        return (left - self.car_half_width, top - self.car_half_height,
+                right + self.car_half_width, bottom + self.car_half_height)
+
+    def contacts(self, car_x: Sequence[float], car_y: Sequence[float], tables: Dict[str, EntityTable],
+                 prev_x: Optional[Sequence[float]] = None, prev_y: Optional[Sequence[float]] = None,
+                 kinds: Sequence[str] = KINDS) -> ContactSet:
+        """All contacts between the cars and the entities of the given kinds.
+
+        Passing the cars' previous positions turns on the swept test; the
+        entity tables must then carry ``px``/``py`` columns.
+        """
+        present = [(kind, tables[kind]) for kind in kinds if kind in tables and tables[kind].n]
+        if not present:
+            empty = np.zeros(0, dtype=np.intp)
+            return ContactSet(empty, np.zeros(0, dtype=np.int8), empty, np.zeros(0), tables)
+
+        # all kinds are tested in one pass over their concatenated boxes
+        if len(present) == 1:
+            kind, table = present[0]
+            left, top, right, bottom = self.expanded_boxes(kind, table)
+            codes = np.full(table.n, KIND_CODES[kind], dtype=np.int8)
+            rows = np.arange(table.n)
+        else:
+            left, top, right, bottom = map(np.concatenate, zip(*(self.expanded_boxes(k, t) for k, t in present)))
+            codes = np.repeat(np.array([KIND_CODES[k] for k, _ in present], dtype=np.int8), [t.n for _, t in present])
+            rows = np.concatenate([np.arange(t.n) for _, t in present])
+
+        cx = np.asarray(car_x, dtype=np.float64)[:, None]
+        cy = np.asarray(car_y, dtype=np.float64)[:, None]
+        if prev_x is not None and prev_y is not None:
+            # each entity's motion over the tick; the car's start point is taken in its current frame
+            move_x = np.concatenate([t.x - t.col('px') for _, t in present])
+            move_y = np.concatenate([t.y - t.col('py') for _, t in present])
+            sx = np.asarray(prev_x, dtype=np.float64)[:, None] + move_x
+            sy = np.asarray(prev_y, dtype=np.float64)[:, None] + move_y
+            # broad phase: the box swept by the segment must overlap the entity box
+            near = ((np.minimum(sx, cx) < right) & (np.maximum(sx, cx) > left) &
+                    (np.minimum(sy, cy) < bottom) & (np.maximum(sy, cy) > top))
+            car_idx, ent_idx = np.nonzero(near)
+            hit, toi = swept_hits(sx[car_idx, ent_idx], sy[car_idx, ent_idx], cx[car_idx, 0], cy[car_idx, 0],
+                                  left[ent_idx], top[ent_idx], right[ent_idx], bottom[ent_idx])
+            car_idx, ent_idx, toi = car_idx[hit], ent_idx[hit], toi[hit]
+        else:
+            hit = (left < cx) & (cx < right) & (top < cy) & (cy < bottom)
+            car_idx, ent_idx = np.nonzero(hit)
+            toi = np.ones(car_idx.size)
+
+        kind, index = codes[ent_idx], rows[ent_idx]
+        order = np.lexsort((index, kind, toi, car_idx))
+        return ContactSet(car_idx[order], kind[order], index[order], toi[order], tables)
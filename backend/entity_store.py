@@ -0,0 +1,215 @@
+# entity_store.py
+from __future__ import annotations
+from typing import Any, Dict, Optional, Sequence
+
+import numpy as np
+
+BASE_COLUMNS = ('x', 'y', 'width', 'height', 'speed')
+
+
+class EntityTable:
+    """Struct-of-arrays storage for one kind of game entity.
+
+    Rows ``[0, n)`` are the live entities. Columns are float64 arrays (x, y,
+    width, height, speed plus any extras), ``type`` holds an int8 code into
+    ``type_names`` and ``ids`` a per-table spawn counter. Updates flip
+    ``alive`` off and call ``compact()``, which swap-removes dead rows by
+    moving live rows from the tail into the holes.
+
+    ``version`` moves on every change, so ``view()`` can hand out one cached
+    dict-style view per table state.
+
+    The base columns are exposed as live-row views (``table.x``), extras via
+    ``table.col(name)``.
+    """
+
+    def __init__(self, kind: str, type_names: Sequence[Any], extra_columns: Sequence[str] = (),
+                 optional_columns: Sequence[str] = (), type_key: str = 'type', capacity: int = 16) -> None:
+        self.kind = kind
+        self.type_names = tuple(type_names)
+        self.type_codes = {name: i for i, name in enumerate(self.type_names)}
+        # the dict key the type code is exposed under in row views
+        self.type_key = type_key
+        # columns where NaN stands for None in row views
+        self.optional_columns = frozenset(optional_columns)
+        self.n = 0
+        self.capacity = capacity
+        self.columns: Dict[str, np.ndarray] = {
+            name: np.zeros(capacity) for name in BASE_COLUMNS + tuple(extra_columns)
+        }
+        self.type_codes_array = np.zeros(capacity, dtype=np.int8)
+        self.alive_array = np.zeros(capacity, dtype=bool)
+        self.ids_array = np.zeros(capacity, dtype=np.int64)
+        self.next_id = 0
+        self.version = 0
+        self._view: Optional[EntityView] = None
+        self._view_version = -1
+
+    def __len__(self) -> int:
+        return self.n
+
+    def col(self, name: str) -> np.ndarray:
+        """View of one column over the live rows."""
+        return self.columns[name][:self.n]
+
+    @property
+    def x(self) -> np.ndarray:
+        return self.columns['x'][:self.n]
+
+    @property
+    def y(self) -> np.ndarray:
+        return self.columns['y'][:self.n]
+
+    @property
+    def width(self) -> np.ndarray:
+        return self.columns['width'][:self.n]
+
+    @property
+    def height(self) -> np.ndarray:
+        return self.columns['height'][:self.n]
+
+    @property
+    def speed(self) -> np.ndarray:
+        return self.columns['speed'][:self.n]
+
+    @property
+    def type(self) -> np.ndarray:
+        return self.type_codes_array[:self.n]
+
+    @property
+    def alive(self) -> np.ndarray:
+        return self.alive_array[:self.n]
+
+    @property
+    def ids(self) -> np.ndarray:
+        return self.ids_array[:self.n]
+
+    def _arrays(self):
+        yield from self.columns.values()
+        yield self.type_codes_array
+        yield self.alive_array
+        yield self.ids_array
+
+    def reserve(self, rows: int) -> None:
+        """Make room for at least ``rows`` rows without further reallocation."""
+        while self.capacity < rows:
+            self._grow()
+
+    def _grow(self) -> None:
+        self.capacity *= 2
+        for name, col in self.columns.items():
+            grown = np.zeros(self.capacity, dtype=col.dtype)
+            grown[:self.n] = col[:self.n]
+            self.columns[name] = grown
+        for attr in ('type_codes_array', 'alive_array', 'ids_array'):
+            old = getattr(self, attr)
+            grown = np.zeros(self.capacity, dtype=old.dtype)
+            grown[:self.n] = old[:self.n]
+            setattr(self, attr, grown)
+
+    def add(self, x: float, y: float, width: float = 0.0, height: float = 0.0, speed: float = 0.0,
+            type_name: Any = None, **extra: Optional[float]) -> int:
+        if self.n == self.capacity:
+            self._grow()
+        i = self.n
+        for name, col in self.columns.items():
+            col[i] = 0.0
+        cols = self.columns
+        cols['x'][i] = x
+        cols['y'][i] = y
+        cols['width'][i] = width
+        cols['height'][i] = height
+        cols['speed'][i] = speed
+        for name, value in extra.items():
+            cols[name][i] = np.nan if value is None else value
+        # previous-position columns start out at the spawn position
+        if 'px' in cols and 'px' not in extra:
+            cols['px'][i] = x
+        if 'py' in cols and 'py' not in extra:
+            cols['py'][i] = y
+        self.type_codes_array[i] = self.type_codes[type_name] if type_name is not None else 0
+        self.alive_array[i] = True
+        self.ids_array[i] = self.next_id
+        self.next_id += 1
+        self.n += 1
+        self.touch()
+        return i
+
+    def remove(self, index: int) -> None:
+        """Swap-remove a single row."""
+        last = self.n - 1
+        if index != last:
+            for arr in self._arrays():
+                arr[index] = arr[last]
+        self.n = last
+        self.touch()
+
+    def compact(self) -> None:
+        """Drop every row whose alive flag is off, filling holes from the tail."""
+        self.touch()
+        alive = self.alive_array[:self.n]
+        keep = int(np.count_nonzero(alive))
+        if keep == self.n:
+            return
+        holes = np.flatnonzero(~alive[:keep])
+        movers = np.flatnonzero(alive[keep:]) + keep
+        for arr in self._arrays():
+            arr[holes] = arr[movers]
+        self.n = keep
+
+    def clear(self) -> None:
+        self.n = 0
+        self.touch()
+
+    def touch(self) -> None:
+        """Mark the table changed; code that writes columns directly must call this."""
+        self.version += 1
+
+    def view(self) -> "EntityView":
+        """Dict-like rows for code that predates the tables, rebuilt only after changes."""
+        if self._view is None or self._view_version != self.version:
+            self._view = EntityView(self)
+            self._view_version = self.version
+        return self._view
+
+
+class EntityRow(dict):
+    """One table row as a plain dict; item assignment also writes the table.
+
+    Reads are ordinary dict lookups, so code written against entity dicts
+    keeps its speed. Only ``row[key] = value`` is written through.
+    """
+
+    __slots__ = ('table', 'index')
+
+    def __setitem__(self, key: str, value: Any) -> None:
+        table = self.table
+        if key == table.type_key:
+            table.type_codes_array[self.index] = table.type_codes[value]
+        else:
+            col = table.columns.get(key)
+            if col is None:
+                raise KeyError(key)
+            col[self.index] = np.nan if value is None else value
+        super().__setitem__(key, value)
+
+
+class EntityView(list):
+    """The live rows of a table as a list of EntityRows, built in one pass."""
+
+    def __init__(self, table: EntityTable) -> None:
+        n = table.n
+        keys = list(table.columns) + [table.type_key]
+        columns = []
+        for name, col in table.columns.items():
+            values = col[:n].tolist()
+            if name in table.optional_columns:
+                values = [None if v != v else v for v in values]
+            columns.append(values)
+        names = table.type_names
+        columns.append([names[code] for code in table.type_codes_array[:n].tolist()])
+        super().__init__(map(EntityRow, map(zip, [keys] * n, zip(*columns))))
+        for i, row in enumerate(self):
+            row.table = table
+            row.index = i
+        self.table = table
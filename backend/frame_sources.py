@@ -0,0 +1,273 @@
+# frame_sources.py
+from __future__ import annotations
+import math
+import os
+import time
+from abc import ABC, abstractmethod
+from typing import Optional, Tuple, Union
+
+import cv2
+import numpy as np
+
+Frame = Optional[np.ndarray]
+
+
+class FrameSource(ABC):
+    """Something that yields BGR frames with the cv2.VideoCapture read() contract.
+
+    ``realtime`` sources pace themselves to ``fps``; with ``realtime=False``
+    they return frames as fast as the consumer asks for them, which is what
+    benchmarks and load tests want.
+    """
+
+    name = "source"
+
+    def __init__(self, fps: float = 30.0, realtime: bool = True) -> None:
+        self.fps = fps
+        self.realtime = realtime
+        # set once a finite source has nothing left to give
+        self.exhausted = False
+        self._next_frame_at = 0.0
+
+    def open(self) -> bool:
+        return True
+
+    @abstractmethod
+    def read(self) -> Tuple[bool, Frame]:
+        """The next frame as ``(ok, frame)``; ``(False, None)`` when there is none."""
+
+    def seek(self, index: int) -> None:
+        """Position a recorded source so the next read() returns frame ``index``."""
+        raise NotImplementedError(f"{self.name} sources cannot seek")
+
+    def frame_count(self) -> Optional[int]:
+        """Number of frames in a finite source, None for live or endless ones."""
+        return None
+
+    def release(self) -> None:
+        pass
+
+    def _pace(self) -> None:
+        if not self.realtime or self.fps <= 0:
+            return
+        now = time.monotonic()
+        if self._next_frame_at > now:
+            time.sleep(self._next_frame_at - now)
+            now = self._next_frame_at
+        # don't try to catch up after a stall, just restart the schedule
+        self._next_frame_at = max(self._next_frame_at + 1.0 / self.fps, now)
+
+
+class CameraSource(FrameSource):
+    """A live camera; the device itself does the pacing."""
+
+    name = "camera"
+
+    def __init__(self, device: Union[int, str] = 0) -> None:
+        super().__init__(fps=0.0, realtime=True)
+        self.device = device
+        self._cap: Optional[cv2.VideoCapture] = None
+
+    def open(self) -> bool:
+        self._cap = cv2.VideoCapture(self.device)
+        if not self._cap.isOpened():
+            self.release()
+            return False
+        # keep OpenCV's own queue as short as the backend allows
+        self._cap.set(cv2.CAP_PROP_BUFFERSIZE, 1)
+        self.fps = self._cap.get(cv2.CAP_PROP_FPS) or 30.0
+        return True
+
+    def read(self) -> Tuple[bool, Frame]:
+        return self._cap.read()
+
+    def release(self) -> None:
+        if self._cap is not None:
+            self._cap.release()
+            self._cap = None
+
+
+class VideoFileSource(FrameSource):
+    """A recorded clip, optionally looped, paced to the clip's frame rate."""
+
+    name = "video"
+
+    def __init__(self, path: str, loop: bool = True, realtime: bool = True) -> None:
+        super().__init__(fps=30.0, realtime=realtime)
+        self.path = path
+        self.loop = loop
+        self._cap: Optional[cv2.VideoCapture] = None
+
+    def open(self) -> bool:
+        self._cap = cv2.VideoCapture(self.path)
+        if not self._cap.isOpened():
+            self.release()
+            return False
+        self.fps = self._cap.get(cv2.CAP_PROP_FPS) or 30.0
+        return True
+
+    def read(self) -> Tuple[bool, Frame]:
+        self._pace()
+        ret, frame = self._cap.read()
+        if not ret and self.loop:
+            self._cap.set(cv2.CAP_PROP_POS_FRAMES, 0)
+            ret, frame = self._cap.read()
+        if not ret:
+            self.exhausted = True
+        return ret, frame
+
+    def seek(self, index: int) -> None:
+        self._cap.set(cv2.CAP_PROP_POS_FRAMES, index)
+        if int(self._cap.get(cv2.CAP_PROP_POS_FRAMES)) != index:
+            # many codecs only seek to keyframes; decode up to the frame from the start instead
+            self._cap.release()
+            self._cap = cv2.VideoCapture(self.path)
+            for _ in range(index):
+                if not self._cap.grab():
+                    break
+        self.exhausted = False
+
+    def frame_count(self) -> Optional[int]:
+        return int(self._cap.get(cv2.CAP_PROP_FRAME_COUNT)) or None
+
+    def release(self) -> None:
+        if self._cap is not None:
+            self._cap.release()
+            self._cap = None
+
+
+class SyntheticSource(FrameSource):
+    """Renders two hand-like shapes swinging like hands on a steering wheel.
+
+    Frames depend only on the frame index, so a run is reproducible whether it
+    is paced or not.
+    """
+
+    name = "synthetic"
+
+    def __init__(self, width: int = 640, height: int = 480, fps: float = 30.0,
+                 realtime: bool = True, period: float = 4.0) -> None:
+        super().__init__(fps=fps, realtime=realtime)
+        self.width = width
+        self.height = height
+        self.period = period  # seconds per full steer left/right cycle
+        self.index = 0
+        # static background, copied into each new frame
+        ramp = np.linspace(40, 90, height, dtype=np.uint8)
+        self._background = np.repeat(ramp[:, None, None], width, axis=1).repeat(3, axis=2)
+
+    def read(self) -> Tuple[bool, Frame]:
+        self._pace()
+        frame = self._background.copy()
+        t = self.index / self.fps
+        angle = math.sin(2 * math.pi * t / self.period) * math.radians(30)
+        cx, cy = self.width / 2, self.height / 2
+        radius = self.width * 0.28
+        for side in (-1, 1):
+            hx = int(cx + side * radius * math.cos(angle))
+            hy = int(cy + side * radius * math.sin(angle))
+            self._draw_hand(frame, hx, hy, side)
+        self.index += 1
+        return True, frame
+
+    def seek(self, index: int) -> None:
+        self.index = index
+
+    def _draw_hand(self, frame: np.ndarray, x: int, y: int, side: int) -> None:
+        skin = (140, 170, 220)
+        palm = max(8, self.width // 20)
+        cv2.ellipse(frame, (x, y), (palm, int(palm * 1.2)), 0, 0, 360, skin, -1)
+        for i in range(5):
+            fx = x + (i - 2) * palm // 2
+            tip = (fx - side * palm // 4, y - palm * 2 + abs(i - 2) * palm // 3)
+            cv2.line(frame, (fx, y - palm // 2), tip, skin, max(2, palm // 3))
+
+
+class MemmapSource(FrameSource):
+    """Raw frames recorded as an (N, H, W, 3) uint8 .npy file, read through np.memmap."""
+
+    name = "npy"
+
+    def __init__(self, path: str, fps: float = 30.0, loop: bool = True, realtime: bool = True,
+                 copy: bool = True) -> None:
+        super().__init__(fps=fps, realtime=realtime)
+        self.path = path
+        self.loop = loop
+        # consumers may draw on frames, so hand out copies unless told otherwise
+        self.copy = copy
+        self.index = 0
+        self._frames: Optional[np.ndarray] = None
+
+    def open(self) -> bool:
+        try:
+            self._frames = np.load(self.path, mmap_mode='r')
+        except (OSError, ValueError):
+            return False
+        return self._frames.ndim == 4 and len(self._frames) > 0
+
+    def read(self) -> Tuple[bool, Frame]:
+        self._pace()
+        if self.index >= len(self._frames):
+            if not self.loop:
+                self.exhausted = True
+                return False, None
+            self.index = 0
+        frame = self._frames[self.index]
+        self.index += 1
+        return True, (np.array(frame) if self.copy else frame)
+
+    def seek(self, index: int) -> None:
+        self.index = index
+        self.exhausted = False
+
+    def frame_count(self) -> Optional[int]:
+        return len(self._frames)
+
+    def release(self) -> None:
+        self._frames = None
+
+
+def record_frames(source: FrameSource, path: str, count: int) -> int:
+    """Write ``count`` frames from a source into a .npy file MemmapSource can replay."""
+    ok, first = source.read()
+    if not ok:
+        return 0
+    out = np.lib.format.open_memmap(path, mode='w+', dtype=np.uint8, shape=(count,) + first.shape)
+    out[0] = first
+    written = 1
+    while written < count:
+        ok, frame = source.read()
+        if not ok:
+            break
+        out[written] = frame
+        written += 1
+    out.flush()
+    return written
+
+
+def open_frame_source(spec: str, realtime: bool = True) -> FrameSource:
+    """Build a FrameSource from a config string.
+
+    Accepted forms: ``camera:0``, ``video:clip.mp4``, ``synthetic``,
+    ``synthetic:1280x720``, ``npy:recording.npy``. A bare integer is a camera
+    index and a bare path is picked by its extension.
+    """
+    kind, _, arg = spec.partition(":")
+    if kind.isdigit():
+        kind, arg = "camera", kind
+    elif not arg and kind not in ("camera", "synthetic"):
+        kind, arg = ("npy" if kind.endswith(".npy") else "video"), kind
+
+    if kind == "camera":
+        device = arg or "0"
+        return CameraSource(int(device) if device.isdigit() else device)
+    if kind == "video":
+        return VideoFileSource(os.path.expanduser(arg), realtime=realtime)
+    if kind == "synthetic":
+        width, height = 640, 480
+        if arg:
+            width, height = (int(v) for v in arg.lower().split("x"))
+        return SyntheticSource(width, height, realtime=realtime)
+    if kind == "npy":
+        return MemmapSource(os.path.expanduser(arg), realtime=realtime)
+    raise ValueError(f"Unknown frame source: {spec!r}")
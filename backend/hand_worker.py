@@ -0,0 +1,219 @@
+# hand_worker.py
+from __future__ import annotations
+import multiprocessing
+import queue
+import time
+from dataclasses import dataclass, field
+from multiprocessing import shared_memory
+from typing import Optional, Tuple
+
+import numpy as np
+
+from advanced_f1_refactor_with_ai import Config, HandTracker, draw_hand_landmarks
+
+# header columns per ring slot
+_SEQ = 0
+_BUSY = 1
+
+
+@dataclass
+class HandResult:
+    seq: int
+    steering: float
+    detected: bool
+    landmarks: np.ndarray = field(default_factory=lambda: np.zeros((0, 21, 3), dtype=np.float32))
+    submitted_at: float = 0.0
+    inference_ms: float = 0.0
+
+
+class FrameRing:
+    """Fixed-shape uint8 frames in a shared-memory ring.
+
+    Each slot has a header row (seq, busy). The writer invalidates a slot's seq
+    before copying into it, and the reader re-checks seq after inference, so a
+    slot that got overwritten mid-read is detected and its result discarded.
+    """
+
+    def __init__(self, shape: Tuple[int, ...], slots: int = 3, name: Optional[str] = None) -> None:
+        self.shape = tuple(shape)
+        self.slots = slots
+        header_bytes = slots * 2 * 8
+        frame_bytes = int(np.prod(self.shape))
+        self._owner = name is None
+        if self._owner:
+            self.shm = shared_memory.SharedMemory(create=True, size=header_bytes + slots * frame_bytes)
+        else:
+            self.shm = shared_memory.SharedMemory(name=name)
+        self.header = np.ndarray((slots, 2), dtype=np.int64, buffer=self.shm.buf)
+        self.frames = np.ndarray((slots,) + self.shape, dtype=np.uint8, buffer=self.shm.buf, offset=header_bytes)
+        if self._owner:
+            self.header[:, _SEQ] = -1
+            self.header[:, _BUSY] = 0
+        self._next = 0
+
+    @property
+    def name(self) -> str:
+        return self.shm.name
+
+    def write(self, frame: np.ndarray, seq: int) -> Optional[int]:
+        """Copy a frame into the next free slot and return the slot index (None if every slot is busy)."""
+        for _ in range(self.slots):
+            slot = self._next
+            self._next = (self._next + 1) % self.slots
+            if self.header[slot, _BUSY]:
+                continue
+            self.header[slot, _SEQ] = -1
+            np.copyto(self.frames[slot], frame)
+            self.header[slot, _SEQ] = seq
+            return slot
+        return None
+
+    def close(self) -> None:
+        # drop numpy views before closing the mapping
+        del self.header, self.frames
+        self.shm.close()
+        if self._owner:
+            self.shm.unlink()
+
+
+def _inference_worker(ring_name: str, shape: Tuple[int, ...], slots: int, config: Config,
+                      requests: multiprocessing.Queue, results: multiprocessing.Queue) -> None:
+    ring = FrameRing(shape, slots, name=ring_name)
+    tracker = HandTracker(config, headless=True)
+    try:
+        while True:
+            msg = requests.get()
+            if msg is None:
+                break
+            # only the newest pending frame matters
+            stop = False
+            while True:
+                try:
+                    newer = requests.get_nowait()
+                except queue.Empty:
+                    break
+                if newer is None:
+                    stop = True
+                    break
+                msg = newer
+            if stop:
+                break
+
+            slot, seq, submitted_at = msg
+            ring.header[slot, _BUSY] = 1
+            try:
+                if ring.header[slot, _SEQ] != seq:
+                    continue
+                start = time.perf_counter()
+                steering, detected = tracker.process_frame(ring.frames[slot])
+                elapsed_ms = (time.perf_counter() - start) * 1000.0
+                if ring.header[slot, _SEQ] != seq:
+                    continue  # overwritten while we were reading it
+            finally:
+                ring.header[slot, _BUSY] = 0
+
+            result = HandResult(seq, float(steering), bool(detected), tracker.last_landmarks.copy(),
+                                submitted_at, elapsed_ms)
+            try:
+                results.put_nowait(result)
+            except queue.Full:
+                try:
+                    results.get_nowait()
+                except queue.Empty:
+                    pass
+                try:
+                    results.put_nowait(result)
+                except queue.Full:
+                    pass
+    finally:
+        ring.close()
+
+
+class RemoteHandTracker:
+    """Drop-in replacement for HandTracker that runs MediaPipe in a worker process.
+
+    ``process_frame`` copies the frame into a shared-memory slot, posts the slot
+    index and returns the newest result received so far, so the caller never
+    waits on inference. Results therefore trail the submitted frame by roughly
+    one inference time.
+    """
+
+    def __init__(self, config: Config, slots: int = 3, headless: bool = False) -> None:
+        self.config = config
+        self.slots = slots
+        self.headless = headless
+        self._ctx = multiprocessing.get_context("spawn")
+        self._ring: Optional[FrameRing] = None
+        self._process = None
+        self._requests = None
+        self._results = None
+        self._seq = 0
+        self.latest = HandResult(seq=0, steering=0.0, detected=False)
+        self.frames_submitted = 0
+        self.frames_skipped = 0
+
+    def _start(self, shape: Tuple[int, ...]) -> None:
+        self.close()
+        self._ring = FrameRing(shape, self.slots)
+        self._requests = self._ctx.Queue(maxsize=self.slots)
+        self._results = self._ctx.Queue(maxsize=4)
+        self._process = self._ctx.Process(
+            target=_inference_worker,
+            args=(self._ring.name, shape, self.slots, self.config, self._requests, self._results),
+            name="hand-inference",
+            daemon=True,
+        )
+        self._process.start()
+
+    def submit(self, frame: np.ndarray) -> None:
+        if self._ring is None or self._ring.shape != frame.shape:
+            self._start(frame.shape)
+        self._seq += 1
+        slot = self._ring.write(frame, self._seq)
+        if slot is None:
+            self.frames_skipped += 1
+            return
+        try:
+            self._requests.put_nowait((slot, self._seq, time.monotonic()))
+            self.frames_submitted += 1
+        except queue.Full:
+            self.frames_skipped += 1
+
+    def poll(self) -> HandResult:
+        """Drain finished results without blocking and return the newest one."""
+        if self._results is not None:
+            while True:
+                try:
+                    self.latest = self._results.get_nowait()
+                except queue.Empty:
+                    break
+        return self.latest
+
+    def process_frame(self, frame: np.ndarray) -> Tuple[float, bool]:
+        self.submit(frame)
+        result = self.poll()
+        if not self.headless:
+            self.draw_overlay(frame)
+        return result.steering, result.detected
+
+    def draw_overlay(self, frame: np.ndarray) -> None:
+        for hand in self.latest.landmarks:
+            draw_hand_landmarks(frame, hand)
+
+    @property
+    def is_alive(self) -> bool:
+        return self._process is not None and self._process.is_alive()
+
+    def close(self) -> None:
+        if self._process is not None:
+            try:
+                self._requests.put(None, timeout=0.5)
+            except queue.Full:
+                pass
+            self._process.join(timeout=2.0)
+            if self._process.is_alive():
+                self._process.terminate()
+            self._process = None
+        if self._ring is not None:
+            self._ring.close()
+            self._ring = None
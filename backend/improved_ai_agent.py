@@ -1,8 +1,11 @@
 # improved_ai_agent.py
 import math
+import random
 from typing import List, Tuple, Dict, Optional
 from dataclasses import dataclass
 
+import numpy as np
+
 @dataclass
 class Vector2D:
     x: float
@@ -14,6 +17,10 @@ class Vector2D:
     def angle_to(self, other: 'Vector2D') -> float:
         return math.atan2(other.y - self.y, other.x - self.x)
 
+# obstacle danger multipliers for lateral offsets below 50, below 100 and beyond
+_OBSTACLE_LATERAL_EDGES = np.array([50.0, 100.0])
+_OBSTACLE_DANGER_FACTORS = np.array([1.5, 1.2, 1.0])
+
 class ImprovedAIAgent:
     """
     Enhanced AI agent with:
@@ -23,8 +30,11 @@ class ImprovedAIAgent:
     - Multiple threat assessment
     """
     
-    def __init__(self, config) -> None:
+    def __init__(self, config, rng: Optional[random.Random] = None, grid=None) -> None:
         self.config = config
+        self.rng = rng or random.Random()
+        # optional OccupancyGrid; decide_tables then steers for its cheapest column
+        self.grid = grid
         self.aggression = 0.85  # Slightly reduced for safety
         
         # Vision parameters
@@ -40,6 +50,7 @@ class ImprovedAIAgent:
         # Path planning
         self.target_lane = None
         self.lane_change_cooldown = 0
+        self.lane_change_frames = 20  # Frames a chosen lane is held
         
     def decide(self, car_x: float, car_y: float, car_speed: float, 
                obstacles: List[dict], opponents: List[dict]) -> Tuple[float, bool]:
@@ -183,8 +194,14 @@ class ImprovedAIAgent:
         
         # Find best lane
         best_lane_idx = lane_scores.index(max(lane_scores))
-        target_x = lanes[best_lane_idx]
-        
+        critical_x = threats[0]['pos'].x if threats and threats[0]['danger'] > 1.5 else None
+        return self._commit_target(lanes[best_lane_idx], critical_x, car_pos.x, road_left, road_right)
+    
+    def _commit_target(self, target_x: float, critical_x: Optional[float], car_x: float,
+                       road_left: float, road_right: float) -> float:
+        """
+        Apply the lane change cooldown and emergency dodge to the best lane.
+        """
         # Handle lane change cooldown
         if self.lane_change_cooldown > 0:
             self.lane_change_cooldown -= 1
@@ -192,13 +209,12 @@ class ImprovedAIAgent:
                 target_x = self.target_lane
         else:
             self.target_lane = target_x
-            self.lane_change_cooldown = 20  # Cooldown frames
+            self.lane_change_cooldown = self.lane_change_frames
         
         # Emergency avoidance for critical threats
-        if threats and threats[0]['danger'] > 1.5:
-            critical = threats[0]
+        if critical_x is not None:
             # Dodge hard away from threat
-            if critical['pos'].x > car_pos.x:
+            if critical_x > car_x:
                 # Threat is on right, go left
                 target_x = min(target_x - 80, road_left + 40)
             else:
@@ -259,6 +275,122 @@ class ImprovedAIAgent:
         
         return throttle
     
+    def decide_tables(self, car_x: float, car_y: float, car_speed: float,
+                      obstacle_table, opponent_table) -> Tuple[float, bool]:
+        """
+        decide() straight from GameLogic's entity tables, without row views.
+        """
+        if self.grid is not None:
+            return self.decide_grid(car_x, car_y, car_speed, obstacle_table, opponent_table)
+        return self.decide_arrays(car_x, car_y, car_speed,
+                                  obstacle_table.x, obstacle_table.y, obstacle_table.width,
+                                  opponent_table.x, opponent_table.y)
+    
+    def decide_arrays(self, car_x: float, car_y: float, car_speed: float,
+                      obs_x: np.ndarray, obs_y: np.ndarray, obs_width: np.ndarray,
+                      opp_x: np.ndarray, opp_y: np.ndarray) -> Tuple[float, bool]:
+        """
+        The same decision as decide(), from entity coordinate arrays.
+        
+        Threat danger and the threat-by-lane score matrix are computed with
+        array broadcasting, so the cost stays flat as entity counts grow.
+        """
+        road_left = (self.config.WIDTH - self.config.TRACK_WIDTH) // 2 + 25
+        road_right = road_left + self.config.TRACK_WIDTH - 50
+        road_center = (road_left + road_right) / 2
+        lane_width = (road_right - road_left) / 3
+        lanes = (road_left + lane_width * 0.5, road_center, road_right - lane_width * 0.5)
+        
+        threat_x, distance, width, danger = self._threat_arrays(car_x, car_y, obs_x, obs_y, obs_width,
+                                                                 opp_x, opp_y)
+        throttle = car_speed < self.config.MAX_SPEED
+        if not danger.size:
+            # nothing ahead: every lane scores 1.0 and the center gets its bonus
+            target_x = self._commit_target(lanes[1], None, car_x, road_left, road_right)
+            return self._calculate_steering(car_x, target_x, car_speed), throttle
+        
+        # threats x lanes: each threat costs the lanes it sits in
+        in_lane = np.abs(threat_x[:, None] - lanes) < (width + 40)[:, None]
+        impact = (1.0 - distance / self.vision_distance) * danger
+        lane_scores = 1.0 - (in_lane * impact[:, None]).sum(axis=0)
+        lane_scores[1] += 0.1
+        
+        # argmax keeps the first of equal dangers, as decide()'s stable sort does
+        worst = danger.argmax()
+        critical_x = float(threat_x[worst]) if danger[worst] > 1.5 else None
+        target_x = self._commit_target(lanes[lane_scores.argmax()], critical_x, car_x, road_left, road_right)
+        steer = self._calculate_steering(car_x, target_x, car_speed)
+        
+        return steer, throttle and self._throttle_arrays(car_speed, distance, danger)
+    
+    def _throttle_arrays(self, car_speed: float, distance: np.ndarray, danger: np.ndarray) -> bool:
+        """
+        _decide_throttle() over threat arrays, for a car below top speed.
+        """
+        # each braking rule only ever turns the throttle off, so their order doesn't matter
+        brake = (danger > 1.5) | ((danger > 1.0) & (distance < self.critical_distance))
+        if car_speed > self.config.MAX_SPEED * 0.7:
+            brake |= (danger > 0.8) & (distance < self.safe_distance)
+        return not brake.any()
+    
+    def decide_grid(self, car_x: float, car_y: float, car_speed: float,
+                    obstacle_table, opponent_table) -> Tuple[float, bool]:
+        """
+        Steer for the cheapest column of the occupancy grid instead of one of three lanes.
+        
+        A column also pays for the columns the car crosses to reach it
+        (see OccupancyGrid.reach_costs), and columns that cost the same go to the one nearest the car, so
+        it only moves when something is in the way. Throttle follows the same
+        rules as decide().
+        """
+        grid = self.grid
+        grid.sync(obstacle_table, opponent_table)
+        road_left = (self.config.WIDTH - self.config.TRACK_WIDTH) // 2 + 25
+        road_right = road_left + self.config.TRACK_WIDTH - 50
+        
+        costs = grid.reach_costs(car_x, car_y, self.vision_distance)
+        # a pixel of travel costs far less than any cell with something in it
+        best = int(np.argmin(costs + np.abs(grid.col_x - car_x) * 1e-4))
+        target_x = self._commit_target(float(grid.col_x[best]), None, car_x, road_left, road_right)
+        steer = self._calculate_steering(car_x, target_x, car_speed)
+        
+        throttle = car_speed < self.config.MAX_SPEED
+        if throttle:
+            _, distance, _, danger = self._threat_arrays(car_x, car_y, obstacle_table.x, obstacle_table.y,
+                                                         obstacle_table.width, opponent_table.x, opponent_table.y)
+            throttle = self._throttle_arrays(car_speed, distance, danger)
+        return steer, throttle
+    
+    def _threat_arrays(self, car_x: float, car_y: float, obs_x, obs_y, obs_width,
+                       opp_x, opp_y) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+        """
+        x, distance ahead, width and danger of every threat in vision range,
+        obstacles first, in the order _assess_threats() finds them.
+        """
+        n_obs = len(obs_x)
+        threat_x = np.concatenate((obs_x, opp_x))
+        distance = np.concatenate((obs_y, opp_y)) - car_y
+        lateral = np.abs(threat_x - car_x)
+        danger = 1.0 - distance / self.vision_distance
+        width = np.empty(threat_x.size)
+        width[:n_obs] = obs_width
+        width[n_obs:] = 40.0
+        
+        # obstacles: x1.5 directly in front, x1.2 nearby, 2.0 when close and in front
+        obs_danger, obs_lateral = danger[:n_obs], lateral[:n_obs]
+        obs_danger *= _OBSTACLE_DANGER_FACTORS[np.searchsorted(_OBSTACLE_LATERAL_EDGES, obs_lateral, side='right')]
+        obs_danger[(distance[:n_obs] < self.critical_distance) & (obs_lateral < 60)] = 2.0
+        
+        # opponents: 0.8 of an obstacle's base danger, x1.3 directly in front
+        opp_danger = danger[n_obs:]
+        opp_danger *= 0.8
+        opp_danger[lateral[n_obs:] < 50] *= 1.3
+        
+        ahead = (distance > 0) & (distance < self.vision_distance)
+        if ahead.all():
+            return threat_x, distance, width, danger
+        return threat_x[ahead], distance[ahead], width[ahead], danger[ahead]
+    
     def decide_for_opponent(self, opp: dict, obstacles: List[dict]) -> None:
         """
         Enhanced opponent behavior.
@@ -268,7 +400,7 @@ class ImprovedAIAgent:
         
         # Simple lane changes with obstacle avoidance
         if opp.get('lane_change_target') is None or opp.get('lane_change_timer', 0) <= 0:
-            opp['lane_change_target'] = road_left + (road_right - road_left) * (0.3 + 0.4 * hash(str(opp['x'])) % 100 / 100)
+            opp['lane_change_target'] = road_left + (road_right - road_left) * (0.3 + self.rng.random())
             opp['lane_change_timer'] = 60
         
         opp['lane_change_timer'] -= 1
@@ -292,5 +424,4 @@ class ImprovedAIAgent:
         opp['x'] = max(road_left, min(road_right, opp['x']))
         
         # Vary speed
-        import random
-        opp['speed'] = max(3.0, min(8.0, opp['speed'] + random.uniform(-0.15, 0.2)))
\ No newline at end of file
+        opp['speed'] = max(3.0, min(8.0, opp['speed'] + self.rng.uniform(-0.15, 0.2)))
\ No newline at end of file
@@ -0,0 +1,197 @@
+# landmark_cache.py
+"""Offline hand-landmark extraction and a memory-mapped replay tracker.
+
+    python landmark_cache.py clips/*.mp4 -o landmarks/ --workers 8
+
+writes one ``<clip>.landmarks.npy`` per clip. CachedHandTracker replays such a
+file in place of HandTracker, so game and AI benchmarks can drive real human
+steering without running MediaPipe.
+"""
+from __future__ import annotations
+import argparse
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import replace
+from typing import List, Optional, Tuple
+
+import numpy as np
+
+from advanced_f1_refactor_with_ai import Config, HandTracker, draw_hand_landmarks
+from frame_sources import open_frame_source
+
+# one record per frame; landmarks are normalized, so float16 is plenty
+LANDMARK_DTYPE = np.dtype([
+    ('steering', '<f4'),
+    ('detected', 'u1'),
+    ('hands', 'u1'),
+    ('landmarks', '<f2', (2, 21, 3)),
+])
+
+
+def _extract_chunk(path: str, start: int, stop: int, config: Config, flip: bool) -> np.ndarray:
+    import cv2
+
+    source = open_frame_source(path, realtime=False)
+    source.loop = False
+    out = np.zeros(stop - start, dtype=LANDMARK_DTYPE)
+    if not source.open():
+        raise ValueError(f"Cannot open {path}")
+    # offline we want the same answer every run, so never degrade quality
+    tracker = HandTracker(replace(config, HAND_LATENCY_BUDGET_MS=0.0), headless=True)
+    try:
+        source.seek(start)
+        for i in range(stop - start):
+            ok, frame = source.read()
+            if not ok:
+                return out[:i]
+            if flip:
+                frame = cv2.flip(frame, 1)
+            steering, detected = tracker.process_frame(frame)
+            rec = out[i]
+            rec['steering'] = steering
+            rec['detected'] = detected
+            rec['hands'] = tracker.hand_count
+            rec['landmarks'][:tracker.hand_count] = tracker.last_landmarks
+        return out
+    finally:
+        tracker.close()
+        source.release()
+
+
+def _frame_count(path: str) -> int:
+    source = open_frame_source(path, realtime=False)
+    if not source.open():
+        raise ValueError(f"Cannot open {path}")
+    try:
+        count = source.frame_count()
+    finally:
+        source.release()
+    if not count:
+        raise ValueError(f"{path} has no known frame count")
+    return count
+
+
+def extract_landmarks(clips: List[str], out_dir: str, config: Optional[Config] = None,
+                      workers: Optional[int] = None, chunk_size: int = 300, flip: bool = True) -> List[str]:
+    """Run HandTracker over recorded clips, spreading frame chunks over a process pool.
+
+    Each chunk starts a fresh tracker, so the first frame or two of a chunk run
+    palm detection instead of tracking; larger chunks trade parallelism for
+    fewer of those cold starts. ``flip`` mirrors frames like CameraCapture does.
+    """
+    config = config or Config()
+    os.makedirs(out_dir, exist_ok=True)
+    plans = []
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        for clip in clips:
+            count = _frame_count(clip)
+            stem = os.path.splitext(os.path.basename(clip))[0]
+            out_path = os.path.join(out_dir, f"{stem}.landmarks.npy")
+            table = np.lib.format.open_memmap(out_path, mode='w+', dtype=LANDMARK_DTYPE, shape=(count,))
+            chunks = [(start, pool.submit(_extract_chunk, clip, start, min(count, start + chunk_size), config, flip))
+                      for start in range(0, count, chunk_size)]
+            plans.append((clip, out_path, table, chunks))
+        for clip, out_path, table, chunks in plans:
+            _fill_table(clip, out_path, table, chunks)
+    return [out_path for _, out_path, _, _ in plans]
+
+
+def _fill_table(clip: str, out_path: str, table: np.memmap, chunks) -> None:
+    """Write the chunks into the table, which must come out as one run of frames from the start.
+
+    The frame count of a video is often an estimate, so a clip that ends
+    early is truncated to the frames it has; a chunk that comes up short
+    before others that read frames leaves a hole, which is an error.
+    """
+    written = 0
+    for start, job in chunks:
+        chunk = job.result()
+        if not len(chunk):
+            continue
+        if start > written:
+            raise ValueError(f"{clip}: frames {written}-{start - 1} could not be read")
+        table[start:start + len(chunk)] = chunk
+        written = start + len(chunk)
+    if not written:
+        raise ValueError(f"{clip}: no frames could be read")
+    table.flush()
+    if written < len(table):
+        print(f"⚠️ {clip}: read {written} of the {len(table)} frames it reports; truncating {out_path}")
+        tmp_path = out_path + ".tmp.npy"
+        np.save(tmp_path, np.asarray(table[:written]))
+        os.replace(tmp_path, out_path)
+
+
+class CachedHandTracker:
+    """Replays a landmark file frame by frame with the HandTracker interface.
+
+    The file is memory-mapped, so opening it is instant and replay speed is
+    bounded by the caller, not by MediaPipe. The frame passed to
+    ``process_frame`` is ignored.
+    """
+
+    def __init__(self, path: str, loop: bool = True, headless: bool = True) -> None:
+        self.path = path
+        self.loop = loop
+        self.headless = headless
+        self.records = np.load(path, mmap_mode='r')
+        if self.records.dtype != LANDMARK_DTYPE:
+            raise ValueError(f"{path} is not a landmark cache")
+        self.index = 0
+        self.hand_count = 0
+        self.landmarks = np.zeros((2, 21, 3), dtype=np.float32)
+
+    def __len__(self) -> int:
+        return len(self.records)
+
+    @property
+    def last_landmarks(self) -> np.ndarray:
+        return self.landmarks[:self.hand_count]
+
+    def process_frame(self, frame: Optional[np.ndarray] = None) -> Tuple[float, bool]:
+        if self.index >= len(self.records):
+            if not self.loop:
+                self.hand_count = 0
+                return 0.0, False
+            self.index = 0
+        rec = self.records[self.index]
+        self.index += 1
+        self.hand_count = int(rec['hands'])
+        self.landmarks[:self.hand_count] = rec['landmarks'][:self.hand_count]
+        if frame is not None and not self.headless:
+            self.draw_overlay(frame)
+        return float(rec['steering']), bool(rec['detected'])
+
+    def draw_overlay(self, frame: np.ndarray) -> None:
+        for pts in self.last_landmarks:
+            draw_hand_landmarks(frame, pts)
+
+    def stats(self) -> dict:
+        return {"tier": "cache", "index": self.index, "frames": len(self.records)}
+
+    def close(self) -> None:
+        self.records = None
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Extract hand landmarks from recorded clips")
+    parser.add_argument("clips", nargs="+", help="video files or .npy frame recordings")
+    parser.add_argument("-o", "--out-dir", default="landmarks")
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--chunk", type=int, default=300, help="frames per pool task")
+    parser.add_argument("--no-flip", action="store_true", help="clips are already mirrored")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    outputs = extract_landmarks(args.clips, args.out_dir, Config.from_env(), args.workers,
+                                args.chunk, flip=not args.no_flip)
+    frames = sum(len(np.load(p, mmap_mode='r')) for p in outputs)
+    elapsed = time.perf_counter() - start
+    print(f"Extracted {frames} frames from {len(outputs)} clips in {elapsed:.1f}s ({frames / elapsed:.0f} fps)")
+    for path in outputs:
+        print(f"  {path}")
+
+
+if __name__ == "__main__":
+    main()
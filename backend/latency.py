@@ -0,0 +1,130 @@
+# latency.py
+from __future__ import annotations
+import threading
+import time
+from collections import OrderedDict, deque
+from dataclasses import dataclass, field
+from typing import Deque, Dict, Optional
+
+import numpy as np
+
+# pipeline stages in the order a frame passes through them; "tick" is when the
+# sim loop picked the frame's result up, so reused frames show up as waiting there
+STAGES = ("capture", "inference", "tick", "ai", "physics", "serialize", "send", "render")
+
+
+@dataclass
+class FrameTrace:
+    """time.monotonic() timestamps of one frame at each pipeline stage."""
+    trace_id: int
+    marks: Dict[str, float] = field(default_factory=dict)
+
+    def mark(self, stage: str, t: Optional[float] = None) -> None:
+        self.marks[stage] = time.monotonic() if t is None else t
+
+
+class LatencyStats:
+    """Rolling windows of per-stage latencies (ms) with percentile summaries.
+
+    A stage's latency is the time since the previous stage that was marked on
+    the same trace; ``total`` runs from the first mark to the last. Samples are
+    also forwarded to ``parent`` so sessions can roll up into a global view.
+    """
+
+    def __init__(self, window: int = 600, parent: Optional["LatencyStats"] = None) -> None:
+        self.window = window
+        self.parent = parent
+        self._samples: Dict[str, Deque[float]] = {}
+        self._lock = threading.Lock()
+
+    def add(self, name: str, ms: float) -> None:
+        with self._lock:
+            samples = self._samples.get(name)
+            if samples is None:
+                samples = self._samples[name] = deque(maxlen=self.window)
+            samples.append(ms)
+        if self.parent is not None:
+            self.parent.add(name, ms)
+
+    def record(self, trace: FrameTrace) -> None:
+        first = prev = None
+        for stage in STAGES:
+            t = trace.marks.get(stage)
+            if t is None:
+                continue
+            if prev is None:
+                first = t
+            else:
+                self.add(stage, (t - prev) * 1000.0)
+            prev = t
+        if first is not None and prev is not first:
+            self.add("total", (prev - first) * 1000.0)
+
+    def summary(self) -> Dict[str, dict]:
+        with self._lock:
+            snapshot = {name: list(samples) for name, samples in self._samples.items()}
+        out = {}
+        for name, samples in snapshot.items():
+            if not samples:
+                continue
+            p50, p95, p99 = np.percentile(samples, (50, 95, 99))
+            out[name] = {"p50": round(float(p50), 2), "p95": round(float(p95), 2),
+                         "p99": round(float(p99), 2), "count": len(samples)}
+        return out
+
+
+class SessionLatency:
+    """Traces for one client session.
+
+    Traces are recorded up to ``send`` when the snapshot goes out and kept
+    until the client echoes the trace id back after rendering. The render
+    stage is measured when that echo arrives, so it includes the trip back.
+    """
+
+    def __init__(self, parent: Optional[LatencyStats] = None, max_pending: int = 256) -> None:
+        self.stats = LatencyStats(parent=parent)
+        self.max_pending = max_pending
+        self._pending: "OrderedDict[int, FrameTrace]" = OrderedDict()
+        self._next_id = 0
+
+    def new_trace(self) -> FrameTrace:
+        self._next_id += 1
+        return FrameTrace(self._next_id)
+
+    def sent(self, trace: FrameTrace) -> None:
+        self.stats.record(trace)
+        self._pending[trace.trace_id] = trace
+        while len(self._pending) > self.max_pending:
+            self._pending.popitem(last=False)
+
+    def rendered(self, trace_id) -> None:
+        trace = self._pending.pop(trace_id, None)
+        if trace is None or "send" not in trace.marks:
+            return
+        trace.mark("render")
+        self.stats.add("render", (trace.marks["render"] - trace.marks["send"]) * 1000.0)
+        if "capture" in trace.marks:
+            self.stats.add("motionToRender", (trace.marks["render"] - trace.marks["capture"]) * 1000.0)
+
+
+class LatencyRegistry:
+    def __init__(self) -> None:
+        self.overall = LatencyStats(window=3000)
+        self.sessions: Dict[str, SessionLatency] = {}
+
+    def session(self, session_id: str) -> SessionLatency:
+        if session_id not in self.sessions:
+            self.sessions[session_id] = SessionLatency(parent=self.overall)
+        return self.sessions[session_id]
+
+    def drop(self, session_id: str) -> None:
+        self.sessions.pop(session_id, None)
+
+    def summary(self) -> dict:
+        return {
+            "overall": self.overall.summary(),
+            "sessions": {sid: s.stats.summary() for sid, s in self.sessions.items()},
+        }
+
+
+registry = LatencyRegistry()
@@ -0,0 +1,250 @@
+# lookahead_agent.py
+from __future__ import annotations
+import heapq
+import itertools
+import random
+import time
+import weakref
+from dataclasses import dataclass, field
+from typing import List, Optional, Tuple
+
+import numpy as np
+
+import checkpoint
+from advanced_f1_refactor_with_ai import BASE_TICK_HZ
+from improved_ai_agent import ImprovedAIAgent
+from opponent_controller import BatchedOpponentController
+
+# subtracted from a line's value when it ends in a crash; far more than any
+# score a line can earn over the horizon
+CRASH_PENALTY = 1e6
+# how far up the road oncoming traffic counts towards a line's clearance, and
+# the clearance cap: half the width the car can drive in, so a centred car on
+# an empty road has all of it
+CLEARANCE_RANGE = 300.0
+MAX_CLEARANCE = 200.0
+# the rollout cost estimate follows any slower rollout at once and decays
+# by this factor per rollout and per decision towards faster ones
+ROLLOUT_COST_DECAY = 0.9
+# decisions that take longer than the budget plus this many seconds count
+# as overruns in stats()
+OVERRUN_EPSILON = 0.0005
+
+
+@dataclass(eq=False)
+class PlanNode:
+    """A world state reached by holding one action from its parent's state."""
+    state: bytes
+    action: Optional[Tuple[float, bool]] = None
+    # a weak link, so a subtree dropped from the plan is freed at once rather than left to the cycle collector
+    parent: Optional["weakref.ReferenceType[PlanNode]"] = None
+    depth: int = 0
+    # score gained since the tree was started, minus CRASH_PENALTY if the line crashed
+    value: float = 0.0
+    # room to the nearest road edge or oncoming traffic
+    clearance: float = 0.0
+    crashed: bool = False
+    children: List["PlanNode"] = field(default_factory=list)
+    # (depth reached without crashing, clearance, value) of the best line through this node
+    best: Tuple[int, float, float] = (0, 0.0, 0.0)
+
+    def __post_init__(self) -> None:
+        self.best = (self.depth - 1 if self.crashed else self.depth, self.clearance, self.value)
+
+
+class LookaheadAIAgent(ImprovedAIAgent):
+    """
+    Drives by rolling candidate steering/throttle sequences forward with the
+    real GameLogic rules and taking the first action of the best one.
+
+    The search is a best-first tree search over world checkpoints. Every
+    node holds one action for ``action_ticks`` sim steps; the deepest live
+    leaf is expanded next, trying lines in order of clearance from the road
+    edges and oncoming traffic and then score, so the search dives along
+    the most promising line and backs up through the nearest alternatives
+    when it crashes. A line is as good as the depth it survives to, then
+    its clearance, then its score. Search stops once a line survives the
+    whole horizon, or at the per-decision deadline with the best line so
+    far; with no line at all it falls back to the reactive ImprovedAIAgent
+    decision. The deadline is checked before every child rollout against
+    a running estimate of what one costs, so a rollout is only started if
+    it should finish in time, and again before each of its sim steps, so
+    one that runs slow is dropped. A node left part-expanded is finished by
+    a later decision.
+
+    The tree survives between decisions. When the real world lands exactly
+    on the state the chosen child predicted (same action, same number of
+    steps), that child becomes the new root with everything searched below
+    it, and the horizon slides one level deeper.
+
+    Opponents are driven in the rollouts the way the server drives them, by
+    a BatchedOpponentController on the world's own 'opponents' stream, so
+    the forecast matches the real world as long as the real opponents are
+    driven that way too.
+    """
+
+    def __init__(self, config, logic, rng: Optional[random.Random] = None,
+                 budget_ms: Optional[float] = None, horizon: Optional[int] = None) -> None:
+        super().__init__(config, rng)
+        self.logic = logic
+        self.budget = (config.AI_PLAN_BUDGET_MS if budget_ms is None else budget_ms) / 1000.0
+        self.horizon = config.AI_PLAN_HORIZON if horizon is None else horizon
+        # one action per server tick
+        self.action_ticks = max(1, round(config.SIM_HZ / BASE_TICK_HZ))
+        s = config.MAX_STEERING
+        # straight, hard left, hard right under throttle, and braking; ties go to the first
+        self.actions = [(0.0, True), (-s, True), (s, True), (0.0, False)]
+
+        # the world rollouts run in; forked here so no decision pays for it
+        self._scratch = checkpoint.fork(logic)
+        self._scratch.verbose = False
+        self._scratch_opponents = BatchedOpponentController(config, self._scratch.rng.numpy('opponents'))
+        self._expected: Optional[PlanNode] = None
+        self._order = itertools.count()
+        # search counters, for stats()
+        self.decisions = 0
+        self.reused = 0
+        self.fallbacks = 0
+        self.expansions = 0
+        self.depth = 0
+        self.overruns = 0
+        self.max_seconds = 0.0
+        # seconds one child rollout is expected to take
+        self._rollout_cost = 0.0
+
+    # the server and controller call these; the planner reads the world itself
+    def decide(self, car_x: float, car_y: float, car_speed: float, obstacles, opponents) -> Tuple[float, bool]:
+        return self.plan()
+
+    def decide_tables(self, car_x: float, car_y: float, car_speed: float,
+                      obstacle_table, opponent_table) -> Tuple[float, bool]:
+        return self.plan()
+
+    def plan(self) -> Tuple[float, bool]:
+        """Search from the current world until the deadline and return (steer, throttle)."""
+        started = time.perf_counter()
+        deadline = started + self.budget
+        logic = self.logic
+        state = checkpoint.save(logic)
+        self.decisions += 1
+        # decay here too, so one slow rollout cannot keep later decisions from starting any
+        self._rollout_cost *= ROLLOUT_COST_DECAY
+        if self._expected is not None and self._expected.state == state:
+            root = self._expected
+            root.parent = None
+            root.action = None
+            self.reused += 1
+        else:
+            root = PlanNode(state)
+
+        limit = root.depth + self.horizon
+        frontier = self._frontier(root, limit)
+        while frontier and root.best[0] < limit:
+            node = heapq.heappop(frontier)[-1]
+            expanded = self._expand(node, deadline)
+            for child in node.children:
+                if not child.crashed and child.depth < limit:
+                    self._push(frontier, child)
+            if not expanded:
+                break
+
+        if not root.children:
+            self._expected = None
+            self.fallbacks += 1
+            action = super().decide_tables(logic.car_x, logic.car_y, logic.car_speed,
+                                           logic.obstacle_table, logic.opponent_table)
+        else:
+            best = max(root.children, key=lambda child: child.best)
+            self._expected = best
+            self.depth = best.best[0] - root.depth
+            action = best.action
+        elapsed = time.perf_counter() - started
+        self.max_seconds = max(self.max_seconds, elapsed)
+        if elapsed > self.budget + OVERRUN_EPSILON:
+            self.overruns += 1
+        return action
+
+    def _push(self, frontier: list, node: PlanNode) -> None:
+        # deepest first, then most clearance and best score; the counter keeps ties in action order
+        heapq.heappush(frontier, (-node.depth, -node.clearance, -node.value, next(self._order), node))
+
+    def _frontier(self, root: PlanNode, limit: int) -> list:
+        """The live, unexpanded leaves above the horizon, as a heap."""
+        frontier: list = []
+        stack = [root]
+        while stack:
+            node = stack.pop()
+            stack.extend(node.children)
+            # a node the last deadline cut short still has actions to try
+            if len(node.children) < len(self.actions) and not node.crashed and node.depth < limit:
+                self._push(frontier, node)
+        return frontier
+
+    def _expand(self, node: PlanNode, deadline: float) -> bool:
+        """Roll out the node's untried actions; False if the deadline left some untried."""
+        scratch, opponent_ai = self._scratch, self._scratch_opponents
+        link = weakref.ref(node)
+        tried = len(node.children)
+        for steer, throttle in self.actions[tried:]:
+            rollout_start = time.perf_counter()
+            if rollout_start + self._rollout_cost > deadline:
+                break
+            checkpoint.restore(scratch, node.state)
+            start_score = scratch.score
+            crashed = late = False
+            for _ in range(self.action_ticks):
+                if time.perf_counter() > deadline:
+                    late = True
+                    break
+                if scratch.step(steer, throttle, opponent_ai=opponent_ai):
+                    crashed = True
+                    break
+            if late:
+                # a rollout slower than expected is dropped rather than finished past the deadline
+                self._rollout_cost = max(time.perf_counter() - rollout_start, self._rollout_cost)
+                break
+            value = node.value + scratch.score - start_score
+            if crashed:
+                value -= CRASH_PENALTY
+            node.children.append(PlanNode(checkpoint.save(scratch), (steer, throttle), link, node.depth + 1,
+                                          value, self._clearance(scratch), crashed))
+            self.expansions += 1
+            cost = time.perf_counter() - rollout_start
+            self._rollout_cost = max(cost, self._rollout_cost * ROLLOUT_COST_DECAY)
+        expanded = len(node.children) == len(self.actions)
+        if len(node.children) == tried:
+            return expanded
+        # carry the best line found up towards the root
+        while node is not None:
+            best = max(child.best for child in node.children)
+            if best == node.best:
+                break
+            node.best = best
+            node = node.parent() if node.parent is not None else None
+        return expanded
+
+    def _clearance(self, logic) -> float:
+        """Lateral room between the car and the nearest road edge or oncoming obstacle or opponent."""
+        car_x, car_y = logic.car_x, logic.car_y
+        road_left = (self.config.WIDTH - self.config.TRACK_WIDTH) // 2 + 25
+        road_right = road_left + self.config.TRACK_WIDTH - 50
+        gap = min(MAX_CLEARANCE, car_x - road_left, road_right - car_x)
+        for table, half_width in ((logic.obstacle_table, None), (logic.opponent_table, 20.0)):
+            if not table.n:
+                continue
+            oncoming = (table.y < car_y) & (table.y > car_y - CLEARANCE_RANGE)
+            if not oncoming.any():
+                continue
+            if half_width is None:
+                left, right = table.x[oncoming], table.x[oncoming] + table.width[oncoming]
+            else:
+                left, right = table.x[oncoming] - half_width, table.x[oncoming] + half_width
+            # distance from the car's sides (20 either way) to the entity's sides, 0 when they overlap
+            apart = np.maximum(left - (car_x + 20), (car_x - 20) - right)
+            gap = min(gap, max(0.0, float(apart.min())))
+        return gap
+
+    def stats(self) -> dict:
+        return {"decisions": self.decisions, "reused": self.reused, "fallbacks": self.fallbacks,
+                "expansions": self.expansions, "depth": self.depth, "overruns": self.overruns,
+                "maxMs": round(self.max_seconds * 1000.0, 3)}
@@ -0,0 +1,219 @@
+# occupancy.py
+from __future__ import annotations
+import math
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+
+from entity_store import EntityTable
+
+# added to every cell an obstacle or opponent covers
+OBSTACLE_COST = 1.0
+OPPONENT_COST = 1.0
+# share of a column's cost charged for driving across it, rather than staying in it
+CROSSING_WEIGHT = 0.5
+
+
+class OccupancyGrid:
+    """A coarse grid over the road saying where the car's centre would hit something.
+
+    Columns are ``col_width`` wide bins over the x range the car's centre
+    can take. Rows are ``row_height`` tall bins of screen y from ``top`` down
+    to the bottom of the screen. Every hazard is stamped grown by the car's
+    half extents (plus ``margin`` to the sides), so a cell's cost is what a
+    car centred in it runs into.
+
+    Obstacles all fall at the same speed, so they are stamped once, when
+    they first show up, into a ring of rows that scrolls with them. A sync
+    measures how far a stamped obstacle moved and rotates the ring by that
+    much, clearing only the rows that wrapped round from the bottom to the
+    top, and takes back the stamps of obstacles that have gone. Opponents move at their own speeds and change lanes; there
+    are few of them, so they are restamped into a separate layer each sync.
+
+    ``cost`` reads one cell in O(1). ``lane_costs`` folds the rows ahead of
+    the car into one cost per column, weighted towards the nearest rows, and
+    ``reach_costs`` charges each column for the columns crossed to get there.
+    """
+
+    def __init__(self, config, row_height: float = 20.0, col_width: float = 10.0, top: float = -100.0,
+                 car_half_width: float = 20.0, car_half_height: float = 40.0, margin: float = 30.0) -> None:
+        self.config = config
+        self.row_height = row_height
+        self.col_width = col_width
+        self.top = top
+        self.car_half_width = car_half_width
+        self.car_half_height = car_half_height
+        # extra room kept to either side of a hazard, since the car drifts while it steers
+        self.margin = margin
+        # the car's centre stays between these, as in GameLogic.update_car_physics
+        self.road_left = (config.WIDTH - config.TRACK_WIDTH) // 2 + 25
+        self.road_right = self.road_left + config.TRACK_WIDTH - 50
+        self.rows = int(math.ceil((config.HEIGHT - top) / row_height))
+        self.cols = int((self.road_right - self.road_left) // col_width) + 1
+        # x of each column's centre, clamped to where the car can be
+        self.col_x = np.minimum(self.road_left + (np.arange(self.cols) + 0.5) * col_width, self.road_right)
+
+        self.static = np.zeros((self.rows, self.cols))
+        self.dynamic = np.zeros((self.rows, self.cols))
+        # how far the obstacles have fallen since the grid was last reset; ring row
+        # k holds world row k mod rows, where world y is screen y minus scroll
+        self.scroll = 0.0
+        # the topmost world row cleared so far; rows scrolling in above it are cleared first
+        self._clear_to = 0
+        self._table: Optional[EntityTable] = None
+        self._last_id = -1
+        # obstacle id -> (first row, last row, first column, last column, world y) of each stamp
+        self._footprints: Dict[int, Tuple[int, int, int, int, float]] = {}
+        self._weights: dict = {}
+        # counters, for stats()
+        self.syncs = 0
+        self.resets = 0
+        self.stamped = 0
+        self.rows_cleared = 0
+
+    # --- coordinates ---
+    def _world_row(self, y: float) -> int:
+        """World row of the screen y, relative to the grid's top."""
+        return math.floor((y - self.top - self.scroll) / self.row_height)
+
+    def row_of(self, y: float) -> int:
+        """Screen row of a screen y, clamped to the grid."""
+        return min(self.rows - 1, max(0, int((y - self.top) // self.row_height)))
+
+    def col_of(self, x: float) -> int:
+        """Column of a car-centre x, clamped to the road."""
+        return min(self.cols - 1, max(0, int((x - self.road_left) // self.col_width)))
+
+    def _ring_rows(self) -> np.ndarray:
+        """Ring index of every screen row, top to bottom."""
+        first = math.floor(-self.scroll / self.row_height)
+        return (first + np.arange(self.rows)) % self.rows
+
+    # --- queries ---
+    def cost(self, x: float, y: float) -> float:
+        """Cost of the cell holding a car centred at (x, y)."""
+        ring = self._world_row(y) % self.rows
+        return float(self.static[ring, self.col_of(x)] + self.dynamic[self.row_of(y), self.col_of(x)])
+
+    def field(self) -> np.ndarray:
+        """The whole cost field in screen order, (rows, cols)."""
+        return self.static[self._ring_rows()] + self.dynamic
+
+    def lane_costs(self, car_y: float, vision: float = 300.0) -> np.ndarray:
+        """Cost per column of the rows from ``car_y`` up to ``vision`` ahead, nearest counting most."""
+        key = (car_y, vision)
+        weights = self._weights.get(key)
+        if weights is None:
+            centres = self.top + (np.arange(self.rows) + 0.5) * self.row_height
+            ahead = car_y - centres
+            # the rows the car is in now count fully; rows past it not at all
+            weights = np.where(ahead < -self.row_height, 0.0, np.clip(1.0 - ahead / vision, 0.0, 1.0))
+            self._weights[key] = weights
+        # rotate the row weights into ring order rather than the static layer into screen order
+        k = self.rows - math.floor(-self.scroll / self.row_height) % self.rows
+        return np.concatenate((weights[k:], weights[:k])) @ self.static + weights @ self.dynamic
+
+    def reach_costs(self, car_x: float, car_y: float, vision: float = 300.0) -> np.ndarray:
+        """Cost per column of steering there from ``car_x``.
+
+        A column's own lane cost, or CROSSING_WEIGHT times the worst column
+        passed over on the way if that is more. The car's own column is not
+        counted as crossed, so a blocked car is free to leave it.
+        """
+        costs = self.lane_costs(car_y, vision)
+        c = self.col_of(car_x)
+        crossed = np.zeros_like(costs)
+        crossed[c + 1:] = np.maximum.accumulate(costs[c + 1:])
+        crossed[:c] = np.maximum.accumulate(costs[c - 1::-1])[::-1] if c else crossed[:0]
+        return np.maximum(costs, CROSSING_WEIGHT * crossed)
+
+    # --- updates ---
+    def reset(self) -> None:
+        """Forget everything stamped, e.g. after the world was restarted or restored."""
+        self.static[:] = 0.0
+        self.dynamic[:] = 0.0
+        self.scroll = 0.0
+        self._clear_to = 0
+        self._last_id = -1
+        self._footprints.clear()
+        self.resets += 1
+
+    def advance(self, dy: float) -> None:
+        """Scroll the obstacle layer down by ``dy`` pixels."""
+        if dy <= 0.0:
+            return
+        self.scroll += dy
+        # world rows now showing at the top that have not been cleared yet
+        top_row = self._world_row(self.top)
+        if top_row < self._clear_to:
+            wrapped = np.arange(top_row, min(self._clear_to, top_row + self.rows)) % self.rows
+            self.static[wrapped] = 0.0
+            self.rows_cleared += wrapped.size
+            self._clear_to = top_row
+
+    def sync(self, obstacle_table: EntityTable, opponent_table: Optional[EntityTable] = None) -> None:
+        """Bring the grid up to date with the entity tables.
+
+        The obstacle layer follows one table from frame to frame; call
+        ``reset`` after restoring a checkpoint into it.
+        """
+        self.syncs += 1
+        table = obstacle_table
+        if table is not self._table or table.next_id <= self._last_id:
+            # a different or restarted world
+            self.reset()
+            self._table = table
+        ids = table.ids.tolist()
+        rows = {obstacle_id: row for row, obstacle_id in enumerate(ids)}
+
+        # obstacles that scrolled off or were hit take their cost with them
+        for obstacle_id in [i for i in self._footprints if i not in rows]:
+            self._paint(self.static, *self._footprints.pop(obstacle_id)[:4], -OBSTACLE_COST, ring=True)
+        # every obstacle falls the same way, so any one still stamped measures the scroll
+        for obstacle_id, footprint in self._footprints.items():
+            self.advance(float(table.y[rows[obstacle_id]]) - (footprint[4] + self.scroll))
+            break
+
+        if table.next_id - 1 > self._last_id:
+            for obstacle_id in ids:
+                if obstacle_id > self._last_id:
+                    self._stamp_obstacle(table, rows[obstacle_id], obstacle_id)
+            self._last_id = table.next_id - 1
+
+        self.dynamic[:] = 0.0
+        if opponent_table is not None:
+            for x, y in zip(opponent_table.x.tolist(), opponent_table.y.tolist()):
+                self._paint(self.dynamic, *self._cells(x - 20.0, y - 40.0, x + 20.0, y + 40.0, 0.0),
+                            OPPONENT_COST, ring=False)
+
+    def _stamp_obstacle(self, table: EntityTable, row: int, obstacle_id: int) -> None:
+        x, y = float(table.x[row]), float(table.y[row])
+        cells = self._cells(x, y, x + float(table.width[row]), y + float(table.height[row]), self.scroll)
+        self._paint(self.static, *cells, OBSTACLE_COST, ring=True)
+        # the cells, in world rows, and the obstacle's world y to measure the scroll by later
+        self._footprints[obstacle_id] = cells + (y - self.scroll,)
+        self.stamped += 1
+
+    def _cells(self, left: float, top: float, right: float, bottom: float,
+               offset: float) -> Tuple[int, int, int, int]:
+        """First and last row and column a box covers once grown by the car's half extents."""
+        return (math.floor((top - self.car_half_height - self.top - offset) / self.row_height),
+                math.floor((bottom + self.car_half_height - self.top - offset) / self.row_height),
+                max(0, math.floor((left - self.car_half_width - self.margin - self.road_left) / self.col_width)),
+                min(self.cols - 1,
+                    math.floor((right + self.car_half_width + self.margin - self.road_left) / self.col_width)))
+
+    def _paint(self, layer: np.ndarray, r0: int, r1: int, c0: int, c1: int, cost: float, ring: bool) -> None:
+        # only the rows on the grid; in the ring, those are the world rows now showing
+        first = self._world_row(self.top) if ring else 0
+        r0, r1 = max(r0, first), min(r1, first + self.rows - 1)
+        if r0 > r1 or c0 > c1:
+            return
+        if ring:
+            layer[np.arange(r0, r1 + 1) % self.rows, c0:c1 + 1] += cost
+        else:
+            layer[r0:r1 + 1, c0:c1 + 1] += cost
+
+    def stats(self) -> dict:
+        return {"syncs": self.syncs, "resets": self.resets, "stamped": self.stamped,
+                "rowsCleared": self.rows_cleared}
@@ -0,0 +1,102 @@
+# opponent_controller.py
+from __future__ import annotations
+from typing import Optional
+
+import numpy as np
+
+from entity_store import EntityTable
+
+# how far below an opponent, and how far to either side, an obstacle makes it dodge
+DODGE_AHEAD = 150.0
+DODGE_SIDE = 70.0
+DODGE_STEP = 8.0
+
+
+class BatchedOpponentController:
+    """Drives every opponent car in one array pass per base tick.
+
+    The policy is ImprovedAIAgent.decide_for_opponent: drift towards a
+    lane target that is re-rolled every 60 decisions, sidestep obstacles
+    just below, stay on the road and let the speed wander between 3 and 8.
+    Here it runs on every opponent against every obstacle as arrays, so
+    the cost is a handful of NumPy calls however many cars there are.
+
+    An opponent judges all obstacles from where it stands after drifting,
+    rather than moving after each sidestep as the per-opponent loop does.
+
+    Random draws come from one seeded Generator, lane targets first and
+    then speeds, opponent by opponent in row order, so a GameLogic and a
+    one-world BatchedGameLogic given the same stream decide the same.
+    Pass it as ``opponent_ai`` to either one's ``step``.
+    """
+
+    def __init__(self, config, rng: Optional[np.random.Generator] = None) -> None:
+        self.config = config
+        self.rng = rng if rng is not None else np.random.default_rng()
+        # opponents keep further in from the edges than the player's car
+        self.road_left = (config.WIDTH - config.TRACK_WIDTH) // 2 + 40
+        self.road_right = self.road_left + config.TRACK_WIDTH - 80
+        self.decisions = 0
+
+    def decide_opponents(self, opponent_table: EntityTable, obstacle_table: EntityTable) -> None:
+        """One decision for every opponent in a GameLogic's tables, written back in place."""
+        if not opponent_table.n:
+            return
+        self.decide_rows(opponent_table.x, opponent_table.y, opponent_table.speed,
+                         opponent_table.col('lane_change_target'), opponent_table.col('lane_change_timer'),
+                         obstacle_table.x[None], obstacle_table.y[None])
+        opponent_table.touch()
+
+    def decide_batch(self, sim, due: np.ndarray) -> None:
+        """One decision for every opponent in the ``due`` worlds of a BatchedGameLogic."""
+        opp, obs = sim.opponents, sim.obstacles
+        # only the live opponents, each against its own world's obstacle slots
+        w, k = np.nonzero(opp.live() & due[:, None])
+        if not w.size:
+            return
+        x, speed = opp['x'][w, k], opp['speed'][w, k]
+        target, timer = opp['lane_change_target'][w, k], opp['lane_change_timer'][w, k]
+        self.decide_rows(x, opp['y'][w, k], speed, target, timer, obs['x'][w], obs['y'][w], obs.live()[w])
+        opp['x'][w, k] = x
+        opp['speed'][w, k] = speed
+        opp['lane_change_target'][w, k] = target
+        opp['lane_change_timer'][w, k] = timer
+
+    def decide_rows(self, x: np.ndarray, y: np.ndarray, speed: np.ndarray, target: np.ndarray, timer: np.ndarray,
+                    obs_x: np.ndarray, obs_y: np.ndarray, obs_live: Optional[np.ndarray] = None) -> None:
+        """Update a run of opponents' columns in place.
+
+        Opponent arrays are (opponents,); obstacle arrays are (opponents,
+        obstacles), or (1, obstacles) when they all share one road, and
+        ``obs_live`` masks padding slots. A NaN target means the opponent
+        has none yet.
+        """
+        rng = self.rng
+        lo, hi = self.road_left, self.road_right
+        self.decisions += x.size
+
+        retarget = np.isnan(target) | (timer <= 0)
+        n_retarget = int(np.count_nonzero(retarget))
+        if n_retarget:
+            target[retarget] = lo + (hi - lo) * (0.3 + rng.random(n_retarget))
+            timer[retarget] = 60
+        timer -= 1
+
+        # drift towards the target, at most 3 px a tick
+        moved = x + np.clip((target - x) * 0.15, -3.0, 3.0)
+        # sidestep every obstacle just below, away from its side
+        if obs_x.size:
+            dy = obs_y - y[:, None]
+            dx = obs_x - moved[:, None]
+            near = (dy > 0) & (dy < DODGE_AHEAD) & (np.abs(dx) < DODGE_SIDE)
+            if obs_live is not None:
+                near &= obs_live
+            if near.any():
+                moved += (near * np.where(dx > 0, -DODGE_STEP, DODGE_STEP)).sum(axis=1)
+        np.clip(moved, lo, hi, out=x)
+
+        speed += rng.uniform(-0.15, 0.2, x.size)
+        np.clip(speed, 3.0, 8.0, out=speed)
+
+    def stats(self) -> dict:
+        return {"decisions": self.decisions}
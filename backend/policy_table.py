@@ -0,0 +1,350 @@
+# policy_table.py
+"""ImprovedAIAgent distilled into a memory-mapped lookup table.
+
+    python policy_table.py build -o ai_policy.npy --workers 8
+    python policy_table.py report ai_policy.npy --seeds 4 --steps 3000
+
+``build`` runs ImprovedAIAgent's threat assessment and lane planning once
+for every quantized state (car x, car speed and the nearest K threats,
+each binned by kind, distance ahead and lateral offset) and writes the
+lane it picks, its emergency dodge and its throttle verdict to
+``ai_policy.npy``, with the bins in ``ai_policy.json`` beside it.
+TableAIAgent answers each tick with one lookup into that file plus the
+agent's usual lane cooldown and steering smoothing. ``report`` drives
+seeded games with the full agent and scores the table against it on
+every state visited.
+"""
+from __future__ import annotations
+import argparse
+import bisect
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import asdict, dataclass, replace
+from typing import List, Optional, Tuple
+
+import numpy as np
+
+from advanced_f1_refactor_with_ai import Config, GameLogic
+from improved_ai_agent import ImprovedAIAgent, Vector2D
+from opponent_controller import BatchedOpponentController
+from timestep import StepClock
+
+# one record per quantized state: the lane ImprovedAIAgent picks (0 left, 1 centre,
+# 2 right), the side of an emergency dodge (-1 threat on the left, 1 on the right,
+# 0 none) and whether the threats let it keep the throttle on
+POLICY_DTYPE = np.dtype([
+    ('lane', 'i1'),
+    ('dodge', 'i1'),
+    ('throttle', 'u1'),
+])
+
+# threat kinds, as binned
+OBSTACLE, OPPONENT = 0, 1
+
+
+@dataclass(frozen=True)
+class StateBins:
+    """How car and threat state is quantized into a table index.
+
+    Car speed only matters to ImprovedAIAgent through its throttle
+    thresholds, so its bins are cut exactly there. Each of the ``threats``
+    nearest threats (0 < distance ahead < vision, the way ImprovedAIAgent
+    looks) is one code: 0 for none, otherwise its kind, distance bin and
+    lateral offset bin. Offsets beyond ``lateral_range`` fall in the
+    outermost bins.
+    """
+    speed_edges: Tuple[float, ...] = (10.5, 15.0)
+    x_bins: int = 16
+    threats: int = 2
+    distance_bins: int = 6
+    lateral_bins: int = 8
+    lateral_range: float = 200.0
+    vision: float = 300.0
+
+    @classmethod
+    def for_config(cls, config: Config, **overrides) -> "StateBins":
+        return cls(speed_edges=(config.MAX_SPEED * 0.7, config.MAX_SPEED), **overrides)
+
+    @property
+    def threat_codes(self) -> int:
+        return 1 + 2 * self.distance_bins * self.lateral_bins
+
+    @property
+    def shape(self) -> Tuple[int, ...]:
+        return (self.x_bins, len(self.speed_edges) + 1) + (self.threat_codes,) * self.threats
+
+    @property
+    def size(self) -> int:
+        return int(np.prod(self.shape))
+
+    def road(self, config: Config) -> Tuple[float, float]:
+        road_left = (config.WIDTH - config.TRACK_WIDTH) // 2 + 25
+        return road_left, road_left + config.TRACK_WIDTH - 50
+
+    def _threat_code(self, kind: int, distance: float, lateral: float) -> int:
+        di = min(self.distance_bins - 1, int(distance / self.vision * self.distance_bins))
+        li = int((lateral + self.lateral_range) / (2 * self.lateral_range) * self.lateral_bins)
+        li = min(self.lateral_bins - 1, max(0, li))
+        return 1 + (kind * self.distance_bins + di) * self.lateral_bins + li
+
+    def encode_one(self, config: Config, car_x: float, car_y: float, car_speed: float,
+                   obs_x, obs_y, opp_x, opp_y) -> int:
+        """Table index for one car, in plain Python; cheaper than ``encode`` for a handful of entities."""
+        road_left, road_right = self.road(config)
+        index = min(self.x_bins - 1, max(0, int((car_x - road_left) / (road_right - road_left) * self.x_bins)))
+        index = index * (len(self.speed_edges) + 1) + bisect.bisect_right(self.speed_edges, car_speed)
+        seen = []
+        for kind, xs, ys in ((OBSTACLE, obs_x, obs_y), (OPPONENT, opp_x, opp_y)):
+            for x, y in zip(xs, ys):
+                distance = y - car_y
+                if 0 < distance < self.vision:
+                    seen.append((distance, kind, x))
+        seen.sort(key=lambda threat: threat[0])
+        for slot in range(self.threats):
+            code = 0
+            if slot < len(seen):
+                distance, kind, x = seen[slot]
+                code = self._threat_code(kind, distance, x - car_x)
+            index = index * self.threat_codes + code
+        return index
+
+    def encode(self, config: Config, car_x: np.ndarray, car_y: np.ndarray, car_speed: np.ndarray,
+               ent_x: np.ndarray, ent_y: np.ndarray, ent_kind: np.ndarray, ent_live: np.ndarray) -> np.ndarray:
+        """Flat table index for each of B cars; entity arrays are (B, N)."""
+        road_left, road_right = self.road(config)
+        xi = np.clip(((car_x - road_left) / (road_right - road_left) * self.x_bins).astype(np.int64),
+                     0, self.x_bins - 1)
+        index = xi * (len(self.speed_edges) + 1) + np.searchsorted(self.speed_edges, car_speed, side='right')
+
+        distance = ent_y - car_y[:, None]
+        seen = ent_live & (distance > 0) & (distance < self.vision)
+        # nearest first; unseen entities sort last
+        order = np.argsort(np.where(seen, distance, np.inf), axis=1, kind='stable')[:, :self.threats]
+        rows = np.arange(len(car_x))[:, None]
+        seen, distance = seen[rows, order], distance[rows, order]
+        lateral = ent_x[rows, order] - car_x[:, None]
+        di = np.minimum((distance / self.vision * self.distance_bins).astype(np.int64), self.distance_bins - 1)
+        li = np.clip(((lateral + self.lateral_range) / (2 * self.lateral_range) * self.lateral_bins).astype(np.int64),
+                     0, self.lateral_bins - 1)
+        codes = np.where(seen, 1 + (ent_kind[rows, order] * self.distance_bins + di) * self.lateral_bins + li, 0)
+        for slot in range(self.threats):
+            code = codes[:, slot] if slot < codes.shape[1] else 0
+            index = index * self.threat_codes + code
+        return index
+
+    def representative(self, config: Config, index: int) -> Tuple[float, float, float, list, list]:
+        """Car x, y, speed, obstacles and opponents at the centre of one table cell."""
+        cell = np.unravel_index(index, self.shape)
+        road_left, road_right = self.road(config)
+        car_x = road_left + (cell[0] + 0.5) / self.x_bins * (road_right - road_left)
+        car_y = float(config.HEIGHT - 120)
+        edges = (0.0,) + tuple(self.speed_edges) + (self.speed_edges[-1] + 1.0,)
+        car_speed = (edges[cell[1]] + edges[cell[1] + 1]) / 2
+        obstacles, opponents = [], []
+        for code in cell[2:]:
+            if not code:
+                continue
+            kind, rest = divmod(int(code) - 1, self.distance_bins * self.lateral_bins)
+            di, li = divmod(rest, self.lateral_bins)
+            x = car_x - self.lateral_range + (li + 0.5) / self.lateral_bins * 2 * self.lateral_range
+            y = car_y + (di + 0.5) / self.distance_bins * self.vision
+            if kind == OBSTACLE:
+                obstacles.append({'x': x, 'y': y, 'width': 30})
+            else:
+                opponents.append({'x': x, 'y': y})
+        return car_x, car_y, car_speed, obstacles, opponents
+
+
+def _lanes(config: Config) -> Tuple[float, float, float]:
+    """ImprovedAIAgent's three lane centres."""
+    road_left = (config.WIDTH - config.TRACK_WIDTH) // 2 + 25
+    road_right = road_left + config.TRACK_WIDTH - 50
+    lane_width = (road_right - road_left) / 3
+    return (road_left + lane_width * 0.5, (road_left + road_right) / 2, road_right - lane_width * 0.5)
+
+
+def _sample_chunk(config: Config, bins: StateBins, start: int, stop: int) -> np.ndarray:
+    agent = ImprovedAIAgent(config)
+    lanes = _lanes(config)
+    road_left, road_right = bins.road(config)
+    out = np.zeros(stop - start, dtype=POLICY_DTYPE)
+    for i in range(start, stop):
+        car_x, car_y, car_speed, obstacles, opponents = bins.representative(config, i)
+        # the steps of ImprovedAIAgent.decide, stopped before the state it carries between ticks
+        agent.target_lane = None
+        agent.lane_change_cooldown = 0
+        car_pos = Vector2D(car_x, car_y)
+        threats = agent._assess_threats(car_pos, car_speed, obstacles, opponents)
+        agent._plan_path(car_pos, car_speed, threats, road_left, road_right, lanes[1])
+        rec = out[i - start]
+        rec['lane'] = min(range(3), key=lambda lane: abs(lanes[lane] - agent.target_lane))
+        if threats and threats[0]['danger'] > 1.5:
+            rec['dodge'] = 1 if threats[0]['pos'].x > car_x else -1
+        # below top speed, so only the threat rules can lift the throttle
+        rec['throttle'] = agent._decide_throttle(min(car_speed, config.MAX_SPEED - 1e-6), threats)
+    return out
+
+
+def build_table(out_path: str, config: Optional[Config] = None, bins: Optional[StateBins] = None,
+                workers: Optional[int] = None, chunk_size: int = 20000) -> str:
+    """Sample ImprovedAIAgent over every state of ``bins`` into ``out_path`` on a process pool."""
+    config = config or Config()
+    bins = bins or StateBins.for_config(config)
+    table = np.lib.format.open_memmap(out_path, mode='w+', dtype=POLICY_DTYPE, shape=(bins.size,))
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        jobs = [(start, pool.submit(_sample_chunk, config, bins, start, min(bins.size, start + chunk_size)))
+                for start in range(0, bins.size, chunk_size)]
+        for start, job in jobs:
+            chunk = job.result()
+            table[start:start + len(chunk)] = chunk
+    table.flush()
+    with open(_bins_path(out_path), 'w') as f:
+        json.dump(asdict(bins), f, indent=2)
+    return out_path
+
+
+def _bins_path(path: str) -> str:
+    return os.path.splitext(path)[0] + '.json'
+
+
+class TablePolicy:
+    """A built table, memory-mapped, with vectorized lookups for any number of cars."""
+
+    def __init__(self, path: str, config: Config) -> None:
+        self.path = path
+        self.config = config
+        with open(_bins_path(path)) as f:
+            fields = json.load(f)
+        self.bins = StateBins(**{**fields, 'speed_edges': tuple(fields['speed_edges'])})
+        self.records = np.load(path, mmap_mode='r')
+        if self.records.dtype != POLICY_DTYPE or len(self.records) != self.bins.size:
+            raise ValueError(f"{path} is not a policy table for its bins")
+
+    def lookup(self, car_x: np.ndarray, car_y: np.ndarray, car_speed: np.ndarray, ent_x: np.ndarray,
+               ent_y: np.ndarray, ent_kind: np.ndarray, ent_live: np.ndarray) -> Tuple[np.ndarray, ...]:
+        """Lane, dodge side and threat throttle for B cars; entity arrays are (B, N)."""
+        rec = self.records[self.bins.encode(self.config, car_x, car_y, car_speed, ent_x, ent_y, ent_kind, ent_live)]
+        return rec['lane'], rec['dodge'], rec['throttle'].astype(bool)
+
+
+class TableAIAgent(ImprovedAIAgent):
+    """
+    ImprovedAIAgent's driving from a precomputed table.
+
+    Each decision quantizes the state and reads one record: the lane the
+    full agent would pick, which way it would dodge an emergency, and
+    whether the threats let it keep the throttle on. The lane change
+    cooldown, the dodge, the steering towards the exact car position and
+    its smoothing then run as in ImprovedAIAgent. Opponent driving is
+    inherited unchanged.
+    """
+
+    def __init__(self, config, policy: TablePolicy, rng=None) -> None:
+        super().__init__(config, rng)
+        self.policy = policy
+        self.lanes = _lanes(config)
+
+    def decide(self, car_x: float, car_y: float, car_speed: float,
+               obstacles: List[dict], opponents: List[dict]) -> Tuple[float, bool]:
+        return self.decide_arrays(car_x, car_y, car_speed,
+                                  [o['x'] for o in obstacles], [o['y'] for o in obstacles], None,
+                                  [o['x'] for o in opponents], [o['y'] for o in opponents])
+
+    def decide_arrays(self, car_x: float, car_y: float, car_speed: float,
+                      obs_x, obs_y, obs_width, opp_x, opp_y) -> Tuple[float, bool]:
+        policy = self.policy
+        index = policy.bins.encode_one(self.config, car_x, car_y, car_speed,
+                                       _floats(obs_x), _floats(obs_y), _floats(opp_x), _floats(opp_y))
+        lane, dodge, throttle = policy.records[index].item()
+        road_left, road_right = policy.bins.road(self.config)
+        target_x = self._commit_target(self.lanes[lane], car_x + dodge if dodge else None,
+                                       car_x, road_left, road_right)
+        steer = self._calculate_steering(car_x, target_x, car_speed)
+        return steer, bool(throttle) and car_speed < self.config.MAX_SPEED
+
+
+def _floats(values) -> list:
+    return values.tolist() if isinstance(values, np.ndarray) else values
+
+
+def agreement_report(policy: TablePolicy, seeds: int = 4, steps: int = 3000) -> dict:
+    """Drive seeded games with ImprovedAIAgent and score TableAIAgent on every state visited.
+
+    Both agents see the same states and keep their own steering smoothing.
+    Also times a decision of each and plays the same seeds with the table
+    agent driving, to compare how long each survives.
+    """
+    config = policy.config
+    steer_error, same_side, same_throttle = [], [], []
+    full_us, table_us = [], []
+    survival = {"full": [], "table": []}
+    for seed in range(seeds):
+        for mode in ("full", "table"):
+            logic = GameLogic(replace(config, SEED=seed), clock=StepClock())
+            logic.verbose = False
+            opponents = BatchedOpponentController(config, logic.rng.numpy('opponents'))
+            full = ImprovedAIAgent(config)
+            table = TableAIAgent(config, policy)
+            step = 0
+            while step < steps:
+                args = (logic.car_x, logic.car_y, logic.car_speed, logic.obstacle_table, logic.opponent_table)
+                t0 = time.perf_counter()
+                f_steer, f_throttle = full.decide_tables(*args)
+                t1 = time.perf_counter()
+                t_steer, t_throttle = table.decide_tables(*args)
+                t2 = time.perf_counter()
+                if mode == "full":
+                    full_us.append((t1 - t0) * 1e6)
+                    table_us.append((t2 - t1) * 1e6)
+                    steer_error.append(abs(f_steer - t_steer))
+                    same_side.append(np.sign(round(f_steer, 1)) == np.sign(round(t_steer, 1)))
+                    same_throttle.append(f_throttle == t_throttle)
+                    steer, throttle = f_steer, f_throttle
+                else:
+                    steer, throttle = t_steer, t_throttle
+                step += 1
+                if logic.step(steer, throttle, opponent_ai=opponents):
+                    break
+            survival[mode].append(step)
+    return {
+        "cells": policy.bins.size,
+        "bytes": int(policy.records.nbytes),
+        "decisions": len(steer_error),
+        "steer_mae": float(np.mean(steer_error)),
+        "steer_p95_error": float(np.percentile(steer_error, 95)),
+        "steer_side_agreement": float(np.mean(same_side)),
+        "throttle_agreement": float(np.mean(same_throttle)),
+        "full_decide_us": float(np.median(full_us)),
+        "table_decide_us": float(np.median(table_us)),
+        "survival_steps": {mode: [int(s) for s in runs] for mode, runs in survival.items()},
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Distill ImprovedAIAgent into a lookup table")
+    sub = parser.add_subparsers(dest="command", required=True)
+    build = sub.add_parser("build", help="sample the agent into a table")
+    build.add_argument("-o", "--out", default="ai_policy.npy")
+    build.add_argument("--workers", type=int, default=None)
+    build.add_argument("--threats", type=int, default=StateBins.threats, help="nearest threats per state")
+    report = sub.add_parser("report", help="compare a table with the full agent")
+    report.add_argument("table")
+    report.add_argument("--seeds", type=int, default=4)
+    report.add_argument("--steps", type=int, default=3000)
+    args = parser.parse_args()
+
+    config = Config.from_env()
+    if args.command == "build":
+        bins = StateBins.for_config(config, threats=args.threats)
+        start = time.perf_counter()
+        build_table(args.out, config, bins, args.workers)
+        print(f"Sampled {bins.size} states into {args.out} ({bins.size * POLICY_DTYPE.itemsize / 1e6:.1f} MB) "
+              f"in {time.perf_counter() - start:.1f}s")
+    else:
+        print(json.dumps(agreement_report(TablePolicy(args.table, config), args.seeds, args.steps), indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+# preview.py
+from __future__ import annotations
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Callable, Optional, Tuple
+
+import cv2
+import numpy as np
+
+# JPEG encoding releases the GIL, so a couple of threads keep it off the event loop
+_ENCODE_POOL = ThreadPoolExecutor(max_workers=2, thread_name_prefix="preview-encode")
+
+
+@dataclass(frozen=True)
+class EncodedPreview:
+    seq: int
+    jpeg: bytes
+    created_at: float
+
+
+class PreviewEncoder:
+    """Turns camera frames into small JPEG previews at a fixed rate.
+
+    One encoder belongs to one camera: every client watching that camera gets
+    the same encoded bytes and only sends them when ``seq`` moved past what it
+    already sent. ``poll`` never waits for an encode, it only starts one when
+    the next preview is due and picks up finished results.
+    """
+
+    def __init__(self, rate_hz: float = 10.0, size: Tuple[int, int] = (160, 120), quality: int = 40,
+                 executor: Optional[ThreadPoolExecutor] = None) -> None:
+        self.period = 1.0 / rate_hz if rate_hz > 0 else float("inf")
+        self.size = size
+        self.quality = quality
+        self.executor = executor or _ENCODE_POOL
+        self.current: Optional[EncodedPreview] = None
+        self.encode_errors = 0
+        self._pending: Optional[asyncio.Future] = None
+        self._last_start = 0.0
+        self._seq = 0
+
+    def poll(self, frame: Optional[np.ndarray],
+             overlay: Optional[Callable[[np.ndarray], None]] = None) -> Optional[EncodedPreview]:
+        """Return the newest finished preview, kicking off a new encode if one is due."""
+        if self._pending is not None and self._pending.done():
+            try:
+                jpeg = self._pending.result()
+                self._seq += 1
+                self.current = EncodedPreview(self._seq, jpeg, time.monotonic())
+            except Exception as e:
+                self.encode_errors += 1
+                print(f"Error encoding camera preview: {e}")
+            self._pending = None
+
+        now = time.monotonic()
+        if frame is not None and self._pending is None and now - self._last_start >= self.period:
+            self._last_start = now
+            small = cv2.resize(frame, self.size, interpolation=cv2.INTER_AREA)
+            if overlay is not None:
+                # landmarks are drawn on the preview only, never on the full frame
+                overlay(small)
+            loop = asyncio.get_running_loop()
+            self._pending = loop.run_in_executor(self.executor, self._encode, small)
+        return self.current
+
+    def _encode(self, small: np.ndarray) -> bytes:
+        ok, jpg = cv2.imencode('.jpg', small, [int(cv2.IMWRITE_JPEG_QUALITY), self.quality])
+        if not ok:
+            raise ValueError("cv2.imencode failed")
+        return jpg.tobytes()
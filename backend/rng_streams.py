@@ -0,0 +1,56 @@
+# rng_streams.py
+from __future__ import annotations
+import random
+import zlib
+from typing import Dict, Optional
+
+import numpy as np
+
+
+class RandomStreams:
+    """Independent seeded random streams, one per named subsystem.
+
+    Every stream is derived from the root seed and its name alone, so adding
+    a stream or drawing more from one never shifts the numbers another one
+    produces. ``seed=None`` draws a fresh root seed, which is kept in
+    ``seed`` so any run can be reproduced afterwards.
+    """
+
+    def __init__(self, seed: Optional[int] = None) -> None:
+        if seed is None:
+            seed = int(np.random.SeedSequence().entropy % (1 << 63))
+        self.seed = seed
+        self._numpy: Dict[str, np.random.Generator] = {}
+        self._python: Dict[str, random.Random] = {}
+
+    def _seed_sequence(self, name: str) -> np.random.SeedSequence:
+        return np.random.SeedSequence(self.seed, spawn_key=(zlib.crc32(name.encode()),))
+
+    def numpy(self, name: str) -> np.random.Generator:
+        """The NumPy Generator for ``name``; the same object on every call."""
+        gen = self._numpy.get(name)
+        if gen is None:
+            gen = self._numpy[name] = np.random.Generator(np.random.PCG64(self._seed_sequence(name)))
+        return gen
+
+    def python(self, name: str) -> random.Random:
+        """The random.Random for ``name``; the same object on every call."""
+        rng = self._python.get(name)
+        if rng is None:
+            rng = self._python[name] = random.Random(int(self._seed_sequence(name).generate_state(2, np.uint64)[0]))
+        return rng
+
+    def state(self) -> dict:
+        """Positions of all streams created so far, for checkpoints."""
+        return {
+            "seed": self.seed,
+            "numpy": {name: gen.bit_generator.state for name, gen in self._numpy.items()},
+            "python": {name: rng.getstate() for name, rng in self._python.items()},
+        }
+
+    def set_state(self, state: dict) -> None:
+        self.seed = state["seed"]
+        for name, bit_state in state["numpy"].items():
+            self.numpy(name).bit_generator.state = bit_state
+        for name, py_state in state["python"].items():
+            self.python(name).setstate(py_state)
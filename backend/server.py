@@ -273,24 +273,32 @@
 
 # server.py - Updated to use improved AI
 import asyncio
-import base64
 import json
 import time
+from contextlib import asynccontextmanager
 from typing import Dict, Any, Optional
 
-import cv2
-import numpy as np
-from fastapi import FastAPI, WebSocket, WebSocketDisconnect
+from fastapi import FastAPI, WebSocket
 from fastapi.middleware.cors import CORSMiddleware
 import uvicorn
 
 # Import your existing classes
-from advanced_f1_refactor_with_ai import Config, GameLogic, HandTracker
+from advanced_f1_refactor_with_ai import Config, GameLogic
+from latency import registry as latency_registry
+from sessions import GameSession, registry as session_registry
 
-# Import the new improved AI
-from improved_ai_agent import ImprovedAIAgent
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # load the policy table up front, so a missing or mismatched one stops the server instead of every game
+    cfg = Config.from_env()
+    try:
+        session_registry.policy(cfg)
+    except (OSError, ValueError) as e:
+        raise RuntimeError(f"F1_AI_MODE=table needs a policy table (python policy_table.py build): {e}") from e
+    yield
+    session_registry.close_all()
 
-app = FastAPI()
+app = FastAPI(lifespan=lifespan)
 
 # Enable CORS for React frontend
 app.add_middleware(
@@ -301,27 +309,22 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-class ConnectionManager:
-    def __init__(self):
-        self.active_ws: Optional[WebSocket] = None
-
-    async def connect(self, websocket: WebSocket):
-        await websocket.accept()
-        self.active_ws = websocket
-        print("✅ Client connected")
-
-    def disconnect(self):
-        self.active_ws = None
-        print("❌ Client disconnected")
+def build_track_descriptor(config: Config) -> Dict[str, Any]:
+    """Static track geometry, sent once when a client connects.
 
-    async def send_json(self, data: dict):
-        if self.active_ws:
-            try:
-                await self.active_ws.send_text(json.dumps(data))
-            except Exception as e:
-                print(f"Error sending data: {e}")
-
-manager = ConnectionManager()
+    Snapshots only carry ``trackOffset``; the client places lane markings
+    the way track_line_positions() does.
+    """
+    road_left = (config.WIDTH - config.TRACK_WIDTH) // 2
+    return {
+        "type": "track",
+        "width": config.WIDTH,
+        "height": config.HEIGHT,
+        "roadLeft": road_left,
+        "roadRight": road_left + config.TRACK_WIDTH,
+        "lineGap": config.LINE_GAP,
+        "lineEnd": config.HEIGHT + 50
+    }
 
 def build_state_snapshot(
     logic: GameLogic,
@@ -329,18 +332,28 @@ def build_state_snapshot(
     steering: float,
     hand_detected: bool,
     ai_active: bool,
-    cam_frame=None,
-    game_over: bool = False
+    game_over: bool = False,
+    alpha: float = 1.0
 ) -> Dict[str, Any]:
-    """Build a compact state snapshot to send to frontend"""
-    road_left = (config.WIDTH - config.TRACK_WIDTH) // 2
-    road_right = road_left + config.TRACK_WIDTH
+    """Build a compact state snapshot to send to frontend.
+
+    The camera preview is not part of it; it goes out as binary JPEG frames.
+    Positions are interpolated ``alpha`` of the way from the previous sim
+    step to the latest one, so motion stays smooth when sends and sim steps
+    don't line up.
+    """
+    car_x = logic.prev_car_x + (logic.car_x - logic.prev_car_x) * alpha
+    line_shift = (1.0 - alpha) * logic.line_speed * logic.tick_scale
+    ob, opp, pu = logic.obstacle_table, logic.opponent_table, logic.power_up_table
+    ob_x, ob_y = logic.interpolated(ob, alpha)
+    opp_x, opp_y = logic.interpolated(opp, alpha)
+    pu_x, pu_y = logic.interpolated(pu, alpha)
     
     snapshot = {
         "timestamp": time.time(),
         "gameOver": game_over,
         "car": {
-            "x": float(logic.car_x),
+            "x": float(car_x),
             "y": float(logic.car_y),
             "speed": float(logic.car_speed),
             "steering": float(logic.current_steering)
@@ -350,184 +363,190 @@ def build_state_snapshot(
             "handDetected": bool(hand_detected),
             "aiActive": bool(ai_active)
         },
-        "track": {
-            "width": config.WIDTH,
-            "height": config.HEIGHT,
-            "roadLeft": road_left,
-            "roadRight": road_right,
-            "linePositions": [float(y) for y in logic.track_lines]
-        },
+        "trackOffset": (logic.track_offset - line_shift) % config.LINE_GAP,
         "obstacles": [
-            {
-                "x": float(o["x"]),
-                "y": float(o["y"]),
-                "width": float(o.get("width", 30)),
-                "height": float(o.get("height", 40)),
-                "type": o["type"]
-            }
-            for o in logic.obstacles
+            {"x": x, "y": y, "width": w, "height": h, "type": ob.type_names[code]}
+            for x, y, w, h, code in zip(ob_x.tolist(), ob_y.tolist(), ob.width.tolist(),
+                                        ob.height.tolist(), ob.type.tolist())
         ],
         "opponents": [
-            {
-                "x": float(o["x"]),
-                "y": float(o["y"]),
-                "speed": float(o.get("speed", 5))
-            }
-            for o in logic.opponent_cars
+            {"x": x, "y": y, "speed": speed}
+            for x, y, speed in zip(opp_x.tolist(), opp_y.tolist(), opp.speed.tolist())
         ],
         "powerups": [
-            {
-                "x": float(p["x"]),
-                "y": float(p["y"]),
-                "type": p["type"],
-                "pulse": float(p.get("pulse", 0))
-            }
-            for p in logic.power_ups
+            {"x": x, "y": y, "type": pu.type_names[code], "pulse": pulse}
+            for x, y, code, pulse in zip(pu_x.tolist(), pu_y.tolist(), pu.type.tolist(), pu.col('pulse').tolist())
         ],
         "score": int(logic.score),
         "level": int(logic.level),
         "boostActive": bool(logic.boost_active),
-        "invincible": bool(logic.invincible)
+        "invincible": bool(logic.invincible),
+        "alpha": round(float(alpha), 3)
     }
     
-    # Optional: Add small camera preview as base64 JPEG
-    if cam_frame is not None:
-        try:
-            small = cv2.resize(cam_frame, (160, 120))
-            _, jpg = cv2.imencode('.jpg', small, [int(cv2.IMWRITE_JPEG_QUALITY), 40])
-            b64 = base64.b64encode(jpg.tobytes()).decode('ascii')
-            snapshot['camPreview'] = b64
-        except Exception as e:
-            print(f"Error encoding camera preview: {e}")
-    
     return snapshot
 
 @app.get("/")
 async def root():
     return {"message": "F1 Vision Racer Backend (Enhanced AI)", "status": "running"}
 
+@app.get("/stats/latency")
+async def latency_stats():
+    """Rolling p50/p95/p99 per pipeline stage (ms), overall and per session"""
+    return latency_registry.summary()
+
+@app.get("/stats/clients")
+async def client_stats():
+    """Per-client snapshots sent and dropped, and each game's tick rate"""
+    return session_registry.client_stats()
+
+@app.get("/stats/sessions")
+async def session_stats():
+    """Every session's resource use and state, and the input feeds they share"""
+    return session_registry.stats()
+
+async def run_game(session: GameSession):
+    """Tick one session's game at TICK_HZ, handing each snapshot to its client's sender."""
+    cfg, logic, feed, latency = session.config, session.logic, session.feed, session.latency
+    print(f"🎮 Game loop started with Enhanced AI (session {session.session_id})")
+    
+    while True:
+        started = time.perf_counter()
+        # Hand tracking runs once per new frame, whichever session on this source sees it first
+        reading = feed.latest()
+        session.input_seconds += time.perf_counter() - started
+        if reading is None:
+            await asyncio.sleep(session.schedule.delay())
+            continue
+        steering_input = reading.steering
+        hand_detected = reading.hand_detected
+        trace = latency.new_trace()
+        trace.mark("capture", reading.captured_at)
+        trace.mark("inference", reading.inferred_at)
+        trace.mark("tick")
+        
+        # AI takeover logic
+        now = time.time()
+        if not hand_detected:
+            if session.no_hand_start is None:
+                session.no_hand_start = now
+            elif now - session.no_hand_start > 1.0:  # 1 second delay
+                session.ai_active = True
+        else:
+            session.no_hand_start = None
+            session.ai_active = False
+        
+        # AI decision making with IMPROVED algorithm
+        if session.ai_active:
+            ai_started = time.perf_counter()
+            steer_decision, throttle = session.ai.decide_tables(
+                car_x=logic.car_x,
+                car_y=logic.car_y,
+                car_speed=logic.car_speed,
+                obstacle_table=logic.obstacle_table,
+                opponent_table=logic.opponent_table
+            )
+            session.ai_seconds += time.perf_counter() - ai_started
+            steering_input = steer_decision
+            hand_for_physics = throttle
+        else:
+            hand_for_physics = hand_detected
+        trace.mark("ai")
+        
+        # Step the sim as many fixed steps as have elapsed, unless game over
+        for _ in range(session.stepper.advance()):
+            if session.game_over:
+                break
+            # Use improved AI for opponents too
+            collision = logic.step(steering_input, hand_for_physics, opponent_ai=session.opponents)
+            if collision:
+                print(f"💥 Collision: {collision} (session {session.session_id})")
+                session.game_over = True
+        trace.mark("physics")
+        
+        # Build the state snapshot and hand it to the sender with the newest preview
+        snapshot = build_state_snapshot(
+            logic, cfg, steering_input, hand_detected, session.ai_active, session.game_over,
+            session.stepper.alpha
+        )
+        snapshot["traceId"] = trace.trace_id
+        text = json.dumps(snapshot)
+        trace.mark("serialize")
+        if session.sender is not None:
+            session.sender.publish(text, trace, feed.poll_preview())
+        session.ticks += 1
+        session.busy_seconds += time.perf_counter() - started
+        
+        # Hold TICK_HZ, counting this tick's work towards the period
+        await asyncio.sleep(session.schedule.delay())
+
+async def receive_messages(session: GameSession, websocket: WebSocket):
+    """Client messages (restart, etc.); a disconnect raises out of here and ends the connection."""
+    while True:
+        message = await websocket.receive_text()
+        try:
+            data = json.loads(message)
+        except ValueError:
+            continue  # Ignore malformed messages
+        if not isinstance(data, dict):
+            continue
+        
+        if data.get("action") == "restart":
+            print(f"🔄 Restarting game (session {session.session_id})...")
+            session.restart()
+        elif data.get("action") == "boost":
+            session.logic.activate_boost()
+        elif data.get("action") == "rendered":
+            session.latency.rendered(data.get("traceId"))
+
 @app.websocket("/ws/game")
-async def game_websocket(websocket: WebSocket):
-    await manager.connect(websocket)
+async def game_websocket(websocket: WebSocket, session: Optional[str] = None):
+    """Play a new game, or with ?session=<id> pick up one that is still open."""
+    await websocket.accept()
     
-    # Initialize game components with IMPROVED AI
-    cfg = Config()
-    logic = GameLogic(cfg)
-    tracker = HandTracker(cfg)
-    ai = ImprovedAIAgent(cfg)  # Using the new improved AI!
+    game = session_registry.get(session)
+    resumed = game is not None
+    if game is None:
+        try:
+            game = session_registry.create(Config.from_env())
+        except Exception as e:  # SessionLimitError, a frame source that will not open, a bad config
+            print(f"Cannot start a session: {e!r}")
+            await websocket.send_text(json.dumps({"error": str(e)}))
+            await websocket.close()
+            return
     
-    # Camera capture
-    cap = cv2.VideoCapture(0)
-    if not cap.isOpened():
-        await websocket.send_text(json.dumps({"error": "Cannot open camera"}))
-        return
+    # a second connection to the same session takes it over; the first is closed
+    previous = game.websocket
+    sender = game.attach(websocket)
+    if previous is not None:
+        try:
+            await previous.close(code=4000, reason="Session resumed elsewhere")
+        except RuntimeError:
+            pass  # already closing
+    print(f"✅ Client connected to session {game.session_id}" + (" (resumed)" if resumed else ""))
     
-    # Game state
-    no_hand_start: Optional[float] = None
-    ai_active = False
-    game_over = False
+    await websocket.send_text(json.dumps({"type": "session", "sessionId": game.session_id, "resumed": resumed}))
+    await websocket.send_text(json.dumps(build_track_descriptor(game.config)))
+    if game.task is None:
+        game.task = asyncio.create_task(run_game(game))
     
+    # the connection lasts until the client goes, a send fails or the game loop errors
+    game_task = game.task
+    tasks = [asyncio.create_task(sender.run()), asyncio.create_task(receive_messages(game, websocket))]
     try:
-        print("🎮 Game loop started with Enhanced AI")
-        
-        while True:
-            # Read camera frame
-            ret, cam = cap.read()
-            if not ret:
-                await asyncio.sleep(0.01)
-                continue
-            
-            cam = cv2.flip(cam, 1)
-            
-            # Process hand tracking
-            steering_input, hand_detected = tracker.process_frame(cam)
-            
-            # AI takeover logic
-            now = time.time()
-            if not hand_detected:
-                if no_hand_start is None:
-                    no_hand_start = now
-                elif now - no_hand_start > 1.0:  # 1 second delay
-                    ai_active = True
-            else:
-                no_hand_start = None
-                ai_active = False
-            
-            # AI decision making with IMPROVED algorithm
-            if ai_active:
-                steer_decision, throttle = ai.decide(
-                    car_x=logic.car_x,
-                    car_y=logic.car_y,
-                    car_speed=logic.car_speed,
-                    obstacles=logic.obstacles,
-                    opponents=logic.opponent_cars
-                )
-                steering_input = steer_decision
-                hand_for_physics = throttle
-            else:
-                hand_for_physics = hand_detected
-            
-            # Update game logic only if not game over
-            if not game_over:
-                # Spawning
-                logic.spawn_obstacle()
-                logic.spawn_opponent()
-                logic.spawn_power_up()
-                
-                # Updates
-                logic.update_track_lines()
-                logic.update_obstacles()
-                
-                # Use improved AI for opponents too
-                for opp in logic.opponent_cars:
-                    ai.decide_for_opponent(opp, logic.obstacles)
-                
-                logic.update_opponents()
-                logic.update_power_ups()
-                logic.update_car_physics(steering_input, hand_for_physics)
-                logic.update_game_state()
-                
-                # Check collisions
-                collision = logic.check_collisions()
-                if collision:
-                    print(f"💥 Collision: {collision}")
-                    game_over = True
-            
-            # Build and send state snapshot
-            snapshot = build_state_snapshot(
-                logic, cfg, steering_input, hand_detected, ai_active, cam, game_over
-            )
-            await manager.send_json(snapshot)
-            
-            # Listen for client messages (restart, etc.)
-            try:
-                message = await asyncio.wait_for(websocket.receive_text(), timeout=0.001)
-                data = json.loads(message)
-                
-                if data.get("action") == "restart":
-                    print("🔄 Restarting game...")
-                    logic.restart()
-                    game_over = False
-                    ai_active = False
-                    no_hand_start = None
-                elif data.get("action") == "boost":
-                    logic.activate_boost()
-                    
-            except asyncio.TimeoutError:
-                pass  # No message received, continue
-            except Exception as e:
-                pass  # Ignore message errors
-            
-            # Maintain ~30 FPS
-            await asyncio.sleep(1.0 / 30.0)
-            
-    except WebSocketDisconnect:
-        print("Client disconnected")
-    except Exception as e:
-        print(f"Error in game loop: {e}")
+        done, _ = await asyncio.wait(tasks + [game_task], return_when=asyncio.FIRST_COMPLETED)
+        if game_task in done and not game_task.cancelled():
+            print(f"Error in game loop: {game_task.exception()!r}")
+            session_registry.close(game.session_id)
+        else:
+            # the receiver saw the disconnect, or a send failed because the connection is gone
+            print(f"❌ Client disconnected from session {game.session_id}")
     finally:
-        manager.disconnect()
-        cap.release()
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        # the game pauses until a client comes back, unless another has already taken over
+        game.detach(sender)
 
 if __name__ == "__main__":
     print("🚀 Starting F1 Vision Racer Backend Server (Enhanced AI)")
@@ -0,0 +1,364 @@
+# sessions.py
+from __future__ import annotations
+import asyncio
+import time
+import uuid
+from dataclasses import dataclass, replace
+from typing import Dict, List, Optional
+
+import numpy as np
+from fastapi import WebSocket
+
+from advanced_f1_refactor_with_ai import Config, GameLogic, HandTracker
+from camera_capture import CameraCapture
+from client_sender import ClientSender
+from frame_sources import open_frame_source
+from hand_worker import RemoteHandTracker
+from improved_ai_agent import ImprovedAIAgent
+from latency import registry as latency_registry
+from lookahead_agent import LookaheadAIAgent
+from occupancy import OccupancyGrid
+from opponent_controller import BatchedOpponentController
+from policy_table import TableAIAgent, TablePolicy
+from preview import EncodedPreview, PreviewEncoder
+from timestep import FixedStepper, StepClock, TickSchedule
+
+# seconds between sweeps for sessions left idle
+REAP_INTERVAL = 5.0
+
+
+class SessionLimitError(RuntimeError):
+    """Raised when a new session would go over Config.MAX_SESSIONS."""
+
+
+@dataclass(frozen=True)
+class HandReading:
+    """The hand tracker's result for one captured frame."""
+    seq: int
+    frame: np.ndarray
+    steering: float
+    hand_detected: bool
+    captured_at: float  # time.monotonic() right after the grab
+    inferred_at: float
+
+
+class InputFeed:
+    """One frame source with its hand tracker and preview encoder, shared by the sessions playing from it.
+
+    Only one reader can own a camera, and tracking the same frame once per
+    session would multiply the inference cost, so every session on the same
+    FRAME_SOURCE reads from one feed. A new frame is tracked on the tick of
+    whichever session sees it first; the others reuse the reading.
+    """
+
+    def __init__(self, config: Config) -> None:
+        self.source = config.FRAME_SOURCE
+        self.capture = CameraCapture(open_frame_source(config.FRAME_SOURCE, config.FRAME_SOURCE_REALTIME))
+        # F1_HAND_INFERENCE_PROCESS=1 moves MediaPipe off the event loop into a worker process
+        self.tracker = (RemoteHandTracker(config, headless=True) if config.HAND_INFERENCE_PROCESS
+                        else HandTracker(config, headless=True))
+        # camera preview is its own binary stream at PREVIEW_HZ, encoded off the loop
+        self.preview = PreviewEncoder(config.PREVIEW_HZ)
+        self.reading: Optional[HandReading] = None
+        self.users = 0
+        self.inferences = 0
+        self.stopped = False
+        self._previewed_seq = 0
+
+    def start(self) -> bool:
+        return self.capture.start()
+
+    def latest(self) -> Optional[HandReading]:
+        """The reading of the newest frame, tracking it first if nobody has yet.
+
+        Once the source has stopped (read failures, an unplugged camera, the
+        end of a clip) the last reading no longer has a hand in it, so the
+        AI takes over instead of steering on a frozen input. A source that
+        stopped before its first frame raises RuntimeError.
+        """
+        captured = self.capture.read()
+        if captured is not None:
+            steering, hand_detected = self.tracker.process_frame(captured.frame)
+            self.reading = HandReading(captured.seq, captured.frame, steering, hand_detected,
+                                       captured.timestamp, time.monotonic())
+            self.inferences += 1
+        elif not self.capture.is_running:
+            if not self.stopped:
+                self.stopped = True
+                print(f"⚠️ Frame source {self.source} stopped")
+            if self.reading is None:
+                raise RuntimeError(f"Frame source {self.source} stopped before its first frame")
+            if self.reading.hand_detected:
+                self.reading = replace(self.reading, steering=0.0, hand_detected=False)
+        return self.reading
+
+    def poll_preview(self) -> Optional[EncodedPreview]:
+        """The newest encoded preview, offering the encoder each new frame once."""
+        frame = None
+        if self.reading is not None and self.reading.seq != self._previewed_seq:
+            frame = self.reading.frame
+            self._previewed_seq = self.reading.seq
+        return self.preview.poll(frame, self.tracker.draw_overlay)
+
+    def close(self) -> None:
+        self.capture.stop()
+        self.tracker.close()
+
+    def stats(self) -> dict:
+        tracker_stats = getattr(self.tracker, "stats", None)
+        return {"users": self.users, "inferences": self.inferences, "running": self.capture.is_running,
+                "capture": self.capture.stats(),
+                "tracker": tracker_stats() if tracker_stats is not None else {},
+                "previewErrors": self.preview.encode_errors}
+
+
+def _make_ai(config: Config, logic: GameLogic, policy: Optional[TablePolicy] = None):
+    # F1_AI_MODE=lookahead plans by forward-simulating forks of this world under F1_AI_PLAN_BUDGET_MS
+    # and F1_AI_MODE=grid picks lanes from an incrementally scrolled OccupancyGrid;
+    # F1_AI_MODE=table reads decisions from the table at F1_AI_POLICY_TABLE
+    if config.AI_MODE == "lookahead":
+        return LookaheadAIAgent(config, logic, rng=logic.rng.python('ai'))
+    if config.AI_MODE == "grid":
+        return ImprovedAIAgent(config, rng=logic.rng.python('ai'), grid=OccupancyGrid(config))
+    if config.AI_MODE == "table":
+        return TableAIAgent(config, policy or TablePolicy(config.AI_POLICY_TABLE, config), rng=logic.rng.python('ai'))
+    return ImprovedAIAgent(config, rng=logic.rng.python('ai'))  # Using the new improved AI!
+
+
+class GameSession:
+    """One player's game, which outlives any one connection to it.
+
+    A client attaches with its websocket and the game ticks while it is
+    attached. When the client goes, the session is detached and the game
+    pauses where it was; a client that connects again with the session id
+    picks it up. A second client attaching takes the session over from
+    the first. Sessions left detached longer than SESSION_IDLE_TIMEOUT are
+    reaped by the SessionRegistry.
+
+    The game loop itself lives in server.py and runs as ``task``; it adds
+    what each tick costs to the session's counters.
+    """
+
+    def __init__(self, session_id: str, config: Config, feed: InputFeed,
+                 policy: Optional[TablePolicy] = None) -> None:
+        self.session_id = session_id
+        self.config = config
+        self.feed = feed
+        # sim time advances with sim steps; F1_SEED makes a session replayable
+        self.logic = GameLogic(config, clock=StepClock())
+        self.ai = _make_ai(config, self.logic, policy)
+        # every opponent car is driven in one vectorized pass per tick
+        self.opponents = BatchedOpponentController(config, self.logic.rng.numpy('opponents'))
+        # Per-frame latency tracing, echoed back by the client after it renders
+        self.latency = latency_registry.session(session_id)
+        # the sim runs at SIM_HZ in fixed steps, whatever rate the game loop manages
+        self.stepper = FixedStepper(config.SIM_HZ, config.SIM_MAX_CATCHUP)
+        self.schedule = TickSchedule(config.TICK_HZ)
+
+        # Game state
+        self.no_hand_start: Optional[float] = None
+        self.ai_active = False
+        self.game_over = False
+
+        # the attached client, if any, and the game loop running for it
+        self.websocket: Optional[WebSocket] = None
+        self.sender: Optional[ClientSender] = None
+        self.task: Optional[asyncio.Task] = None
+        self.created_at = time.monotonic()
+        self.detached_at: Optional[float] = self.created_at
+
+        # resource accounting
+        self.connections = 0
+        self.ticks = 0
+        self.busy_seconds = 0.0
+        self.input_seconds = 0.0
+        self.ai_seconds = 0.0
+        # totals of the senders of earlier connections
+        self._sent = {"sent": 0, "dropped": 0, "bytes": 0}
+
+    @property
+    def attached(self) -> bool:
+        return self.sender is not None
+
+    def idle_seconds(self, now: Optional[float] = None) -> float:
+        """How long the session has been without a client; 0 while attached."""
+        if self.detached_at is None:
+            return 0.0
+        return (time.monotonic() if now is None else now) - self.detached_at
+
+    def attach(self, websocket: WebSocket) -> ClientSender:
+        """Make ``websocket`` the session's client, taking over from any other."""
+        self._retire_sender()
+        self.websocket = websocket
+        self.sender = ClientSender(websocket, self.latency)
+        self.detached_at = None
+        self.connections += 1
+        # a paused game resumes from where it stopped rather than catching up on the pause
+        if self.task is None:
+            self.stepper.reset()
+            self.schedule.reset()
+            self.no_hand_start = None
+        return self.sender
+
+    def detach(self, sender: ClientSender) -> None:
+        """Drop ``sender``'s client and pause the game, unless another client has taken over."""
+        if sender is not self.sender:
+            return
+        self._retire_sender()
+        self.websocket = None
+        self.detached_at = time.monotonic()
+        self.stop()
+
+    def _retire_sender(self) -> None:
+        if self.sender is not None:
+            stats = self.sender.stats()
+            self._sent["sent"] += stats["sent"]
+            self._sent["dropped"] += stats["dropped"]
+            self._sent["bytes"] += stats["bytes"]
+            self.sender = None
+
+    def stop(self) -> None:
+        if self.task is not None:
+            self.task.cancel()
+            self.task = None
+
+    def restart(self) -> None:
+        self.logic.restart()
+        self.stepper.reset()
+        self.game_over = False
+        self.ai_active = False
+        self.no_hand_start = None
+
+    def close(self) -> None:
+        self.stop()
+        latency_registry.drop(self.session_id)
+
+    def stats(self) -> dict:
+        current = self.sender.stats() if self.sender is not None else {"sent": 0, "dropped": 0, "bytes": 0}
+        return {
+            "attached": self.attached,
+            "connections": self.connections,
+            "frameSource": self.feed.source,
+            "frameSourceRunning": self.feed.capture.is_running,
+            "uptimeSec": round(time.monotonic() - self.created_at, 1),
+            "idleSec": round(self.idle_seconds(), 1),
+            "ticks": self.ticks,
+            "busyMs": round(self.busy_seconds * 1000.0, 1),
+            "busyMsPerTick": round(self.busy_seconds * 1000.0 / self.ticks, 3) if self.ticks else 0.0,
+            "inputMs": round(self.input_seconds * 1000.0, 1),
+            "aiMs": round(self.ai_seconds * 1000.0, 1),
+            "snapshotsSent": self._sent["sent"] + current["sent"],
+            "snapshotsDropped": self._sent["dropped"] + current["dropped"],
+            "bytesSent": self._sent["bytes"] + current["bytes"],
+            "tick": self.schedule.stats(),
+            "sim": self.stepper.stats(),
+            "score": int(self.logic.score),
+            "level": int(self.logic.level),
+            "gameOver": self.game_over,
+        }
+
+
+class SessionRegistry:
+    """Every live GameSession by id, the input feeds they share, and the reaper for idle ones."""
+
+    def __init__(self) -> None:
+        self.sessions: Dict[str, GameSession] = {}
+        self.feeds: Dict[str, InputFeed] = {}
+        # policy tables by path, memory-mapped once and shared by every session driving from them
+        self.policies: Dict[str, TablePolicy] = {}
+        self.created = 0
+        self.reaped = 0
+        self._reaper: Optional[asyncio.Task] = None
+
+    def get(self, session_id: Optional[str]) -> Optional[GameSession]:
+        return self.sessions.get(session_id) if session_id else None
+
+    def policy(self, config: Config) -> Optional[TablePolicy]:
+        """The policy table ``config`` drives from, if any; raises if it is missing or does not fit."""
+        if config.AI_MODE != "table":
+            return None
+        policy = self.policies.get(config.AI_POLICY_TABLE)
+        if policy is None:
+            policy = self.policies[config.AI_POLICY_TABLE] = TablePolicy(config.AI_POLICY_TABLE, config)
+        return policy
+
+    def create(self, config: Config) -> GameSession:
+        """A new session on ``config``'s frame source; call from the event loop."""
+        if len(self.sessions) >= config.MAX_SESSIONS:
+            raise SessionLimitError(f"Server is full ({config.MAX_SESSIONS} sessions)")
+        policy = self.policy(config)
+        feed = self.feeds.get(config.FRAME_SOURCE)
+        if feed is None:
+            feed = InputFeed(config)
+            if not feed.start():
+                feed.close()
+                raise RuntimeError(f"Cannot open frame source {config.FRAME_SOURCE}")
+            self.feeds[config.FRAME_SOURCE] = feed
+        session_id = uuid.uuid4().hex[:8]
+        while session_id in self.sessions:
+            session_id = uuid.uuid4().hex[:8]
+        try:
+            session = GameSession(session_id, config, feed, policy)
+        except Exception:
+            if feed.users == 0:
+                # the feed was opened for this session alone; release it rather than leave it unowned
+                self.feeds.pop(feed.source, None)
+                feed.close()
+            raise
+        self.sessions[session_id] = session
+        feed.users += 1
+        self.created += 1
+        if self._reaper is None or self._reaper.done():
+            self._reaper = asyncio.get_running_loop().create_task(self._reap_forever())
+        return session
+
+    def close(self, session_id: str) -> None:
+        session = self.sessions.pop(session_id, None)
+        if session is None:
+            return
+        session.close()
+        feed = session.feed
+        feed.users -= 1
+        if feed.users <= 0:
+            # the last player on this source is gone; release the camera and the tracker
+            self.feeds.pop(feed.source, None)
+            feed.close()
+
+    def close_all(self) -> None:
+        for session_id in list(self.sessions):
+            self.close(session_id)
+        if self._reaper is not None:
+            self._reaper.cancel()
+            self._reaper = None
+
+    def reap(self, now: Optional[float] = None) -> List[str]:
+        """Close the sessions that have been detached for longer than their idle timeout."""
+        now = time.monotonic() if now is None else now
+        idle = [sid for sid, session in self.sessions.items()
+                if not session.attached and session.idle_seconds(now) > session.config.SESSION_IDLE_TIMEOUT]
+        for sid in idle:
+            self.close(sid)
+            print(f"🧹 Reaped idle session {sid}")
+        self.reaped += len(idle)
+        return idle
+
+    async def _reap_forever(self) -> None:
+        while self.sessions:
+            await asyncio.sleep(REAP_INTERVAL)
+            self.reap()
+
+    def client_stats(self) -> Dict[str, dict]:
+        """Per attached client: snapshots sent and dropped, and its game's tick rate."""
+        return {sid: {**s.sender.stats(), "tick": s.schedule.stats()}
+                for sid, s in self.sessions.items() if s.sender is not None}
+
+    def stats(self) -> dict:
+        return {
+            "sessions": {sid: session.stats() for sid, session in self.sessions.items()},
+            "feeds": {source: feed.stats() for source, feed in self.feeds.items()},
+            "created": self.created,
+            "reaped": self.reaped,
+        }
+
+
+registry = SessionRegistry()
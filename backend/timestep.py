@@ -0,0 +1,111 @@
+# timestep.py
+from __future__ import annotations
+import time
+from typing import Callable, Optional
+
+
+class StepClock:
+    """A clock that only moves when told to, for simulations that must replay exactly.
+
+    Call it like ``time.time``; GameLogic advances it by ``dt`` each step.
+    """
+
+    def __init__(self, start: float = 0.0) -> None:
+        self.now = start
+
+    def __call__(self) -> float:
+        return self.now
+
+    def advance(self, dt: float) -> None:
+        self.now += dt
+
+
+class FixedStepper:
+    """Turns wall-clock time into a whole number of fixed simulation steps.
+
+    Elapsed time goes into an accumulator; each ``advance`` returns how many
+    ``dt`` steps it holds, never more than ``max_steps``. After a long stall
+    the backlog beyond that cap is dropped rather than replayed, so the game
+    slows down briefly instead of spiralling. ``alpha`` is how far the
+    leftover time reaches into the next step, for interpolating rendered
+    positions between the last two states.
+    """
+
+    def __init__(self, hz: float, max_steps: int = 5, clock: Callable[[], float] = time.monotonic) -> None:
+        if hz <= 0:
+            raise ValueError("hz must be positive")
+        self.dt = 1.0 / hz
+        self.max_steps = max_steps
+        self.clock = clock
+        self.accumulator = 0.0
+        self.steps = 0
+        self.dropped_steps = 0
+        self._last: Optional[float] = None
+
+    def advance(self, now: Optional[float] = None) -> int:
+        now = self.clock() if now is None else now
+        if self._last is None:
+            self._last = now
+        self.accumulator += max(0.0, now - self._last)
+        self._last = now
+        steps = int(self.accumulator / self.dt)
+        if steps > self.max_steps:
+            dropped = steps - self.max_steps
+            self.dropped_steps += dropped
+            self.accumulator -= dropped * self.dt
+            steps = self.max_steps
+        self.accumulator -= steps * self.dt
+        self.steps += steps
+        return steps
+
+    @property
+    def alpha(self) -> float:
+        return min(1.0, max(0.0, self.accumulator / self.dt))
+
+    def reset(self) -> None:
+        self.accumulator = 0.0
+        self._last = None
+
+    def stats(self) -> dict:
+        return {"hz": 1.0 / self.dt, "steps": self.steps, "droppedSteps": self.dropped_steps,
+                "alpha": round(self.alpha, 3)}
+
+
+class TickSchedule:
+    """Wall-clock deadlines for a loop that runs at a fixed rate.
+
+    ``delay`` says how long to sleep until the next tick, counted from when
+    the previous tick was due rather than from when its work finished, so
+    the work is absorbed into the period instead of added to it. A loop
+    that falls more than a whole period behind skips the ticks it missed
+    and counts them as ``late`` rather than bursting to catch up.
+    """
+
+    def __init__(self, hz: float, clock: Callable[[], float] = time.monotonic) -> None:
+        if hz <= 0:
+            raise ValueError("hz must be positive")
+        self.period = 1.0 / hz
+        self.clock = clock
+        self.ticks = 0
+        self.late = 0
+        self._next: Optional[float] = None
+
+    def delay(self) -> float:
+        """Seconds to wait before the next tick; call once per tick, after its work."""
+        now = self.clock()
+        self.ticks += 1
+        if self._next is None:
+            self._next = now
+        self._next += self.period
+        if self._next < now - self.period:
+            missed = int((now - self._next) / self.period)
+            self.late += missed
+            self._next += missed * self.period
+        return max(0.0, self._next - now)
+
+    def reset(self) -> None:
+        """Start the deadlines over from the next tick, as after a pause that missed nothing."""
+        self._next = None
+
+    def stats(self) -> dict:
+        return {"hz": 1.0 / self.period, "ticks": self.ticks, "lateTicks": self.late}
@@ -4,7 +4,7 @@ import GameScene from './components/GameScene';
 import HUD from './components/HUD';
 
 function App() {
-  const { gameState, connected, restart, boost } = useGameSocket();
+  const { gameState, track, connected, camPreviewUrl, restart, boost } = useGameSocket();
 
   // Keyboard controls
   useEffect(() => {
@@ -23,11 +23,12 @@ function App() {
   return (
     <div style={{ width: '100vw', height: '100vh', position: 'relative' }}>
       {/* 3D Game Scene */}
-      <GameScene gameState={gameState} />
+      <GameScene gameState={gameState} track={track} />
       
       {/* HUD Overlay */}
       <HUD 
         gameState={gameState} 
+        camPreviewUrl={camPreviewUrl}
         onRestart={restart}
         onBoost={boost}
       />
@@ -1,15 +1,15 @@
 import React, { Suspense } from 'react';
 import { Canvas } from '@react-three/fiber';
 import { OrbitControls } from '@react-three/drei';
-import { toThreeX, toThreeY } from '../utils/coordinateUtils';
+import { toThreeX, toThreeY, trackLinePositions } from '../utils/coordinateUtils';
 import Car from './Car';
 import Obstacle from './Obstacle';
 import Opponent from './Opponent';
 import PowerUp from './PowerUp';
 import TrackLines from './TrackLines';
 
-export default function GameScene({ gameState }) {
-  if (!gameState || !gameState.track) {
+export default function GameScene({ gameState, track }) {
+  if (!gameState || !track) {
     return (
       <div style={{
         width: '100%',
@@ -26,7 +26,7 @@ export default function GameScene({ gameState }) {
     );
   }
 
-  const { track, car, obstacles, opponents, powerups } = gameState;
+  const { car, obstacles, opponents, powerups } = gameState;
   const trackWidth = track.width;
   const trackHeight = track.height;
 
@@ -73,7 +73,7 @@ export default function GameScene({ gameState }) {
 
         {/* Track Lines */}
         <TrackLines
-          linePositions={track.linePositions}
+          linePositions={trackLinePositions(gameState.trackOffset, track)}
           toThreeY={toY}
           roadLeft={track.roadLeft}
           roadRight={track.roadRight}
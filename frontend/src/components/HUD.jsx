@@ -269,7 +269,7 @@
 
 import React, { useState, useEffect } from 'react';
 
-export default function HUD({ gameState, onRestart, onBoost }) {
+export default function HUD({ gameState, camPreviewUrl, onRestart, onBoost }) {
   const [pulseBoost, setPulseBoost] = useState(false);
   
   useEffect(() => {
@@ -394,11 +394,11 @@ export default function HUD({ gameState, onRestart, onBoost }) {
       </div>
 
       {/* Bottom Right - Camera Preview */}
-      {gameState.camPreview && (
+      {camPreviewUrl && (
         <div style={styles.cameraContainer}>
           <div style={styles.cameraHeader}>HAND TRACKING</div>
           <img
-            src={`data:image/jpeg;base64,${gameState.camPreview}`}
+            src={camPreviewUrl}
             alt="Hand Tracking"
             style={styles.cameraImage}
           />
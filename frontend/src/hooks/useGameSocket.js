@@ -1,13 +1,22 @@
-import { useEffect, useState, useCallback } from 'react';
+import { useEffect, useState, useCallback, useRef } from 'react';
+
+// The server keeps a game open for a while after its client goes; reconnecting with its id picks it up
+const SESSION_KEY = 'f1SessionId';
 
 export function useGameSocket(url = 'ws://localhost:8000/ws/game') {
   const [gameState, setGameState] = useState(null);
+  const [track, setTrack] = useState(null);
   const [connected, setConnected] = useState(false);
   const [ws, setWs] = useState(null);
+  const [camPreviewUrl, setCamPreviewUrl] = useState(null);
+  const previewUrlRef = useRef(null);
 
   useEffect(() => {
-    console.log('🔌 Connecting to WebSocket:', url);
-    const websocket = new WebSocket(url);
+    const sessionId = sessionStorage.getItem(SESSION_KEY);
+    const sessionUrl = sessionId ? `${url}${url.includes('?') ? '&' : '?'}session=${encodeURIComponent(sessionId)}` : url;
+    console.log('🔌 Connecting to WebSocket:', sessionUrl);
+    const websocket = new WebSocket(sessionUrl);
+    websocket.binaryType = 'blob';
 
     websocket.onopen = () => {
       console.log('✅ WebSocket connected');
@@ -15,9 +24,39 @@ export function useGameSocket(url = 'ws://localhost:8000/ws/game') {
     };
 
     websocket.onmessage = (event) => {
+      // Binary frames are JPEG camera previews
+      if (event.data instanceof Blob) {
+        const nextUrl = URL.createObjectURL(new Blob([event.data], { type: 'image/jpeg' }));
+        if (previewUrlRef.current) {
+          URL.revokeObjectURL(previewUrlRef.current);
+        }
+        previewUrlRef.current = nextUrl;
+        setCamPreviewUrl(nextUrl);
+        return;
+      }
+
       try {
         const data = JSON.parse(event.data);
+        // The session id comes first; a new one replaces a session the server has since closed
+        if (data.type === 'session') {
+          sessionStorage.setItem(SESSION_KEY, data.sessionId);
+          return;
+        }
+        // Static track geometry arrives once, before the first snapshot
+        if (data.type === 'track') {
+          setTrack(data);
+          return;
+        }
         setGameState(data);
+
+        // Echo the trace id once the frame has been painted so the server can measure motion-to-screen latency
+        if (data.traceId !== undefined) {
+          requestAnimationFrame(() => {
+            if (websocket.readyState === WebSocket.OPEN) {
+              websocket.send(JSON.stringify({ action: 'rendered', traceId: data.traceId }));
+            }
+          });
+        }
       } catch (error) {
         console.error('Error parsing message:', error);
       }
@@ -36,6 +75,10 @@ export function useGameSocket(url = 'ws://localhost:8000/ws/game') {
 
     return () => {
       websocket.close();
+      if (previewUrlRef.current) {
+        URL.revokeObjectURL(previewUrlRef.current);
+        previewUrlRef.current = null;
+      }
     };
   }, [url]);
 
@@ -53,5 +96,5 @@ export function useGameSocket(url = 'ws://localhost:8000/ws/game') {
     sendMessage({ action: 'boost' });
   }, [sendMessage]);
 
-  return { gameState, connected, restart, boost };
+  return { gameState, track, connected, camPreviewUrl, restart, boost };
 }
\ No newline at end of file
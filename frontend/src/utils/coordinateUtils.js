@@ -11,6 +11,19 @@ export function toThreeY(y, height = 800) {
   return -(y - height / 2);
 }
 
+/**
+ * Screen y of every lane marking for a scroll offset in [0, lineGap),
+ * placed the same way as track_line_positions() on the server
+ */
+export function trackLinePositions(offset = 0, track) {
+  const gap = track.lineGap;
+  const positions = [];
+  for (let y = -gap - ((gap - offset) % gap); y < track.lineEnd; y += gap) {
+    positions.push(y);
+  }
+  return positions;
+}
+
 export function getObstacleColor(type) {
   switch (type) {
     case 'barrier':